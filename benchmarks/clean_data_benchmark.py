@@ -0,0 +1,75 @@
+"""
+Compare the chained `.str.replace` cleaning with the single-pass `clean_data`.
+
+Reports time per full-market day and peak traced memory for both versions.
+
+Usage:
+    PYTHONPATH=. python benchmarks/clean_data_benchmark.py [recorded_twse_body] [repeat]
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks import payloads
+from fin_engine.scraper import taiwan_stock_price
+
+
+def legacy_clean_data(df: pd.DataFrame) -> pd.DataFrame:
+    """The previous implementation: 11 chained string passes per column, left as strings."""
+    cols_to_clean = ["TradeVolume", "Transaction", "TradeValue", "Open", "Max", "Min", "Close", "Change"]
+    for col in cols_to_clean:
+        df[col] = (
+            df[col].astype(str)
+            .str.replace(",", "")
+            .str.replace("X", "")
+            .str.replace("+", "")
+            .str.replace("----", "0")
+            .str.replace("---", "0")
+            .str.replace("--", "0")
+            .str.replace(" ", "")
+            .str.replace("除權息", "0")
+            .str.replace("除息", "0")
+            .str.replace("除權", "0")
+        )
+    return df
+
+
+def prepare(body: bytes) -> pd.DataFrame:
+    """Run the TWSE parse stages that precede cleaning."""
+    df, col_names = taiwan_stock_price.convert_twse_response_to_dataframe(json.loads(body))
+    df = taiwan_stock_price.convert_column_names(df, col_names)
+    df["Date"] = "2024-01-02"
+    return taiwan_stock_price.convert_change(df)
+
+
+def measure(name: str, func, df: pd.DataFrame, repeat: int) -> float:
+    """Print mean time and peak traced memory of func on copies of df."""
+    elapsed = 0.0
+    for _ in range(repeat):
+        frame = df.copy()
+        start = time.perf_counter()
+        func(frame)
+        elapsed += time.perf_counter() - start
+    frame = df.copy()
+    tracemalloc.start()
+    func(frame)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    mean = elapsed / repeat
+    print(f"{name:<8} {len(df):>6} rows {mean * 1000:>9.2f} ms {peak / 1024 ** 2:>8.2f} MiB peak")
+    return mean
+
+
+def main(path: str = "", repeat: int = 20):
+    body = payloads.load(path) if path else payloads.twse_payload()
+    df = prepare(body)
+    legacy = measure("legacy", legacy_clean_data, df, repeat)
+    current = measure("current", taiwan_stock_price.clean_data, df, repeat)
+    print(f"speedup: {legacy / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "", *[int(arg) for arg in sys.argv[2:]])
@@ -0,0 +1,65 @@
+"""
+Count TCP connections opened for a batch of requests against a local HTTP stand-in.
+
+Compares bare `requests.get` calls, as the scrapers used to make, with the shared
+keep-alive session from `fin_engine.scraper.session`.
+
+Usage:
+    PYTHONPATH=. python benchmarks/http_session_benchmark.py [requests]
+"""
+import http.server
+import json
+import sys
+import threading
+import time
+
+import requests
+
+from fin_engine.scraper import session
+
+BODY = json.dumps({"stat": "OK", "aaData": [["1101", "台泥", "40.00"]] * 1000}).encode()
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        Handler.connections += 1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(name: str, get, url: str, n: int):
+    """Issue n requests and print connections opened and elapsed time."""
+    Handler.connections = 0
+    start = time.perf_counter()
+    for _ in range(n):
+        get(url).json()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<10} {n:>5} requests {Handler.connections:>5} connections {elapsed:>8.3f}s")
+
+
+def main(n: int = 100):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    try:
+        run("bare", requests.get, url, n)
+        run("session", session.get_session("127.0.0.1", dict).get, url, n)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
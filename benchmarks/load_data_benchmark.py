@@ -0,0 +1,41 @@
+"""
+Compare rows/second of the row-wise SQL path, the batched upsert and LOAD DATA bulk loading.
+
+Runs against the MySQL financial data database from `fin_engine.config`
+(with local_infile=ON) and uses a scratch table so production tables are left
+untouched. The row-wise path is timed on the first `row_wise_rows` rows only,
+as it would take too long on a full backfill.
+
+Usage:
+    PYTHONPATH=. python benchmarks/load_data_benchmark.py [rows] [row_wise_rows]
+"""
+import sys
+
+from benchmarks.upsert_benchmark import TABLE, create_table, make_frame, run
+from fin_engine.db import clients
+from fin_engine.db.db import (
+    commit,
+    update_to_mysql_with_load_data,
+    update_to_mysql_with_sql,
+    update_to_mysql_with_upsert,
+)
+
+
+def main(rows: int = 100_000, row_wise_rows: int = 2_000):
+    mysql_conn = clients.get_mysql_financialdata_conn()
+    df = make_frame(rows)
+    create_table(mysql_conn)
+    # Preload so every path hits the duplicate-key case of a re-crawl.
+    update_to_mysql_with_load_data(df, TABLE, mysql_conn)
+
+    sample = df.head(row_wise_rows)
+    row_wise = run("row-wise", lambda: update_to_mysql_with_sql(sample, TABLE, mysql_conn), len(sample))
+    upsert = run("upsert", lambda: update_to_mysql_with_upsert(df, TABLE, mysql_conn), rows)
+    load = run("load data", lambda: update_to_mysql_with_load_data(df, TABLE, mysql_conn), rows)
+    print(f"load data vs row-wise: {row_wise / len(sample) / (load / rows):.1f}x")
+    print(f"load data vs upsert:   {upsert / load:.1f}x")
+    commit(sql=f"DROP TABLE IF EXISTS `{TABLE}`", mysql_conn=mysql_conn)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,90 @@
+"""
+Raw exchange payloads for the benchmarks.
+
+A recorded body can be loaded from disk (plain or gzip, e.g. a file from the
+response cache); otherwise a synthetic full-market day with the same shape as
+the exchange responses is generated.
+"""
+import gzip
+import json
+import typing
+
+import numpy as np
+
+TWSE_FIELDS = [
+    "證券代號", "證券名稱", "成交股數", "成交筆數", "成交金額", "開盤價", "最高價", "最低價",
+    "收盤價", "漲跌(+/-)", "漲跌價差", "最後揭示買價", "最後揭示買量", "最後揭示賣價", "最後揭示賣量", "本益比",
+]
+TWSE_DIRS = ["<p style= color:red>+</p>", "<p style= color:green>-</p>", "<p> </p>", "<p>X</p>"]
+
+
+def load(path: str) -> bytes:
+    """Load a recorded raw body, transparently decompressing gzip files."""
+    with open(path, "rb") as f:
+        body = f.read()
+    return gzip.decompress(body) if body[:2] == b"\x1f\x8b" else body
+
+
+def price(value: float) -> str:
+    return f"{value:,.2f}"
+
+
+def twse_payload(rows: int = 1200, seed: int = 0) -> bytes:
+    """A synthetic MI_INDEX response with `rows` stocks."""
+    rng = np.random.default_rng(seed)
+    data = []
+    for i in range(rows):
+        close = rng.uniform(10, 1000)
+        suspended = rng.random() < 0.03
+        data.append([
+            f"{1101 + i}", "名稱",
+            f"{rng.integers(1_000, 50_000_000):,}", f"{rng.integers(1, 50_000):,}",
+            f"{rng.integers(1_000_000, 10_000_000_000):,}",
+            "--" if suspended else price(close * 0.99), "--" if suspended else price(close * 1.01),
+            "--" if suspended else price(close * 0.98), "--" if suspended else price(close),
+            TWSE_DIRS[i % len(TWSE_DIRS)], price(rng.uniform(0, 5)),
+            price(close), f"{rng.integers(1, 500):,}", price(close * 1.001), f"{rng.integers(1, 500):,}",
+            "除權息" if i % 97 == 0 else f"{rng.uniform(5, 40):.2f}",
+        ])
+    return json.dumps({"stat": "OK", "fields9": TWSE_FIELDS, "data9": data}, ensure_ascii=False).encode()
+
+
+def tpex_payload(rows: int = 800, seed: int = 0) -> bytes:
+    """A synthetic stk_wn1430_result response with `rows` stocks."""
+    rng = np.random.default_rng(seed)
+    data = []
+    for i in range(rows):
+        close = rng.uniform(10, 500)
+        change = rng.uniform(-5, 5)
+        data.append([
+            f"{3000 + i}", "名稱", price(close), f"{change:+.2f}" if i % 50 else "---",
+            price(close * 0.99), price(close * 1.01), price(close * 0.98),
+            f"{rng.integers(1_000, 10_000_000):,}", f"{rng.integers(1_000_000, 1_000_000_000):,}",
+            f"{rng.integers(1, 10_000):,}", price(close), price(close * 1.001), "0", "0", "0", "0", "0",
+        ])
+    return json.dumps({"aaData": data}, ensure_ascii=False).encode()
+
+
+def taifex_payload(dates: typing.List[str], contracts: int = 300, seed: int = 0) -> bytes:
+    """A synthetic futDataDown Big5 CSV with `contracts` rows per date and session."""
+    rng = np.random.default_rng(seed)
+    header = (
+        "交易日期,契約,到期月份(週別),開盤價,最高價,最低價,收盤價,漲跌價,漲跌%,成交量,結算價,未沖銷契約數,"
+        "最後最佳買價,最後最佳賣價,歷史最高價,歷史最低價,是否因訊息面暫停交易,交易時段,價差對單式委託成交量"
+    )
+    lines = [header]
+    for date in dates:
+        for session in ["一般", "盤後"]:
+            for i in range(contracts):
+                close = rng.uniform(100, 20000)
+                quiet = i % 7 == 0
+                lines.append(",".join([
+                    date.replace("-", "/"), f"F{i % 60:02d}", f"2024{(i % 12) + 1:02d}  ",
+                    "-" if quiet else f"{close * 0.99:.0f}", "-" if quiet else f"{close * 1.01:.0f}",
+                    "-" if quiet else f"{close * 0.98:.0f}", "-" if quiet else f"{close:.0f}",
+                    "-" if quiet else f"{rng.uniform(-50, 50):.0f}", "-" if quiet else f"{rng.uniform(-3, 3):.2f}%",
+                    f"{rng.integers(0, 100_000)}", "-" if session == "盤後" else f"{close:.0f}",
+                    "-" if session == "盤後" else f"{rng.integers(0, 100_000)}",
+                    f"{close:.0f}", f"{close:.0f}", "-", "-", "", session, "0",
+                ]))
+    return ("\r\n".join(lines) + "\r\n").encode("big5")
@@ -0,0 +1,247 @@
+"""
+Offline benchmark suite: every parse stage of the three scrapers and the upload path.
+
+Replays full-market TWSE/TPEX JSON and TAIFEX CSV payloads, recorded ones from
+--fixtures (twse.json, tpex.json, taifex.csv, plain or gzip, e.g. copied from the
+response cache) or synthetic ones otherwise. Parsed frames are written to an
+in-memory SQLite stand-in, and with --mysql-url to a throwaway MySQL database
+through the "upsert" and "load" methods of `upload_data`. The upload SQL is
+MySQL-only, so the stand-in writes the same `df_to_records` rows in batches of
+UPSERT_BATCH_SIZE with SQLite's INSERT OR REPLACE, into a table keyed like the
+real one.
+
+Reports per-stage latency and rows/second, peak traced allocations per pipeline
+and the peak RSS of the process. Results are saved as a JSON baseline, and
+--compare flags stages that got slower than a previous baseline.
+
+Usage:
+    PYTHONPATH=. python benchmarks/suite.py [--repeat 10] [--fixtures DIR] [--mysql-url URL]
+        [--save benchmarks/baselines/<name>.json] [--compare benchmarks/baselines/<name>.json]
+"""
+import argparse
+import collections
+import datetime
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import typing
+
+import pandas as pd
+import sqlalchemy
+
+from benchmarks import payloads
+from fin_engine import registry
+from fin_engine.config import UPSERT_BATCH_SIZE
+from fin_engine.db import db
+from fin_engine.scraper import taiwan_futures_daily, taiwan_stock_price
+
+DATE = "2024-01-02"
+MYSQL_TYPES = {"category": "VARCHAR(30)", "int64": "BIGINT", "int32": "INT", "float32": "FLOAT"}
+
+
+def load_fixtures(directory: typing.Optional[str]) -> typing.Tuple[typing.Dict[str, bytes], typing.Dict[str, str]]:
+    """Recorded payloads from a directory where present, synthetic ones otherwise, and where each came from."""
+    fixtures = {
+        "twse": payloads.twse_payload(),
+        "tpex": payloads.tpex_payload(),
+        "taifex": payloads.taifex_payload([DATE]),
+    }
+    sources = {name: "synthetic" for name in fixtures}
+    for name, file_name in (("twse", "twse.json"), ("tpex", "tpex.json"), ("taifex", "taifex.csv")):
+        for path in (os.path.join(directory or "", file_name), os.path.join(directory or "", file_name + ".gz")):
+            if directory and os.path.exists(path):
+                fixtures[name] = payloads.load(path)
+                sources[name] = path
+                break
+    return fixtures, sources
+
+
+def parse_twse(body: bytes, stage: typing.Callable) -> pd.DataFrame:
+    data = stage("decode", json.loads, body)
+    df, col_names = stage("to_frame", taiwan_stock_price.convert_twse_response_to_dataframe, data)
+    df = stage("convert_column_names", taiwan_stock_price.convert_column_names, df, col_names)
+    df["Date"] = DATE
+    df = stage("convert_change", taiwan_stock_price.convert_change, df)
+    return stage("clean_data", taiwan_stock_price.clean_data, df)
+
+
+def parse_tpex(body: bytes, stage: typing.Callable) -> pd.DataFrame:
+    data = stage("decode", json.loads, body)
+    df = stage("to_frame", lambda: pd.DataFrame(data["aaData"]).iloc[:, [0, 2, 3, 4, 5, 6, 7, 8, 9]])
+    df = stage("set_column_names", taiwan_stock_price.set_column_names, df)
+    df["Date"] = DATE
+    return stage("clean_data", taiwan_stock_price.clean_data, df)
+
+
+def parse_taifex(body: bytes, stage: typing.Callable) -> pd.DataFrame:
+    df = stage("read_csv", taiwan_futures_daily.read_futures_csv, body)
+    df = stage("colname_zh2en", taiwan_futures_daily.colname_zh2en, df)
+    return stage("clean_data", taiwan_futures_daily.clean_data, df)
+
+
+PIPELINES = {
+    "twse": ("taiwan_stock_price", parse_twse),
+    "tpex": ("taiwan_stock_price", parse_tpex),
+    "taifex": ("taiwan_futures_daily", parse_taifex),
+}
+
+
+def create_table(dataset: str, table: str, conn):
+    """Create an empty scratch table with a dataset's schema, in MySQL or SQLite."""
+    declaration = registry.get(dataset)
+    columns = ", ".join(
+        f"`{col}` {'DATE' if dtype.startswith('datetime64') else MYSQL_TYPES[dtype]} NOT NULL"
+        for col, dtype in declaration.dtypes.items()
+    )
+    # The futures key is widened so that contracts and sessions of a day do not overwrite each other.
+    key = declaration.key_columns + (["ContractDate", "TradingSession"] if dataset == "taiwan_futures_daily" else [])
+    conn.execute(f"DROP TABLE IF EXISTS `{table}`")
+    conn.execute(f"CREATE TABLE `{table}` ({columns}, PRIMARY KEY ({', '.join(f'`{col}`' for col in key)}))")
+
+
+def upload_sqlite(df: pd.DataFrame, table: str, sqlite_conn):
+    """Write a frame's records to SQLite in upsert-sized batches, in one transaction."""
+    records = db.df_to_records(df)
+    sql = f"INSERT OR REPLACE INTO `{table}` VALUES ({', '.join('?' * len(df.columns))})"
+    with sqlite_conn.begin():
+        cursor = sqlite_conn.connection.cursor()
+        for start in range(0, len(records), UPSERT_BATCH_SIZE):
+            cursor.executemany(sql, records[start:start + UPSERT_BATCH_SIZE])
+
+
+def upload_stages(
+    name: str,
+    dataset: str,
+    df: pd.DataFrame,
+    stage: typing.Callable,
+    sqlite_conn,
+    mysql_conn,
+):
+    """Time the SQL building and the uploads of a parsed frame."""
+    stage("build_df_update_sql", db.build_df_update_sql, dataset, df)
+    stage("df_to_records", db.df_to_records, df)
+    table = f"bench_{name}"
+    create_table(dataset, table, sqlite_conn)
+    stage("upload_sqlite", upload_sqlite, df, table, sqlite_conn)
+    if mysql_conn is not None:
+        for method in ("upsert", "load"):
+            create_table(dataset, table, mysql_conn)
+            stage(f"upload_mysql_{method}", db.upload_data, df, table, mysql_conn, method)
+        mysql_conn.execute(f"DROP TABLE IF EXISTS `{table}`")
+
+
+def run_pipeline(name: str, body: bytes, repeat: int, sqlite_conn, mysql_conn) -> dict:
+    """Run one payload through parsing and upload `repeat` times and summarize every stage."""
+    dataset, parse = PIPELINES[name]
+    timings = collections.defaultdict(list)
+
+    def stage(stage_name: str, func: typing.Callable, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        timings[stage_name].append(time.perf_counter() - start)
+        return result
+
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = parse(body, stage)
+        timings["parse_total"].append(time.perf_counter() - start)
+        rows = len(df)
+        upload_stages(name, dataset, df, stage, sqlite_conn, mysql_conn)
+
+    # Traced allocations are measured on a separate pass, as tracing slows everything down.
+    tracemalloc.start()
+    parse(body, lambda stage_name, func, *args: func(*args))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stages = {}
+    for stage_name, values in timings.items():
+        mean = statistics.mean(values)
+        stages[stage_name] = {
+            "mean_ms": mean * 1000,
+            "min_ms": min(values) * 1000,
+            "rows_per_s": rows / mean if mean else 0.0,
+        }
+    return {"rows": rows, "parse_peak_alloc_mib": peak / 1024 ** 2, "stages": stages}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> typing.List[str]:
+    """Stages whose mean latency grew by more than `threshold` (a fraction) against a baseline."""
+    regressions = []
+    for name, pipeline in results["pipelines"].items():
+        for stage_name, stats in pipeline["stages"].items():
+            before = baseline.get("pipelines", {}).get(name, {}).get("stages", {}).get(stage_name)
+            if not before:
+                continue
+            change = stats["mean_ms"] / before["mean_ms"] - 1 if before["mean_ms"] else 0.0
+            flag = "  REGRESSION" if change > threshold else ""
+            print(f"{name + '.' + stage_name:<36} {before['mean_ms']:>9.2f} -> {stats['mean_ms']:>9.2f} ms {change:>+8.1%}{flag}")
+            if flag:
+                regressions.append(f"{name}.{stage_name}")
+    return regressions
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the parse stages and uploads on replayed payloads.")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--fixtures", help="directory with recorded twse.json, tpex.json and taifex.csv")
+    parser.add_argument("--mysql-url", help="throwaway MySQL database for the upsert and load uploads")
+    parser.add_argument("--save", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", help="compare with a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    fixtures, sources = load_fixtures(args.fixtures)
+    sqlite_conn = sqlalchemy.create_engine("sqlite://").connect()
+    mysql_conn = None
+    if args.mysql_url:
+        mysql_conn = sqlalchemy.create_engine(args.mysql_url, connect_args={"local_infile": True}).connect()
+
+    results = {
+        "commit": git_commit(),
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "repeat": args.repeat,
+        "fixtures": sources,
+        "pipelines": {},
+    }
+    for name, body in fixtures.items():
+        results["pipelines"][name] = run_pipeline(name, body, args.repeat, sqlite_conn, mysql_conn)
+    results["peak_rss_mib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    for name, pipeline in results["pipelines"].items():
+        print(f"{name}: {pipeline['rows']} rows, parse peak {pipeline['parse_peak_alloc_mib']:.2f} MiB")
+        for stage_name, stats in pipeline["stages"].items():
+            print(f"  {stage_name:<24} {stats['mean_ms']:>9.2f} ms {stats['rows_per_s']:>14.0f} rows/s")
+    print(f"peak RSS: {results['peak_rss_mib']:.1f} MiB")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} stages slower than the baseline by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
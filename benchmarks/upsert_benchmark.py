@@ -0,0 +1,97 @@
+"""
+Compare rows/second of the per-row SQL fallback against the batched upsert.
+
+Runs against the MySQL financial data database from `fin_engine.config` and
+uses a scratch table so production tables are left untouched.
+
+Usage:
+    PYTHONPATH=. python benchmarks/upsert_benchmark.py [rows] [batch_size]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from fin_engine.db import clients
+from fin_engine.db.db import (
+    commit,
+    update_to_mysql_with_pandas,
+    update_to_mysql_with_sql,
+    update_to_mysql_with_upsert,
+)
+
+TABLE = "bench_upsert_taiwan_stock_price"
+
+
+def create_table(mysql_conn):
+    """Create an empty scratch table with the taiwan_stock_price schema."""
+    commit(sql=f"DROP TABLE IF EXISTS `{TABLE}`", mysql_conn=mysql_conn)
+    commit(
+        sql=f"""
+            CREATE TABLE `{TABLE}`(
+                `StockID` VARCHAR(10) NOT NULL,
+                `TradeVolume` BIGINT NOT NULL,
+                `Transaction` INT NOT NULL,
+                `TradeValue` BIGINT NOT NULL,
+                `Open` FLOAT NOT NULL,
+                `Max` FLOAT NOT NULL,
+                `Min` FLOAT NOT NULL,
+                `Close` FLOAT NOT NULL,
+                `Change` FLOAT NOT NULL,
+                `Date` DATE NOT NULL,
+                PRIMARY KEY(`StockID`, `Date`)
+            )
+        """,
+        mysql_conn=mysql_conn,
+    )
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    """Build a synthetic full-market day shaped like the TWSE scraper output."""
+    rng = np.random.default_rng(0)
+    close = rng.uniform(10, 500, rows).round(2)
+    return pd.DataFrame(
+        {
+            "StockID": [f"{1000 + i}" for i in range(rows)],
+            "TradeVolume": rng.integers(1_000, 10_000_000, rows),
+            "Transaction": rng.integers(1, 10_000, rows),
+            "TradeValue": rng.integers(1_000_000, 1_000_000_000, rows),
+            "Open": close,
+            "Max": close + 1,
+            "Min": close - 1,
+            "Close": close,
+            "Change": rng.uniform(-5, 5, rows).round(2),
+            "Date": "2024-01-02",
+        }
+    )
+
+
+def run(name: str, func, rows: int) -> float:
+    """Time a single upload and print the throughput."""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {rows:>8} rows {elapsed:>8.3f}s {rows / elapsed:>12.1f} rows/s")
+    return elapsed
+
+
+def main(rows: int = 1200, batch_size: int = 1000):
+    mysql_conn = clients.get_mysql_financialdata_conn()
+    df = make_frame(rows)
+    create_table(mysql_conn)
+    # Preload so both paths hit the duplicate-key case of a re-crawl.
+    update_to_mysql_with_pandas(df, TABLE, mysql_conn)
+
+    def per_row():
+        if not update_to_mysql_with_pandas(df, TABLE, mysql_conn):
+            update_to_mysql_with_sql(df, TABLE, mysql_conn)
+
+    legacy = run("per-row", per_row, rows)
+    batched = run("upsert", lambda: update_to_mysql_with_upsert(df, TABLE, mysql_conn, batch_size), rows)
+    print(f"speedup: {legacy / batched:.1f}x")
+    commit(sql=f"DROP TABLE IF EXISTS `{TABLE}`", mysql_conn=mysql_conn)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
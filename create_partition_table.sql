@@ -29,7 +29,7 @@ PARTITION BY RANGE(YEAR(Date)) (
     PARTITION p2019 VALUES LESS THAN (2020),
     PARTITION p2020 VALUES LESS THAN (2021),
     PARTITION p2021 VALUES LESS THAN (2022),
-    PARTITION p2022 VALUES LESS THAN (2023)
+    PARTITION p2022 VALUES LESS THAN (2023),
     PARTITION p2023 VALUES LESS THAN (2024)
 );
 
@@ -67,6 +67,6 @@ PARTITION BY RANGE(YEAR(Date)) (
     PARTITION p2019 VALUES LESS THAN (2020),
     PARTITION p2020 VALUES LESS THAN (2021),
     PARTITION p2021 VALUES LESS THAN (2022),
-    PARTITION p2022 VALUES LESS THAN (2023)
+    PARTITION p2022 VALUES LESS THAN (2023),
     PARTITION p2023 VALUES LESS THAN (2024)
 );
@@ -0,0 +1,166 @@
+import argparse
+import json
+import os
+import time
+import typing
+
+import pandas as pd
+from loguru import logger
+
+from fin_engine import db
+from fin_engine.config import BACKFILL_CHECKPOINT_DIR, BULK_LOAD_THRESHOLD
+from fin_engine.producer import plan
+from fin_engine.scraper import async_engine
+from fin_engine.tasks import upload_many
+
+
+def task_key(parameters: dict) -> str:
+    """A stable identifier of a task's parameters."""
+    return json.dumps(parameters, sort_keys=True)
+
+
+def checkpoint_path(
+    dataset: str,
+    start_date: str,
+    end_date: str,
+    checkpoint_dir: str = BACKFILL_CHECKPOINT_DIR,
+) -> str:
+    """The checkpoint file of a dataset's date range."""
+    return os.path.join(checkpoint_dir, f"{dataset}_{start_date}_{end_date}.jsonl")
+
+
+def load_checkpoint(path: str) -> typing.Set[str]:
+    """Keys of the tasks already uploaded by a previous run."""
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+class Progress:
+    """
+    Upload tasks' results, checkpoint them and log the throughput as they complete.
+
+    Results are buffered until they add up to BULK_LOAD_THRESHOLD rows, so
+    that their days are bulk-loaded into MySQL together (see `upload_many`).
+    Call `flush` once the crawl is over to upload the rest.
+    """
+
+    def __init__(self, dataset: str, total: int, path: str, log_every: int = 20, force: bool = False):
+        self.dataset = dataset
+        self.force = force
+        self.total = total
+        self.path = path
+        self.log_every = log_every
+        self.done = 0
+        self.rows = 0
+        self.pending: typing.List[typing.Tuple[dict, pd.DataFrame]] = []
+        self.pending_rows = 0
+        self.failed: typing.List[dict] = []
+        self.start = time.perf_counter()
+
+    def __call__(self, parameters: dict, df: pd.DataFrame):
+        self.pending.append((parameters, df))
+        self.pending_rows += len(df)
+        if BULK_LOAD_THRESHOLD <= 0 or self.pending_rows >= BULK_LOAD_THRESHOLD:
+            self.flush()
+
+    def flush(self):
+        """Upload the buffered results and checkpoint them, recording them as failed if the upload fails."""
+        results, self.pending, self.pending_rows = self.pending, [], 0
+        if not results:
+            return
+        try:
+            upload_many(self.dataset, results, self.force)
+        except Exception as e:
+            logger.error(f"Upload of {len(results)} {self.dataset} tasks failed: {e}")
+            self.failed.extend(parameters for parameters, _ in results)
+            return
+        # Appended only once uploaded, so an interrupted run redoes at most the tasks in flight or buffered.
+        with open(self.path, "a") as f:
+            f.writelines(task_key(parameters) + "\n" for parameters, _ in results)
+        self.done += len(results)
+        self.rows += sum(len(df) for _, df in results)
+        if self.done % self.log_every < len(results) or self.done == self.total:
+            elapsed = time.perf_counter() - self.start
+            rate = self.done / elapsed
+            logger.info(
+                f"{self.dataset}: {self.done}/{self.total} tasks, {self.rows} rows, "
+                f"{rate:.2f} tasks/s, {self.rows / elapsed:.0f} rows/s, "
+                f"ETA {(self.total - self.done) / rate:.0f}s"
+            )
+
+
+def backfill(
+    dataset: str,
+    start_date: str,
+    end_date: str,
+    force: bool = False,
+    parse_processes: int = 2,
+    checkpoint_dir: str = BACKFILL_CHECKPOINT_DIR,
+) -> dict:
+    """
+    Crawl and upload a date range of a dataset in this process, without a message broker.
+
+    Runs the same plan, fetch, parse and upload steps as the Celery tasks.
+    Fetches are bounded per data source by ASYNC_CONCURRENCY and the shared
+    rate limiter, and parsing runs on a process pool. Every uploaded task is
+    checkpointed, so running the same range again resumes where it stopped.
+
+    Parameters:
+    - dataset: Name of the dataset to backfill.
+    - start_date: The start date in YYYY-MM-DD format.
+    - end_date: The end date in YYYY-MM-DD format.
+    - force: Crawl every date, even those already stored in the database, and write
+      its data even if it is unchanged since the last upload.
+    - parse_processes: Number of parsing processes; 0 parses on threads.
+    - checkpoint_dir: Where the checkpoint of the range is kept.
+
+    Returns a summary with the tasks, rows, failures and elapsed seconds.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = checkpoint_path(dataset, start_date, end_date, checkpoint_dir)
+    uploaded = load_checkpoint(path)
+    parameter_list = [
+        parameters
+        for parameters in plan(dataset, start_date, end_date, force=force)
+        if task_key(parameters) not in uploaded
+    ]
+    logger.info(f"Backfilling {dataset} {start_date}..{end_date}: {len(parameter_list)} tasks, {len(uploaded)} resumed")
+
+    start = time.perf_counter()
+    progress = Progress(dataset, len(parameter_list), path, force=force)
+    summary = async_engine.run(dataset, parameter_list, progress, parse_processes)
+    progress.flush()
+    db.router.close_connection()
+    summary["failed"].extend(progress.failed)
+    summary["rows"] = progress.rows
+    summary["elapsed"] = time.perf_counter() - start
+
+    elapsed = max(summary["elapsed"], 1e-9)
+    logger.info(
+        f"Backfill of {dataset} done in {elapsed:.1f}s: {summary['tasks'] - len(summary['failed'])}/{summary['tasks']} "
+        f"tasks, {summary['rows']} rows, {summary['tasks'] / elapsed:.2f} tasks/s, {summary['rows'] / elapsed:.0f} rows/s"
+    )
+    for parameters in summary["failed"]:
+        logger.warning(f"Failed, run again to retry: {parameters}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl and upload a dataset's date range locally, without a broker.")
+    parser.add_argument("dataset")
+    parser.add_argument("start_date")
+    parser.add_argument("end_date")
+    parser.add_argument("--force", action="store_true", help="re-crawl dates that are already stored")
+    parser.add_argument("--parse-processes", type=int, default=2, help="parsing processes, 0 for threads")
+    parser.add_argument("--checkpoint-dir", default=BACKFILL_CHECKPOINT_DIR)
+    args = parser.parse_args()
+    backfill(
+        args.dataset,
+        args.start_date,
+        args.end_date,
+        force=args.force,
+        parse_processes=args.parse_processes,
+        checkpoint_dir=args.checkpoint_dir,
+    )
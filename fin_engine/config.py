@@ -1,4 +1,5 @@
 import os
+import typing
 
 MYSQL_DATA_HOST = os.environ.get("MYSQL_DATA_HOST", "127.0.0.1")
 MYSQL_DATA_USER = os.environ.get("MYSQL_DATA_USER", "root")
@@ -23,3 +24,103 @@ WORKER_PASSWORD = os.environ.get("WORKER_PASSWORD", "worker")
 
 MESSAGE_QUEUE_HOST = os.environ.get("MESSAGE_QUEUE_HOST", "127.0.0.1")
 MESSAGE_QUEUE_PORT = int(os.environ.get("MESSAGE_QUEUE_PORT", "5672"))
+
+UPSERT_BATCH_SIZE = int(os.environ.get("UPSERT_BATCH_SIZE", "1000"))
+# Uploads of at least this many rows (the days of a task, or a batch of backfill tasks) go through
+# LOAD DATA LOCAL INFILE in one transaction; 0 disables it.
+# The MySQL server needs local_infile=ON.
+BULK_LOAD_THRESHOLD = int(os.environ.get("BULK_LOAD_THRESHOLD", "20000"))
+
+MYSQL_POOL_SIZE = int(os.environ.get("MYSQL_POOL_SIZE", "5"))
+MYSQL_POOL_MAX_OVERFLOW = int(os.environ.get("MYSQL_POOL_MAX_OVERFLOW", "10"))
+MYSQL_POOL_RECYCLE = int(os.environ.get("MYSQL_POOL_RECYCLE", "3600"))
+
+
+def source_map(value: str, cast: typing.Callable) -> dict:
+    """Parse a per data source setting such as "twse=0.2,tpex=0.2"."""
+    return {
+        data_source: cast(setting)
+        for data_source, setting in (item.split("=") for item in value.split(",") if item)
+    }
+
+
+# Allowed requests per second for each data source.
+RATE_LIMITS = source_map(os.environ.get("RATE_LIMITS", "twse=0.2,tpex=0.2,taifex=0.2"), float)
+RATE_LIMIT_BURST = int(os.environ.get("RATE_LIMIT_BURST", "1"))
+# "file" shares the budget between workers on one host, "mysql" across the cluster.
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "file")
+RATE_LIMIT_DIR = os.environ.get("RATE_LIMIT_DIR", "/tmp/fin_engine_rate_limit")
+
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "30"))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = float(os.environ.get("HTTP_BACKOFF_FACTOR", "2"))
+
+# "write" stores every raw response, "replay" parses from the cache without network, "off" disables it.
+RESPONSE_CACHE_MODE = os.environ.get("RESPONSE_CACHE_MODE", "write")
+RESPONSE_CACHE_DIR = os.environ.get("RESPONSE_CACHE_DIR", "/tmp/fin_engine_cache")
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+# The cache directory is scanned for eviction every this many puts, or sooner once it may be over its size.
+RESPONSE_CACHE_EVICT_EVERY = int(os.environ.get("RESPONSE_CACHE_EVICT_EVERY", "100"))
+
+# Longest date range fetched by one TAIFEX request; 1 fetches day by day.
+TAIFEX_RANGE_DAYS = int(os.environ.get("TAIFEX_RANGE_DAYS", "31"))
+
+# Requests in flight per data source in the async crawl engine.
+ASYNC_CONCURRENCY = source_map(os.environ.get("ASYNC_CONCURRENCY", "twse=2,tpex=2,taifex=2"), int)
+ASYNC_PARSE_WORKERS = int(os.environ.get("ASYNC_PARSE_WORKERS", "2"))
+
+# Port of the Prometheus endpoint started by each Celery worker; 0 disables it.
+# Set PROMETHEUS_MULTIPROC_DIR as well so prefork children report through it.
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9808"))
+
+TASK_MAX_RETRIES = int(os.environ.get("TASK_MAX_RETRIES", "5"))
+TASK_RETRY_BACKOFF = float(os.environ.get("TASK_RETRY_BACKOFF", "30"))
+TASK_RETRY_BACKOFF_MAX = float(os.environ.get("TASK_RETRY_BACKOFF_MAX", "3600"))
+# Queue without consumers that keeps tasks which failed permanently or ran out of retries.
+DEAD_LETTER_QUEUE = os.environ.get("DEAD_LETTER_QUEUE", "dead_letter")
+
+# Where upload sends scraped data: "mysql", "parquet" or both, comma separated.
+STORAGE_SINKS = [sink for sink in os.environ.get("STORAGE_SINKS", "mysql").split(",") if sink]
+PARQUET_DIR = os.environ.get("PARQUET_DIR", "/data/fin_engine/parquet")
+
+# Memory budget of the in-process cache of db.read, in bytes; 0 disables it.
+READ_CACHE_MAX_BYTES = int(os.environ.get("READ_CACHE_MAX_BYTES", str(256 * 1024 ** 2)))
+READ_CHUNK_SIZE = int(os.environ.get("READ_CHUNK_SIZE", "10000"))
+
+# Range partitions kept ahead of today on the data tables: "year" (RANGE(YEAR(Date)))
+# or "month" (RANGE COLUMNS(Date)), and how many intervals to create in advance.
+PARTITION_INTERVAL = os.environ.get("PARTITION_INTERVAL", "year")
+PARTITION_AHEAD = int(os.environ.get("PARTITION_AHEAD", "1"))
+
+# "publication" dispatches each data source as soon as a probe finds its data published,
+# starting at its expected release time (Asia/Taipei); "fixed" dispatches every dataset at 15:00.
+SCHEDULER_MODE = os.environ.get("SCHEDULER_MODE", "publication")
+PUBLICATION_TIMES = source_map(os.environ.get("PUBLICATION_TIMES", "twse=14:00,tpex=14:30,taifex=14:30"), str)
+# Seconds between availability probes, doubling up to the maximum, and how long to keep probing.
+PROBE_INTERVAL = float(os.environ.get("PROBE_INTERVAL", "60"))
+PROBE_INTERVAL_MAX = float(os.environ.get("PROBE_INTERVAL_MAX", "600"))
+PROBE_TIMEOUT = float(os.environ.get("PROBE_TIMEOUT", str(6 * 3600)))
+
+# Skip unchanged uploads by content hash: "frame" skips a date whose data is unchanged,
+# "rows" also writes only the changed rows of a changed date, "off" always writes everything.
+UPLOAD_DEDUP = os.environ.get("UPLOAD_DEDUP", "frame")
+
+# Where the local backfill runner records uploaded tasks so an interrupted run can resume.
+BACKFILL_CHECKPOINT_DIR = os.environ.get("BACKFILL_CHECKPOINT_DIR", "/tmp/fin_engine_backfill")
+
+# Producer backpressure: publishing to a queue pauses once it holds QUEUE_HIGH_WATER
+# messages and resumes when it drains to QUEUE_LOW_WATER; 0 disables the check.
+# Queue depth is read again every QUEUE_CHECK_EVERY published tasks, or every
+# QUEUE_POLL_SECONDS while paused.
+QUEUE_HIGH_WATER = int(os.environ.get("QUEUE_HIGH_WATER", "500"))
+QUEUE_LOW_WATER = int(os.environ.get("QUEUE_LOW_WATER", "100"))
+QUEUE_CHECK_EVERY = int(os.environ.get("QUEUE_CHECK_EVERY", "100"))
+QUEUE_POLL_SECONDS = float(os.environ.get("QUEUE_POLL_SECONDS", "30"))
+
+# Datasets whose derived metrics (returns, moving averages, volume z-scores, basis) are
+# updated after each upload, comma separated; empty disables the derived stage.
+DERIVED_DATASETS = [
+    dataset
+    for dataset in os.environ.get("DERIVED_DATASETS", "taiwan_stock_price,taiwan_futures_daily").split(",")
+    if dataset
+]
@@ -1,3 +1,6 @@
+import os
+import typing
+
 from fin_engine.config import (
     MYSQL_DATA_USER,
     MYSQL_DATA_PASSWORD,
@@ -9,27 +12,67 @@ from fin_engine.config import (
     MYSQL_MONITOR_HOST,
     MYSQL_MONITOR_PORT,
     MYSQL_MONITOR_DATABASE,
+    MYSQL_POOL_SIZE,
+    MYSQL_POOL_MAX_OVERFLOW,
+    MYSQL_POOL_RECYCLE,
 )
 from sqlalchemy import create_engine, engine
 
+# Process-wide engines keyed by address, together with the pid that created them.
+_engines: typing.Dict[str, typing.Tuple[int, engine.base.Engine]] = {}
 
-def get_mysql_financialdata_conn() -> engine.base.Connection:
-    """Get a connection to the MySQL financial data database."""
+
+def get_engine(address: str) -> engine.base.Engine:
+    """
+    Get the pooled engine for an address, creating it lazily on first use.
+
+    Engines are never shared across processes: a forked child (e.g. a Celery
+    prefork worker) gets its own engine instead of reusing the parent's sockets.
+    The parent's engine is dropped without `dispose()` so the child does not
+    close connections that still belong to the parent.
+    """
+    pid = os.getpid()
+    cached = _engines.get(address)
+    if cached is None or cached[0] != pid:
+        cached = (
+            pid,
+            create_engine(
+                address,
+                pool_size=MYSQL_POOL_SIZE,
+                max_overflow=MYSQL_POOL_MAX_OVERFLOW,
+                pool_recycle=MYSQL_POOL_RECYCLE,
+                pool_pre_ping=True,
+                # Allows LOAD DATA LOCAL INFILE for bulk uploads.
+                connect_args={"local_infile": True},
+            ),
+        )
+        _engines[address] = cached
+    return cached[1]
+
+
+def get_mysql_financialdata_engine() -> engine.base.Engine:
+    """Get the pooled engine for the MySQL financial data database."""
     address = (
         f"mysql+pymysql://{MYSQL_DATA_USER}:{MYSQL_DATA_PASSWORD}"
         f"@{MYSQL_DATA_HOST}:{MYSQL_DATA_PORT}/{MYSQL_DATA_DATABASE}"
     )
-    engine = create_engine(address)
-    connection = engine.connect()
-    return connection
+    return get_engine(address)
 
 
-def get_mysql_monitor_conn() -> engine.base.Connection:
-    """Get a connection to the MySQL monitor database."""
+def get_mysql_monitor_engine() -> engine.base.Engine:
+    """Get the pooled engine for the MySQL monitor database."""
     address = (
         f"mysql+pymysql://{MYSQL_MONITOR_USER}:{MYSQL_MONITOR_PASSWORD}"
         f"@{MYSQL_MONITOR_HOST}:{MYSQL_MONITOR_PORT}/{MYSQL_MONITOR_DATABASE}"
     )
-    engine = create_engine(address)
-    connection = engine.connect()
-    return connection
+    return get_engine(address)
+
+
+def get_mysql_financialdata_conn() -> engine.base.Connection:
+    """Get a connection to the MySQL financial data database."""
+    return get_mysql_financialdata_engine().connect()
+
+
+def get_mysql_monitor_conn() -> engine.base.Connection:
+    """Get a connection to the MySQL monitor database."""
+    return get_mysql_monitor_engine().connect()
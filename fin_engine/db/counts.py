@@ -0,0 +1,224 @@
+import collections
+import typing
+
+from sqlalchemy import engine
+
+# Rows stored per dataset and date, kept up to date by `upload_data` so monitoring
+# does not have to COUNT(1) over the data tables.
+COUNT_TABLE = "DatasetRowCount"
+
+# Rows crawled per dataset, date and data source, with 0 for a crawled date without data
+# (weekends, holidays), so the planner can tell which source of a date is missing.
+SOURCE_COUNT_TABLE = "DatasetSourceRowCount"
+
+_count_table_ready: typing.Set[int] = set()
+_source_count_table_ready: typing.Set[int] = set()
+_primary_keys: typing.Dict[str, typing.List[str]] = {}
+
+
+def ensure_count_table(mysql_conn: engine.base.Connection):
+    """Create the count table once per connection's engine (DDL would end an open transaction)."""
+    if id(mysql_conn.engine) in _count_table_ready:
+        return
+    mysql_conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS `{COUNT_TABLE}` (
+            dataset_name VARCHAR(50) NOT NULL,
+            date DATE NOT NULL,
+            count INT NOT NULL,
+            SYS_UPDATE_TIME DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (dataset_name, date)
+        )
+        """
+    )
+    _count_table_ready.add(id(mysql_conn.engine))
+
+
+def ensure_source_count_table(mysql_conn: engine.base.Connection):
+    """Create the per-source count table once per connection's engine."""
+    if id(mysql_conn.engine) in _source_count_table_ready:
+        return
+    mysql_conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS `{SOURCE_COUNT_TABLE}` (
+            dataset_name VARCHAR(50) NOT NULL,
+            date DATE NOT NULL,
+            data_source VARCHAR(50) NOT NULL,
+            count INT NOT NULL,
+            SYS_UPDATE_TIME DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (dataset_name, date, data_source)
+        )
+        """
+    )
+    _source_count_table_ready.add(id(mysql_conn.engine))
+
+
+def record_source_rows(
+    dataset: str,
+    data_source: str,
+    rows: typing.Dict[str, int],
+    mysql_conn: engine.base.Connection,
+):
+    """Record the rows crawled per date from one data source, replacing earlier crawls of those dates."""
+    if not rows:
+        return
+    ensure_source_count_table(mysql_conn)
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(rows))
+    sql = f"""
+        INSERT INTO `{SOURCE_COUNT_TABLE}` (dataset_name, date, data_source, count) VALUES {values}
+        ON DUPLICATE KEY UPDATE count = VALUES(count)
+    """
+    params = tuple(value for date, count in rows.items() for value in (dataset, date, data_source, count))
+    mysql_conn.execute(sql, params)
+
+
+def read_source_rows(
+    dataset: str,
+    start_date: str,
+    end_date: str,
+    mysql_conn: engine.base.Connection,
+) -> typing.Dict[typing.Tuple[str, str], int]:
+    """Rows crawled per (date, data source) of a dataset over a date range."""
+    ensure_source_count_table(mysql_conn)
+    rows = mysql_conn.execute(
+        f"""
+        SELECT date, data_source, count FROM `{SOURCE_COUNT_TABLE}`
+        WHERE dataset_name = %s AND date BETWEEN %s AND %s
+        """,
+        (dataset, start_date, end_date),
+    ).fetchall()
+    return {(str(date), data_source): count for date, data_source, count in rows}
+
+
+def get_primary_key(table: str, mysql_conn: engine.base.Connection) -> typing.List[str]:
+    """Primary key columns of a table, looked up once per process."""
+    if table not in _primary_keys:
+        rows = mysql_conn.execute(f"SHOW KEYS FROM `{table}` WHERE Key_name = 'PRIMARY'").fetchall()
+        _primary_keys[table] = [row["Column_name"] for row in sorted(rows, key=lambda row: row["Seq_in_index"])]
+    return _primary_keys[table]
+
+
+def find_date_column(colnames: typing.List[str]) -> typing.Optional[str]:
+    """The `Date` column, matched case-insensitively."""
+    return next((col for col in colnames if col.lower() == "date"), None)
+
+
+def count_existing_rows(
+    table: str,
+    key_columns: typing.List[str],
+    date_column: str,
+    keys: typing.List[tuple],
+    mysql_conn: engine.base.Connection,
+) -> typing.Dict[str, int]:
+    """
+    Count, per date, how many of the given primary keys are already stored.
+
+    The keys are read with FOR UPDATE, which also locks the gaps of the missing
+    ones, so a concurrent upload of the same keys waits for this transaction
+    instead of counting them as new too.
+    """
+    columns = ", ".join(f"`{col}`" for col in key_columns)
+    placeholders = ", ".join(["({})".format(", ".join(["%s"] * len(key_columns)))] * len(keys))
+    sql = f"""
+        SELECT `{date_column}`, COUNT(1)
+        FROM `{table}`
+        WHERE ({columns}) IN ({placeholders})
+        GROUP BY `{date_column}`
+        FOR UPDATE
+    """
+    params = tuple(value for key in keys for value in key)
+    return {str(date)[:10]: count for date, count in mysql_conn.execute(sql, params).fetchall()}
+
+
+def count_new_rows(
+    table: str,
+    colnames: typing.List[str],
+    records: typing.List[tuple],
+    mysql_conn: engine.base.Connection,
+    key_columns: typing.Optional[typing.List[str]] = None,
+) -> typing.Dict[str, int]:
+    """
+    Rows per date that an upsert of `records` will add rather than update.
+
+    Must run inside the upload transaction, before the records are written.
+    The key columns are those of the registered dataset, or looked up from the table.
+    """
+    date_column = find_date_column(colnames)
+    key_columns = key_columns or get_primary_key(table, mysql_conn)
+    if date_column is None or date_column not in key_columns:
+        return {}
+    key_index = [colnames.index(col) for col in key_columns]
+    date_index = key_columns.index(date_column)
+    # A key repeated in the batch is written once, so it is counted once.
+    keys = list(dict.fromkeys(tuple(record[i] for i in key_index) for record in records))
+    existing = count_existing_rows(table, key_columns, date_column, keys, mysql_conn)
+
+    deltas = collections.Counter(str(key[date_index])[:10] for key in keys)
+    for date, count in existing.items():
+        deltas[date] -= count
+    return deltas
+
+
+def count_new_staged_rows(
+    table: str,
+    staging_table: str,
+    mysql_conn: engine.base.Connection,
+    key_columns: typing.Optional[typing.List[str]] = None,
+) -> typing.Dict[str, int]:
+    """
+    Rows per date of a staging table whose primary key is not yet in `table`.
+
+    Must run inside the upload transaction, before the staged rows are merged.
+    The stored keys are read with FOR UPDATE, as in `count_existing_rows`.
+    """
+    key_columns = key_columns or get_primary_key(table, mysql_conn)
+    date_column = find_date_column(key_columns)
+    if date_column is None:
+        return {}
+    join = " AND ".join(f"t.`{col}` = s.`{col}`" for col in key_columns)
+    sql = f"""
+        SELECT s.`{date_column}`, COUNT(DISTINCT {", ".join(f"s.`{col}`" for col in key_columns)})
+        FROM `{staging_table}` s
+        LEFT JOIN `{table}` t ON {join}
+        WHERE t.`{key_columns[0]}` IS NULL
+        GROUP BY s.`{date_column}`
+        FOR UPDATE
+    """
+    return {str(date)[:10]: count for date, count in mysql_conn.execute(sql).fetchall()}
+
+
+def record_row_counts(dataset: str, deltas: typing.Dict[str, int], mysql_conn: engine.base.Connection):
+    """Add row deltas per date to the count table."""
+    deltas = {date: delta for date, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    values = ", ".join(["(%s, %s, %s)"] * len(deltas))
+    sql = f"""
+        INSERT INTO `{COUNT_TABLE}` (dataset_name, date, count) VALUES {values}
+        ON DUPLICATE KEY UPDATE count = count + VALUES(count)
+    """
+    params = tuple(value for date, delta in deltas.items() for value in (dataset, date, delta))
+    mysql_conn.execute(sql, params)
+
+
+def read_row_counts(date: str, mysql_conn: engine.base.Connection) -> typing.Dict[str, int]:
+    """Stored rows of every dataset for a date, in one query."""
+    ensure_count_table(mysql_conn)
+    rows = mysql_conn.execute(
+        f"SELECT dataset_name, count FROM `{COUNT_TABLE}` WHERE date = %s",
+        (date,),
+    ).fetchall()
+    return {dataset: count for dataset, count in rows}
+
+
+def rebuild_row_counts(dataset: str, mysql_conn: engine.base.Connection):
+    """Recount a dataset from scratch, e.g. to seed the count table for existing data."""
+    ensure_count_table(mysql_conn)
+    mysql_conn.execute(
+        f"""
+        INSERT INTO `{COUNT_TABLE}` (dataset_name, date, count)
+        SELECT %s, `Date`, COUNT(1) FROM `{dataset}` GROUP BY `Date`
+        ON DUPLICATE KEY UPDATE count = VALUES(count)
+        """,
+        (dataset,),
+    )
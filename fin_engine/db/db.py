@@ -1,3 +1,8 @@
+import collections
+import csv
+import os
+import tempfile
+import time
 import typing
 
 import pandas as pd
@@ -5,6 +10,10 @@ import pymysql
 from loguru import logger
 from sqlalchemy import engine
 
+from fin_engine import metrics, registry
+from fin_engine.config import BULK_LOAD_THRESHOLD, UPSERT_BATCH_SIZE
+from fin_engine.db import counts, read
+
 
 def update_to_mysql_with_pandas(df: pd.DataFrame, table: str, mysql_conn: engine.base.Connection) -> bool:
     """Upload data to MySQL using pandas built-in function."""
@@ -29,6 +38,164 @@ def update_to_mysql_with_sql(df: pd.DataFrame, table: str, mysql_conn: engine.ba
     commit(sql=sql_statements, mysql_conn=mysql_conn)
 
 
+def update_to_mysql_with_upsert(
+    df: pd.DataFrame,
+    table: str,
+    mysql_conn: engine.base.Connection,
+    batch_size: int = UPSERT_BATCH_SIZE,
+    track_counts: bool = False,
+    key_columns: typing.Optional[typing.List[str]] = None,
+):
+    """
+    Upload data to MySQL using batched multi-row INSERT ... ON DUPLICATE KEY UPDATE.
+
+    With track_counts, the rows added per date are recorded in the count table
+    within the same transaction. A failure is raised after the rollback, so the
+    task can retry it.
+    """
+    colnames = df.columns.tolist()
+    records = df_to_records(df)
+    logger.info(f"Upserting {len(records)} rows into {table} with batch size {batch_size}")
+    if track_counts:
+        counts.ensure_count_table(mysql_conn)
+    start_time = time.perf_counter()
+    trans = mysql_conn.begin()
+    try:
+        deltas = collections.Counter()
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            if track_counts:
+                deltas.update(counts.count_new_rows(table, colnames, batch, mysql_conn, key_columns))
+            sql = build_upsert_sql(table, colnames, len(batch))
+            params = tuple(value for record in batch for value in record)
+            mysql_conn.execution_options(autocommit=False).execute(sql, params)
+        if track_counts:
+            counts.record_row_counts(table, deltas, mysql_conn)
+        trans.commit()
+    except Exception as e:
+        trans.rollback()
+        logger.error(f"Upsert failed and rolled back: {e}")
+        raise
+    finally:
+        metrics.DB_UPSERT_SECONDS.labels(table).observe(time.perf_counter() - start_time)
+
+
+def update_to_mysql_with_load_data(
+    df: pd.DataFrame,
+    table: str,
+    mysql_conn: engine.base.Connection,
+    track_counts: bool = False,
+    key_columns: typing.Optional[typing.List[str]] = None,
+):
+    """
+    Upload data to MySQL with LOAD DATA LOCAL INFILE into a staging table, merged in one upsert.
+
+    The DataFrame is written to a temporary CSV file and bulk-loaded into a
+    session-private copy of the table, then merged with a single
+    INSERT ... SELECT ... ON DUPLICATE KEY UPDATE. With track_counts, the rows
+    added per date are recorded in the count table within the same transaction.
+    A failure is raised after the rollback, so the task can retry it.
+    """
+    colnames = df.columns.tolist()
+    columns = ", ".join(f"`{col}`" for col in colnames)
+    staging_table = f"{table}_staging"
+    logger.info(f"Bulk loading {len(df)} rows into {table}")
+    if track_counts:
+        counts.ensure_count_table(mysql_conn)
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    start_time = time.perf_counter()
+    try:
+        with os.fdopen(fd, "w", newline="") as f:
+            # Unquoted NULL is read as NULL because fields may be enclosed by quotes.
+            df.to_csv(
+                f,
+                sep="\t",
+                header=False,
+                index=False,
+                na_rep="NULL",
+                lineterminator="\n",
+                quoting=csv.QUOTE_MINIMAL,
+            )
+        # A temporary table cannot be partitioned, so it copies the columns only, not `LIKE` the table.
+        mysql_conn.execute(f"DROP TEMPORARY TABLE IF EXISTS `{staging_table}`")
+        mysql_conn.execute(f"CREATE TEMPORARY TABLE `{staging_table}` SELECT {columns} FROM `{table}` LIMIT 0")
+        trans = mysql_conn.begin()
+        try:
+            mysql_conn.execution_options(autocommit=False).execute(
+                f"""
+                LOAD DATA LOCAL INFILE %s INTO TABLE `{staging_table}`
+                FIELDS TERMINATED BY '\\t' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+                LINES TERMINATED BY '\\n'
+                ({columns})
+                """,
+                (path,),
+            )
+            if track_counts:
+                deltas = counts.count_new_staged_rows(table, staging_table, mysql_conn, key_columns)
+            update_sql = ", ".join(f"`{col}` = VALUES(`{col}`)" for col in colnames)
+            mysql_conn.execution_options(autocommit=False).execute(
+                f"INSERT INTO `{table}` ({columns}) SELECT {columns} FROM `{staging_table}` "
+                f"ON DUPLICATE KEY UPDATE {update_sql}"
+            )
+            if track_counts:
+                counts.record_row_counts(table, deltas, mysql_conn)
+            trans.commit()
+        except Exception as e:
+            trans.rollback()
+            logger.error(f"Bulk load failed and rolled back: {e}")
+            raise
+        mysql_conn.execute(f"DROP TEMPORARY TABLE IF EXISTS `{staging_table}`")
+    finally:
+        os.remove(path)
+        metrics.DB_UPSERT_SECONDS.labels(table).observe(time.perf_counter() - start_time)
+
+
+def is_versioned(table: str) -> bool:
+    """Whether a table is a registered dataset's, whose reads `read.read_table` caches by data version."""
+    return table in {declaration["table"] for declaration in registry.DATASETS.values()}
+
+
+def bump_written_versions(table: str, df: pd.DataFrame, mysql_conn: engine.base.Connection):
+    """
+    Bump the data version of the dates in a DataFrame, so cached reads of them in any process expire.
+
+    Runs in a short transaction of its own once the data is committed, so that
+    concurrent uploads of a date do not hold its version row for their whole upload.
+    """
+    date_column = counts.find_date_column(df.columns.tolist())
+    if date_column is None:
+        return
+    read.ensure_version_table(mysql_conn)
+    with mysql_conn.begin():
+        read.bump_versions(table, df[date_column].astype(str).str[:10], mysql_conn)
+
+
+def df_to_records(df: pd.DataFrame) -> typing.List[tuple]:
+    """
+    Convert a DataFrame to a list of row tuples, replacing NaN with None.
+
+    The `Date` column (a DATE in every table) becomes dates, while other timestamps,
+    such as DATETIME columns, are kept as full datetimes.
+    """
+    date_column = counts.find_date_column(df.columns.tolist())
+    df = df.assign(**{
+        col: df[col].dt.date if col == date_column else pd.Series(df[col].dt.to_pydatetime(), df.index, object)
+        for col in df.select_dtypes("datetime64").columns
+    })
+    df = df.astype(object).where(pd.notnull(df), None)
+    return list(df.itertuples(index=False, name=None))
+
+
+def build_upsert_sql(table: str, colnames: typing.List[str], n_rows: int) -> str:
+    """Build a parameterized multi-row upsert statement for n_rows rows."""
+    columns = ", ".join(f"`{col}`" for col in colnames)
+    placeholders = "({})".format(", ".join(["%s"] * len(colnames)))
+    values = ", ".join([placeholders] * n_rows)
+    update_sql = ", ".join(f"`{col}` = VALUES(`{col}`)" for col in colnames)
+    return f"INSERT INTO `{table}` ({columns}) VALUES {values} ON DUPLICATE KEY UPDATE {update_sql}"
+
+
 def build_update_sql(colnames: typing.List[str], values: typing.List[str]) -> str:
     """Build the SQL statement for updating data."""
     update_sql = ", ".join(
@@ -56,7 +223,7 @@ def build_df_update_sql(table: str, df: pd.DataFrame) -> typing.List[str]:
 
 
 def commit(sql: typing.Union[str, typing.List[str]], mysql_conn: engine.base.Connection):
-    """Execute the given SQL statements and commit the transaction."""
+    """Execute the given SQL statements and commit the transaction, raising any failure after the rollback."""
     logger.info("Committing SQL transaction")
     trans = mysql_conn.begin()
     try:
@@ -69,16 +236,73 @@ def commit(sql: typing.Union[str, typing.List[str]], mysql_conn: engine.base.Con
     except Exception as e:
         trans.rollback()
         logger.error(f"Transaction failed and rolled back: {e}")
+        raise
 
 
-def query(sql: str, mysql_conn: engine.base.Connection):
-    """Execute a query and return the results."""
-    result = mysql_conn.execute(sql)
+def query(sql: str, mysql_conn: engine.base.Connection, params: typing.Optional[tuple] = None):
+    """Execute a query, optionally with %s-style parameters, and return the results."""
+    result = mysql_conn.execute(sql, params) if params else mysql_conn.execute(sql)
     return result.fetchall()
 
 
-def upload_data(df: pd.DataFrame, table: str, mysql_conn: engine.base.Connection):
-    """Upload data to MySQL, handling duplicate entries appropriately."""
-    if not df.empty:
+def split_by_date(df: pd.DataFrame) -> typing.List[pd.DataFrame]:
+    """Split a DataFrame into one chunk per value of its `Date` column (matched case-insensitively)."""
+    column = counts.find_date_column(df.columns.tolist())
+    if column is None or df.empty:
+        return [df]
+    return [chunk for _, chunk in df.groupby(column, sort=False)]
+
+
+def choose_upload_method(n_rows: int) -> str:
+    """"load" for uploads of at least BULK_LOAD_THRESHOLD rows (unless it is 0), "upsert" below."""
+    return "load" if 0 < BULK_LOAD_THRESHOLD <= n_rows else "upsert"
+
+
+def upload_data(
+    df: pd.DataFrame,
+    table: str,
+    mysql_conn: engine.base.Connection,
+    method: str = "auto",
+    batch_size: int = UPSERT_BATCH_SIZE,
+    track_counts: bool = False,
+    key_columns: typing.Optional[typing.List[str]] = None,
+):
+    """
+    Upload data to MySQL, handling duplicate entries appropriately.
+
+    Parameters:
+    - method: "upsert" for batched multi-row upserts, "load" for LOAD DATA
+      LOCAL INFILE through a staging table, "auto" for "load" from
+      BULK_LOAD_THRESHOLD rows and "upsert" below, or "pandas" to try
+      pandas `to_sql` first and fall back to per-row SQL on duplicates.
+    - batch_size: Number of rows per statement in "upsert" mode.
+    - track_counts: Record the rows added per date in the count table
+      (`counts.COUNT_TABLE`), in the same transaction. "upsert" and "load" modes only.
+    - key_columns: The table's primary key, for track_counts; looked up from the table if not given.
+
+    For registered dataset tables, the data version of the written dates is
+    bumped once the data is committed, expiring cached reads of them
+    (`read.cache`) in every process. They are dropped from this process's cache.
+    A failed transaction is rolled back and its error raised, so that retryable
+    database errors (`retry.is_retryable`) reach the task's retry policy.
+    """
+    if df.empty:
+        return
+    if method == "auto":
+        method = choose_upload_method(len(df))
+    if method == "load":
+        update_to_mysql_with_load_data(df, table, mysql_conn, track_counts, key_columns)
+    elif method == "upsert":
+        update_to_mysql_with_upsert(df, table, mysql_conn, batch_size, track_counts, key_columns)
+    elif method == "pandas":
         if not update_to_mysql_with_pandas(df, table, mysql_conn):
-            update_to_mysql_with_sql(df, table, mysql_conn)
\ No newline at end of file
+            update_to_mysql_with_sql(df, table, mysql_conn)
+    else:
+        raise ValueError(f"Unknown upload method: {method}")
+
+    if is_versioned(table):
+        bump_written_versions(table, df, mysql_conn)
+
+    date_column = counts.find_date_column(df.columns.tolist())
+    if date_column is not None:
+        read.cache.invalidate(table, set(df[date_column].astype(str).str[:10]))
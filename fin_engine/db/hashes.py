@@ -0,0 +1,148 @@
+import hashlib
+import json
+import typing
+import zlib
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from sqlalchemy import engine
+
+from fin_engine.db import counts
+
+# Content hash of the data last uploaded per dataset, date and data source, kept in
+# the monitor DB so that re-crawling unchanged data does not rewrite the data tables.
+# Delete a row to force the next upload of that date to be written again.
+HASH_TABLE = "UploadHash"
+
+_hash_table_ready: typing.Set[int] = set()
+
+
+def ensure_hash_table(mysql_conn: engine.base.Connection):
+    """Create the hash table once per connection's engine."""
+    if id(mysql_conn.engine) in _hash_table_ready:
+        return
+    mysql_conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS `{HASH_TABLE}` (
+            dataset_name VARCHAR(50) NOT NULL,
+            date DATE NOT NULL,
+            data_source VARCHAR(50) NOT NULL,
+            hash CHAR(64) NOT NULL,
+            row_hashes MEDIUMBLOB NULL,
+            SYS_UPDATE_TIME DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (dataset_name, date, data_source)
+        )
+        """
+    )
+    _hash_table_ready.add(id(mysql_conn.engine))
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """A 64-bit hash of every row's values."""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def frame_hash(df: pd.DataFrame, hashes: np.ndarray) -> str:
+    """Hash of a DataFrame's columns, types and rows, whatever the row order."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[col, str(dtype)] for col, dtype in df.dtypes.items()]).encode())
+    digest.update(np.sort(hashes).tobytes())
+    return digest.hexdigest()
+
+
+def row_keys(df: pd.DataFrame, key_columns: typing.List[str]) -> typing.List[str]:
+    """The primary key of every row, as one string."""
+    return df[key_columns].astype(str).agg("\x1f".join, axis=1).tolist()
+
+
+def get_hash(
+    dataset: str,
+    date: str,
+    data_source: str,
+    mysql_conn: engine.base.Connection,
+) -> typing.Tuple[typing.Optional[str], typing.Optional[typing.Dict[str, int]]]:
+    """The stored frame hash and row hashes (by primary key) of an upload, or None."""
+    ensure_hash_table(mysql_conn)
+    row = mysql_conn.execute(
+        f"SELECT hash, row_hashes FROM `{HASH_TABLE}` WHERE dataset_name = %s AND date = %s AND data_source = %s",
+        (dataset, date, data_source),
+    ).fetchone()
+    if row is None:
+        return None, None
+    stored_hash, stored_rows = row
+    return stored_hash, json.loads(zlib.decompress(stored_rows)) if stored_rows else None
+
+
+def save_hash(
+    dataset: str,
+    date: str,
+    data_source: str,
+    hash_value: str,
+    rows: typing.Optional[typing.Dict[str, int]],
+    mysql_conn: engine.base.Connection,
+):
+    """Store the hashes of an upload."""
+    ensure_hash_table(mysql_conn)
+    blob = zlib.compress(json.dumps(rows).encode()) if rows is not None else None
+    mysql_conn.execute(
+        f"""
+        INSERT INTO `{HASH_TABLE}` (dataset_name, date, data_source, hash, row_hashes)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE hash = VALUES(hash), row_hashes = VALUES(row_hashes)
+        """,
+        (dataset, date, data_source, hash_value, blob),
+    )
+
+
+def changed_rows(
+    df: pd.DataFrame,
+    dataset: str,
+    data_source: str,
+    mode: str,
+    key_columns: typing.List[str],
+    monitor_conn: engine.base.Connection,
+    force: bool = False,
+) -> typing.Tuple[pd.DataFrame, typing.Callable[[], None]]:
+    """
+    The rows of one date's upload that differ from the last upload of the same source.
+
+    Parameters:
+    - df: The cleaned data of a single date.
+    - dataset: The dataset name.
+    - data_source: The source of the rows.
+    - mode: "frame" to skip the upload when the whole frame is unchanged,
+      "rows" to also keep only the new or changed rows, "off" to keep everything.
+    - key_columns: The dataset's primary key, which identifies rows in "rows" mode.
+    - monitor_conn: A monitor connection, where the hashes are kept.
+    - force: Keep every row, as for a forced re-crawl, but still store the new hashes.
+
+    Returns the rows to write, and a callback that stores the new hashes once
+    they are written.
+    """
+    date_column = counts.find_date_column(df.columns.tolist())
+    if mode == "off" or df.empty or date_column is None:
+        return df, lambda: None
+    date = str(df[date_column].iloc[0])[:10]
+    hashes = row_hashes(df)
+    new_hash = frame_hash(df, hashes)
+    stored_hash, stored_rows = get_hash(dataset, date, data_source, monitor_conn)
+
+    new_rows = None
+    if mode == "rows":
+        keys = row_keys(df, key_columns)
+        new_rows = dict(zip(keys, hashes.tolist()))
+
+    def save():
+        save_hash(dataset, date, data_source, new_hash, new_rows, monitor_conn)
+
+    if force:
+        return df, save
+    if new_hash == stored_hash:
+        logger.info(f"{dataset} {date} {data_source} unchanged, skipping {len(df)} rows")
+        return df.iloc[0:0], lambda: None
+    if new_rows is not None and stored_rows is not None:
+        changed = [stored_rows.get(key) != value for key, value in new_rows.items()]
+        logger.info(f"{dataset} {date} {data_source}: {sum(changed)} of {len(df)} rows changed")
+        return df[changed], save
+    return df, save
@@ -0,0 +1,149 @@
+import datetime
+import typing
+
+from loguru import logger
+from sqlalchemy import engine
+
+from fin_engine.config import PARTITION_AHEAD, PARTITION_INTERVAL
+
+INTERVALS = ("year", "month")
+
+
+def list_partitions(table: str, mysql_conn: engine.base.Connection) -> typing.List[str]:
+    """Partition names of a table in the connection's database, in range order."""
+    return [partition["name"] for partition in get_partitions(table, mysql_conn)]
+
+
+def get_partitions(table: str, mysql_conn: engine.base.Connection) -> typing.List[dict]:
+    """Name, method, expression and upper bound (`LESS THAN` value) of each partition of a table, in range order."""
+    rows = mysql_conn.execute(
+        """
+        SELECT PARTITION_NAME, PARTITION_METHOD, PARTITION_EXPRESSION, PARTITION_DESCRIPTION
+        FROM INFORMATION_SCHEMA.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+        """,
+        (table,),
+    ).fetchall()
+    return [
+        dict(name=name, method=method, expression=expression, description=description)
+        for name, method, expression, description in rows
+    ]
+
+
+def table_interval(partitions: typing.List[dict]) -> typing.Optional[str]:
+    """The interval a table is partitioned by: "year" for RANGE(YEAR(Date)), "month" for RANGE COLUMNS(Date)."""
+    if not partitions:
+        return None
+    method = partitions[0]["method"]
+    expression = (partitions[0]["expression"] or "").lower().replace("`", "")
+    if method == "RANGE" and expression == "year(date)":
+        return "year"
+    if method == "RANGE COLUMNS" and expression == "date":
+        return "month"
+    return None
+
+
+def parse_bound(description: str, interval: str) -> typing.Optional[datetime.date]:
+    """The first date excluded by a partition, or None for the MAXVALUE catch-all."""
+    if description == "MAXVALUE":
+        return None
+    if interval == "year":
+        return datetime.date(int(description), 1, 1)
+    return datetime.date.fromisoformat(description.strip("'"))
+
+
+def next_bound(bound: datetime.date, interval: str) -> datetime.date:
+    """The start of the interval after the one starting at `bound`."""
+    if interval == "year":
+        return datetime.date(bound.year + 1, 1, 1)
+    return datetime.date(bound.year + bound.month // 12, bound.month % 12 + 1, 1)
+
+
+def interval_start(date: datetime.date, interval: str) -> datetime.date:
+    """The start of the interval containing a date."""
+    return datetime.date(date.year, 1, 1) if interval == "year" else date.replace(day=1)
+
+
+def partition_definition(start: datetime.date, interval: str) -> str:
+    """The definition of the partition holding the interval that starts at `start`."""
+    end = next_bound(start, interval)
+    if interval == "year":
+        return f"PARTITION p{start.year} VALUES LESS THAN ({end.year})"
+    return f"PARTITION p{start:%Y%m} VALUES LESS THAN ('{end}')"
+
+
+def plan_partitions(
+    partitions: typing.List[dict],
+    interval: str,
+    today: datetime.date,
+    ahead: int = PARTITION_AHEAD,
+) -> typing.List[str]:
+    """Definitions of the partitions missing between the last bound and `ahead` intervals after today."""
+    bounds = [parse_bound(partition["description"], interval) for partition in partitions]
+    bounds = [bound for bound in bounds if bound is not None]
+    if not bounds:
+        return []
+    target = interval_start(today, interval)
+    for _ in range(ahead):
+        target = next_bound(target, interval)
+
+    definitions = []
+    start = max(bounds)
+    while start <= target:
+        definitions.append(partition_definition(start, interval))
+        start = next_bound(start, interval)
+    return definitions
+
+
+def build_add_partitions_sql(table: str, definitions: typing.List[str], catch_all: typing.Optional[str]) -> str:
+    """ALTER TABLE adding partitions, splitting them out of the MAXVALUE partition if the table has one."""
+    if catch_all is None:
+        return "ALTER TABLE `{}` ADD PARTITION ({})".format(table, ", ".join(definitions))
+    return "ALTER TABLE `{}` REORGANIZE PARTITION `{}` INTO ({}, PARTITION `{}` VALUES LESS THAN MAXVALUE)".format(
+        table, catch_all, ", ".join(definitions), catch_all
+    )
+
+
+def maintain_partitions(
+    table: str,
+    mysql_conn: engine.base.Connection,
+    interval: str = PARTITION_INTERVAL,
+    ahead: int = PARTITION_AHEAD,
+    today: typing.Optional[datetime.date] = None,
+) -> typing.List[str]:
+    """
+    Create the partitions a table needs up to `ahead` intervals after today.
+
+    New rows then always land in their own small partition, instead of failing
+    for lack of one or piling up in a MAXVALUE partition that cannot be pruned.
+
+    Parameters:
+    - table: The range-partitioned table.
+    - mysql_conn: A connection to the table's database.
+    - interval: "year" or "month"; it must match how the table is partitioned.
+    - ahead: Number of future intervals to create in advance.
+    - today: The reference date, today by default.
+
+    Returns the definitions of the created partitions.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"Unknown partition interval: {interval}")
+    partitions = get_partitions(table, mysql_conn)
+    if not partitions:
+        logger.warning(f"{table} is not partitioned, nothing to maintain")
+        return []
+    if table_interval(partitions) != interval:
+        logger.error(
+            f"{table} is partitioned by {partitions[0]['method']} {partitions[0]['expression']}, "
+            f"which does not match the {interval} interval"
+        )
+        return []
+
+    definitions = plan_partitions(partitions, interval, today or datetime.date.today(), ahead)
+    if not definitions:
+        return []
+    catch_all = next((p["name"] for p in partitions if p["description"] == "MAXVALUE"), None)
+    mysql_conn.execute(build_add_partitions_sql(table, definitions, catch_all))
+    logger.info(f"Added {len(definitions)} partitions to {table}: {definitions}")
+    return definitions
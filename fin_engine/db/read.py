@@ -0,0 +1,240 @@
+import collections
+import threading
+import typing
+
+import pandas as pd
+from sqlalchemy import engine
+
+from fin_engine.config import READ_CACHE_MAX_BYTES, READ_CHUNK_SIZE
+from fin_engine.schema import SCHEMAS
+
+
+# Write counter per table and date, bumped in every upload transaction. Readers in any
+# process compare it with the version their cached results were read at.
+VERSION_TABLE = "DatasetVersion"
+
+_version_table_ready: typing.Set[int] = set()
+
+
+class FrameCache:
+    """LRU cache of query results, bounded by their total memory size, kept with the data version they were read at."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.entries: typing.OrderedDict[tuple, typing.Tuple[pd.DataFrame, int, int]] = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: tuple, version: int) -> typing.Optional[pd.DataFrame]:
+        """A cached result, unless it is missing or was read at another version of the data."""
+        with self.lock:
+            if key not in self.entries:
+                return None
+            df, nbytes, cached_version = self.entries[key]
+            if cached_version != version:
+                del self.entries[key]
+                self.nbytes -= nbytes
+                return None
+            self.entries.move_to_end(key)
+            return df.copy()
+
+    def put(self, key: tuple, df: pd.DataFrame, version: int):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.nbytes -= self.entries.pop(key)[1]
+            self.entries[key] = (df.copy(), nbytes, version)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                self.nbytes -= self.entries.popitem(last=False)[1][1]
+
+    def invalidate(self, table: str, dates: typing.Iterable[str]):
+        """Drop the cached results of a table whose date range covers any of the dates."""
+        dates = sorted(dates)
+        if not dates:
+            return
+        with self.lock:
+            for key in list(self.entries):
+                key_table, _, start_date, end_date, _ = key
+                if key_table == table and any(start_date <= date <= end_date for date in dates):
+                    self.nbytes -= self.entries.pop(key)[1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+
+cache = FrameCache(READ_CACHE_MAX_BYTES)
+
+
+def ensure_version_table(mysql_conn: engine.base.Connection):
+    """Create the version table once per connection's engine (DDL would end an open transaction)."""
+    if id(mysql_conn.engine) in _version_table_ready:
+        return
+    mysql_conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS `{VERSION_TABLE}` (
+            dataset_name VARCHAR(50) NOT NULL,
+            date DATE NOT NULL,
+            version BIGINT NOT NULL,
+            PRIMARY KEY (dataset_name, date)
+        )
+        """
+    )
+    _version_table_ready.add(id(mysql_conn.engine))
+
+
+def bump_versions(table: str, dates: typing.Iterable[str], mysql_conn: engine.base.Connection):
+    """Mark dates of a table as written; call once the written data is committed."""
+    dates = sorted(set(dates))
+    if not dates:
+        return
+    values = ", ".join(["(%s, %s, 1)"] * len(dates))
+    mysql_conn.execute(
+        f"""
+        INSERT INTO `{VERSION_TABLE}` (dataset_name, date, version) VALUES {values}
+        ON DUPLICATE KEY UPDATE version = version + 1
+        """,
+        tuple(value for date in dates for value in (table, date)),
+    )
+
+
+def data_version(table: str, start_date: str, end_date: str, mysql_conn: engine.base.Connection) -> int:
+    """A number that grows whenever any date of a table's range is written."""
+    ensure_version_table(mysql_conn)
+    row = mysql_conn.execute(
+        f"SELECT COALESCE(SUM(version), 0) FROM `{VERSION_TABLE}` WHERE dataset_name = %s AND date BETWEEN %s AND %s",
+        (table, start_date, end_date),
+    ).fetchone()
+    return int(row[0])
+
+
+def stream_chunks(
+    sql: str,
+    params: tuple,
+    mysql_conn: engine.base.Connection,
+    dtypes: typing.Dict[str, str],
+    chunk_size: int = READ_CHUNK_SIZE,
+) -> typing.Iterator[pd.DataFrame]:
+    """
+    Run a query through an unbuffered server-side cursor and yield typed DataFrame chunks.
+
+    Only `chunk_size` rows are held at a time. Categorical columns are left as
+    plain values so that every chunk has the same types. An empty result yields
+    one empty chunk, so callers still see the columns.
+    """
+    streaming_conn = mysql_conn.execution_options(stream_results=True)
+    result = streaming_conn.execute(sql, params) if params else streaming_conn.execute(sql)
+    columns = list(result.keys())
+    types = {col: dtypes[col] for col in columns if dtypes.get(col, "category") != "category"}
+    try:
+        rows = result.fetchmany(chunk_size)
+        while True:
+            yield pd.DataFrame.from_records(rows, columns=columns).astype(types)
+            rows = result.fetchmany(chunk_size)
+            if not rows:
+                break
+    finally:
+        result.close()
+
+
+def stream_frame(
+    sql: str,
+    params: tuple,
+    mysql_conn: engine.base.Connection,
+    dtypes: typing.Dict[str, str],
+    chunk_size: int = READ_CHUNK_SIZE,
+) -> pd.DataFrame:
+    """
+    Run a query through an unbuffered server-side cursor and build a typed DataFrame.
+
+    Each chunk is converted to typed columns as it arrives, so the raw row
+    tuples of the full result never sit in memory.
+    """
+    df = pd.concat(stream_chunks(sql, params, mysql_conn, dtypes, chunk_size), ignore_index=True)
+    return df.astype({col: dtypes[col] for col in df.columns if col in dtypes})
+
+
+def read_table(
+    table: str,
+    id_column: str,
+    ids: typing.Optional[typing.List[str]],
+    start_date: str,
+    end_date: str,
+    columns: typing.Optional[typing.List[str]],
+    mysql_conn: engine.base.Connection,
+) -> pd.DataFrame:
+    """
+    Read the rows of some IDs over a date range from a FinancialData table, through the cache.
+
+    A cached result is served only while the range's `data_version` is
+    unchanged, so a write from any process is seen by the next read.
+    """
+    dtypes = SCHEMAS[table]
+    columns = list(columns) if columns else list(dtypes)
+    unknown = [col for col in columns if col not in dtypes]
+    if unknown:
+        raise ValueError(f"Unknown columns for {table}: {unknown}")
+    ids = sorted(set(ids)) if ids else []
+
+    key = (table, tuple(ids), str(start_date), str(end_date), tuple(columns))
+    # Read before the rows: a write in between only makes the next read fetch again.
+    version = data_version(table, start_date, end_date, mysql_conn) if cache.max_bytes > 0 else 0
+    df = cache.get(key, version)
+    if df is not None:
+        return df
+
+    # The literal Date range lets MySQL prune the yearly partitions.
+    sql = "SELECT {} FROM `{}` WHERE `Date` BETWEEN %s AND %s".format(
+        ", ".join(f"`{col}`" for col in columns), table
+    )
+    params = (start_date, end_date)
+    if ids:
+        sql += " AND `{}` IN ({})".format(id_column, ", ".join(["%s"] * len(ids)))
+        params += tuple(ids)
+    df = stream_frame(sql, params, mysql_conn, dtypes)
+    cache.put(key, df, version)
+    return df
+
+
+def get_prices(
+    stock_ids: typing.Optional[typing.List[str]],
+    start_date: str,
+    end_date: str,
+    mysql_conn: engine.base.Connection,
+    columns: typing.Optional[typing.List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Daily prices of stocks over a date range, from `taiwan_stock_price`.
+
+    Parameters:
+    - stock_ids: The stocks to read; every stock when empty or None.
+    - start_date: The first date, inclusive.
+    - end_date: The last date, inclusive.
+    - mysql_conn: A FinancialData connection.
+    - columns: The columns to read; every column when omitted.
+    """
+    return read_table("taiwan_stock_price", "StockID", stock_ids, start_date, end_date, columns, mysql_conn)
+
+
+def get_futures(
+    futures_ids: typing.Optional[typing.List[str]],
+    start_date: str,
+    end_date: str,
+    mysql_conn: engine.base.Connection,
+    columns: typing.Optional[typing.List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Daily futures quotes over a date range, from `taiwan_futures_daily`.
+
+    Parameters:
+    - futures_ids: The futures to read; every future when empty or None.
+    - start_date: The first date, inclusive.
+    - end_date: The last date, inclusive.
+    - mysql_conn: A FinancialData connection.
+    - columns: The columns to read; every column when omitted.
+    """
+    return read_table("taiwan_futures_daily", "FuturesID", futures_ids, start_date, end_date, columns, mysql_conn)
@@ -1,4 +1,5 @@
-import time
+import os
+import threading
 import typing
 
 from loguru import logger
@@ -6,47 +7,59 @@ from sqlalchemy import engine
 from fin_engine.db import clients
 
 
-def check_alive(connection: engine.base.Connection):
-    """Check if the database connection is alive by executing a simple query."""
-    connection.execute("SELECT 1 + 1")
+def check_connect_alive(
+    connection: typing.Optional[engine.base.Connection],
+    connect_func: typing.Callable,
+) -> engine.base.Connection:
+    """
+    Return the connection if it is usable, otherwise check out a new one.
 
-
-def check_connect_alive(connection: engine.base.Connection, connect_func: typing.Callable) -> engine.base.Connection:
-    """Check if the connection is alive, and if not, attempt to reconnect."""
-    if connection:
-        try:
-            check_alive(connection)
-            return connection
-        except Exception as e:
-            logger.info(f"{connect_func.__name__} reconnect, error: {e}")
-            time.sleep(1)
-            try:
-                connection = connect_func()
-            except Exception as e:
-                logger.info(f"{connect_func.__name__} connect error, error: {e}")
-            return check_connect_alive(connection, connect_func)
+    No round trip is made here: the pool pings a connection with
+    `pool_pre_ping` when it is checked out, and SQLAlchemy invalidates a
+    connection whose statement failed with a disconnect error.
+    """
+    if connection is None or connection.closed or connection.invalidated:
+        if connection is not None:
+            logger.info(f"{connect_func.__name__} reconnect")
+        connection = connect_func()
+    return connection
 
 
 class Router:
+    """
+    Lazily hand out one pooled connection per database for the current thread.
+
+    Connections are thread-local, so concurrent scheduler jobs never share one.
+    A connection is held until `close_connection`, which long-running
+    processes call after each unit of work (a Celery task, a scheduler job)
+    on the thread that ran it: the pool only validates connections when they
+    are checked out.
+    """
+
     def __init__(self):
-        self._mysql_financialdata_conn = clients.get_mysql_financialdata_conn()
-        self._mysql_monitor_conn = clients.get_mysql_monitor_conn()
+        self._local = threading.local()
+
+    def _connections(self) -> typing.Dict[str, engine.base.Connection]:
+        """This thread's connections by database, forgetting those inherited from a parent process."""
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            # Do not close them: that would talk to the parent's sockets.
+            local.pid = os.getpid()
+            local.connections = {}
+        return local.connections
+
+    def _check_connect_alive(self, name: str, connect_func: typing.Callable) -> engine.base.Connection:
+        connections = self._connections()
+        connections[name] = check_connect_alive(connections.get(name), connect_func)
+        return connections[name]
 
     def check_mysql_financialdata_conn_alive(self) -> engine.base.Connection:
-        """Check and maintain the MySQL financial data connection."""
-        self._mysql_financialdata_conn = check_connect_alive(
-            self._mysql_financialdata_conn,
-            clients.get_mysql_financialdata_conn,
-        )
-        return self._mysql_financialdata_conn
+        """Check and maintain this thread's MySQL financial data connection."""
+        return self._check_connect_alive("financialdata", clients.get_mysql_financialdata_conn)
 
     def check_mysql_monitor_conn_alive(self) -> engine.base.Connection:
-        """Check and maintain the MySQL monitor connection."""
-        self._mysql_monitor_conn = check_connect_alive(
-            self._mysql_monitor_conn,
-            clients.get_mysql_monitor_conn,
-        )
-        return self._mysql_monitor_conn
+        """Check and maintain this thread's MySQL monitor connection."""
+        return self._check_connect_alive("monitor", clients.get_mysql_monitor_conn)
 
     @property
     def mysql_financialdata_conn(self) -> engine.base.Connection:
@@ -59,5 +72,8 @@ class Router:
         return self.check_mysql_monitor_conn_alive()
 
     def close_connection(self):
-        """Close the MySQL financial data connection."""
-        self._mysql_financialdata_conn.close()
+        """Return this thread's MySQL connections to their pools."""
+        connections = self._connections()
+        for connection in connections.values():
+            connection.close()
+        connections.clear()
@@ -0,0 +1,437 @@
+import argparse
+import datetime
+import json
+import typing
+import zlib
+
+import pandas as pd
+import pyarrow.dataset as ds
+from loguru import logger
+from sqlalchemy import engine
+
+from fin_engine import db, registry, storage
+from fin_engine.config import STORAGE_SINKS, UPSERT_BATCH_SIZE
+from fin_engine.db import read
+
+SHORT_WINDOW = 5
+LONG_WINDOW = 20
+# Calendar days read before a recomputed date, enough for LONG_WINDOW trading days across the longest holidays.
+LOOKBACK_DAYS = LONG_WINDOW * 2 + 10
+
+# Derived table of each dataset and the column identifying its series.
+DERIVED: typing.Dict[str, dict] = {
+    "taiwan_stock_price": dict(table="taiwan_stock_price_derived", series="StockID"),
+    "taiwan_futures_daily": dict(table="taiwan_futures_daily_derived", series="FuturesID"),
+}
+# Where past rows are read back from to recompute a dataset. The futures table keeps one row
+# per (FuturesID, Date), dropping the other contracts and sessions the basis and front month
+# are picked from, so futures are only recomputed from the Parquet store, which keeps them all.
+RECOMPUTE_SOURCES: typing.Dict[str, str] = {
+    "taiwan_stock_price": "mysql",
+    "taiwan_futures_daily": "parquet",
+}
+# Columns of every derived table after its series column, with the Basis of futures only.
+INDICATORS = ["Close", "Return", f"MA{SHORT_WINDOW}", f"MA{LONG_WINDOW}", f"VolumeZ{LONG_WINDOW}"]
+
+# The last LONG_WINDOW inputs of every series, so new dates are computed without reading history again.
+STATE_TABLE = "DerivedState"
+# Dates whose derived metrics failed to update, until `recompute_pending` catches them up.
+PENDING_TABLE = "DerivedPending"
+
+_tables_ready: typing.Set[tuple] = set()
+
+
+def ensure_tables(dataset: str, mysql_conn: engine.base.Connection):
+    """Create a dataset's derived table and the state table once per connection's engine."""
+    if (dataset, id(mysql_conn.engine)) in _tables_ready:
+        return
+    spec = DERIVED[dataset]
+    columns = "".join(f"`{col}` DOUBLE NULL, " for col in output_columns(dataset)[2:])
+    mysql_conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS `{spec['table']}` (
+            `{spec['series']}` VARCHAR(30) NOT NULL,
+            `Date` DATE NOT NULL,
+            {columns}
+            PRIMARY KEY (`{spec['series']}`, `Date`)
+        )
+        """
+    )
+    mysql_conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS `{STATE_TABLE}` (
+            dataset_name VARCHAR(50) NOT NULL,
+            series_id VARCHAR(30) NOT NULL,
+            last_date DATE NOT NULL,
+            `window` MEDIUMBLOB NOT NULL,
+            SYS_UPDATE_TIME DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (dataset_name, series_id)
+        )
+        """
+    )
+    mysql_conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS `{PENDING_TABLE}` (
+            dataset_name VARCHAR(50) NOT NULL,
+            date DATE NOT NULL,
+            error TEXT NULL,
+            SYS_UPDATE_TIME DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (dataset_name, date)
+        )
+        """
+    )
+    _tables_ready.add((dataset, id(mysql_conn.engine)))
+
+
+def output_columns(dataset: str) -> typing.List[str]:
+    """Columns of a dataset's derived table."""
+    columns = [DERIVED[dataset]["series"], "Date"] + INDICATORS
+    return columns + ["Basis"] if dataset == "taiwan_futures_daily" else columns
+
+
+def output_dtypes(dataset: str) -> typing.Dict[str, str]:
+    """Column dtypes of a dataset's derived table when read back."""
+    series, _, *indicators = output_columns(dataset)
+    return {series: "category", "Date": "datetime64[ns]", **{col: "float64" for col in indicators}}
+
+
+def stock_inputs(df: pd.DataFrame) -> pd.DataFrame:
+    """Close and volume of each stock and date, leaving out days without a trade."""
+    df = df[df["Close"] > 0]
+    return pd.DataFrame(
+        {
+            "series": df["StockID"].astype(str).to_numpy(),
+            "Date": pd.to_datetime(df["Date"]).to_numpy(),
+            "Close": df["Close"].astype("float64").to_numpy(),
+            "Volume": df["TradeVolume"].astype("float64").to_numpy(),
+        }
+    )
+
+
+def futures_inputs(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Front-month settlement price, volume and basis of each futures and date, from the regular session.
+
+    The spot index is not stored, so Basis is the calendar basis: the
+    next-month settlement price minus the front-month one. Volume adds up
+    every monthly contract, so it does not collapse when the front month rolls.
+    """
+    contract = df["ContractDate"].astype(str).str.strip()
+    regular = df["TradingSession"].astype(str) == "Regular"
+    df = df[regular & contract.str.fullmatch(r"\d{6}") & (df["SettlementPrice"] > 0)]
+    df = pd.DataFrame(
+        {
+            "series": df["FuturesID"].astype(str).to_numpy(),
+            "Date": pd.to_datetime(df["Date"]).to_numpy(),
+            "Contract": contract[df.index].to_numpy(),
+            "Settlement": df["SettlementPrice"].astype("float64").to_numpy(),
+            "Volume": df["Volume"].astype("float64").to_numpy(),
+        }
+    ).sort_values(["series", "Date", "Contract"])
+    groups = df.groupby(["series", "Date"], sort=False)
+    rank = groups.cumcount()
+    front = df[rank == 0].set_index(["series", "Date"])["Settlement"]
+    following = df[rank == 1].set_index(["series", "Date"])["Settlement"]
+    return pd.DataFrame(
+        {
+            "Close": front,
+            "Volume": groups["Volume"].sum(),
+            "Basis": following.reindex(front.index) - front,
+        }
+    ).reset_index()
+
+
+INPUTS: typing.Dict[str, typing.Callable[[pd.DataFrame], pd.DataFrame]] = {
+    "taiwan_stock_price": stock_inputs,
+    "taiwan_futures_daily": futures_inputs,
+}
+
+
+class RecomputeError(RuntimeError):
+    """The past rows of a dataset cannot be read back to recompute its derived metrics."""
+
+
+def can_recompute(dataset: str) -> bool:
+    """Whether the source a dataset is recomputed from is being written."""
+    return RECOMPUTE_SOURCES[dataset] in STORAGE_SINKS
+
+
+def read_inputs(
+    dataset: str,
+    series: typing.Optional[typing.List[str]],
+    start_date: str,
+    end_date: str,
+    mysql_conn: engine.base.Connection,
+) -> pd.DataFrame:
+    """The series inputs of a date range, read back from the dataset's recompute source."""
+    if not can_recompute(dataset):
+        raise RecomputeError(
+            f"{dataset} is recomputed from the {RECOMPUTE_SOURCES[dataset]} sink, which is not in STORAGE_SINKS"
+        )
+    spec = DERIVED[dataset]
+    if RECOMPUTE_SOURCES[dataset] == "parquet":
+        row_filter = ds.field(spec["series"]).isin(series) if series else None
+        df = storage.read(dataset, start_date=start_date, end_date=end_date, filter=row_filter)
+    else:
+        df = read.read_table(
+            registry.get(dataset).table, spec["series"], series, start_date, end_date, None, mysql_conn
+        )
+    return INPUTS[dataset](df)
+
+
+def compute(history: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the indicators to every row of a frame of series inputs.
+
+    Rolling windows run over the whole column at once, sorted by series and
+    date, and are masked where they would reach into the previous series, so
+    no Python code runs per series.
+    """
+    history = history.sort_values(["series", "Date"], kind="stable").reset_index(drop=True)
+    position = history.groupby("series", sort=False).cumcount()
+    close = history["Close"]
+    volume = history["Volume"]
+    history["Return"] = (close / close.shift(1) - 1).where(position >= 1)
+    for window in (SHORT_WINDOW, LONG_WINDOW):
+        history[f"MA{window}"] = close.rolling(window).mean().where(position >= window - 1)
+    mean = volume.rolling(LONG_WINDOW).mean()
+    std = volume.rolling(LONG_WINDOW).std()
+    history[f"VolumeZ{LONG_WINDOW}"] = ((volume - mean) / std).where((position >= LONG_WINDOW - 1) & (std > 0))
+    return history
+
+
+def load_state(
+    dataset: str,
+    series: typing.Optional[typing.List[str]],
+    mysql_conn: engine.base.Connection,
+) -> pd.DataFrame:
+    """
+    The stored input windows of some series of a dataset (all of them if None), as one frame.
+
+    The rows are read with FOR UPDATE: called within a transaction, they stay
+    locked until it ends, so concurrent updates of a series run one after the other.
+    """
+    sql = f"SELECT `window` FROM `{STATE_TABLE}` WHERE dataset_name = %s"
+    params = (dataset,)
+    if series is not None:
+        if not series:
+            return pd.DataFrame()
+        sql += " AND series_id IN ({})".format(", ".join(["%s"] * len(series)))
+        params += tuple(series)
+    rows = mysql_conn.execute(sql + " FOR UPDATE", params).fetchall()
+    frames = [pd.DataFrame(json.loads(zlib.decompress(window))) for window, in rows]
+    if not frames:
+        return pd.DataFrame()
+    state = pd.concat(frames, ignore_index=True)
+    state["Date"] = pd.to_datetime(state["Date"])
+    return state
+
+
+def save_state(dataset: str, history: pd.DataFrame, mysql_conn: engine.base.Connection):
+    """Store the last LONG_WINDOW inputs of every series in a frame of inputs."""
+    windows = history.groupby("series", sort=False).tail(LONG_WINDOW)
+    windows = windows.assign(Date=windows["Date"].dt.strftime("%Y-%m-%d"))
+    records = []
+    for series_id, window in windows.groupby("series", sort=False):
+        blob = zlib.compress(json.dumps(window.to_dict(orient="list")).encode())
+        records.append((dataset, series_id, window["Date"].iloc[-1], blob))
+    if records:
+        mysql_conn.execute(
+            f"""
+            INSERT INTO `{STATE_TABLE}` (dataset_name, series_id, last_date, `window`)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE last_date = VALUES(last_date), `window` = VALUES(`window`)
+            """,
+            records,
+        )
+
+
+def write(dataset: str, history: pd.DataFrame, mysql_conn: engine.base.Connection):
+    """Upsert computed rows into a dataset's derived table, in batches, within the caller's transaction."""
+    columns = output_columns(dataset)
+    records = db.df_to_records(history.rename(columns={"series": columns[0]})[columns])
+    for start in range(0, len(records), UPSERT_BATCH_SIZE):
+        batch = records[start:start + UPSERT_BATCH_SIZE]
+        sql = db.build_upsert_sql(DERIVED[dataset]["table"], columns, len(batch))
+        mysql_conn.execute(sql, tuple(value for record in batch for value in record))
+
+
+def update(dataset: str, df: pd.DataFrame, mysql_conn: engine.base.Connection) -> int:
+    """
+    Compute the indicators of newly uploaded rows and store them in the dataset's derived table.
+
+    Each series continues from its stored window, so only the new dates are
+    read and written. A series receiving a date at or before its last stored
+    one (an out-of-order backfill) is recomputed from its RECOMPUTE_SOURCES
+    instead, as the later derived rows depend on it, or left unchanged when
+    that source is not written.
+
+    Parameters:
+    - dataset: The dataset the rows were uploaded to.
+    - df: The uploaded rows, typed as in `schema.SCHEMAS`.
+    - mysql_conn: A FinancialData connection.
+
+    The state rows of the uploaded series are locked until the derived rows
+    and new windows are written, in one transaction.
+
+    Returns the number of derived rows written.
+    """
+    if dataset not in DERIVED or df.empty:
+        return 0
+    ensure_tables(dataset, mysql_conn)
+    inputs = INPUTS[dataset](df)
+    if inputs.empty:
+        return 0
+    # One transaction holding the series' state rows from read to write: a concurrent
+    # update of the same series waits and then starts from this one's window.
+    with mysql_conn.begin():
+        return update_locked(dataset, inputs, mysql_conn)
+
+
+def update_locked(dataset: str, inputs: pd.DataFrame, mysql_conn: engine.base.Connection) -> int:
+    """The body of `update`, run within its transaction."""
+    state = load_state(dataset, inputs["series"].unique().tolist(), mysql_conn)
+
+    late = []
+    if not state.empty:
+        last_dates = state.groupby("series")["Date"].max()
+        first_new = inputs.groupby("series")["Date"].min()
+        late = first_new[first_new <= last_dates.reindex(first_new.index)].index.tolist()
+    written = 0
+    if late:
+        start = inputs.loc[inputs["series"].isin(late), "Date"].min()
+        if can_recompute(dataset):
+            logger.info(f"{dataset}: {len(late)} series received past dates, recomputing them")
+            written += recompute(dataset, start.strftime("%Y-%m-%d"), late, mysql_conn)
+        else:
+            logger.warning(
+                f"{dataset}: {len(late)} series received dates from {start:%Y-%m-%d} on, before their stored "
+                f"windows, and cannot be recomputed without the {RECOMPUTE_SOURCES[dataset]} sink; left unchanged"
+            )
+            record_pending(dataset, [start.strftime("%Y-%m-%d")], "past dates without a recompute source", mysql_conn)
+        inputs = inputs[~inputs["series"].isin(late)]
+        if inputs.empty:
+            return written
+
+    if not state.empty:
+        state = state[state["series"].isin(inputs["series"])]
+    history = compute(pd.concat([state.assign(new=False), inputs.assign(new=True)], ignore_index=True))
+    new_rows = history[history["new"].astype(bool)]
+    write(dataset, new_rows, mysql_conn)
+    save_state(dataset, history[list(inputs.columns)], mysql_conn)
+    return written + len(new_rows)
+
+
+def recompute(
+    dataset: str,
+    start_date: str,
+    series: typing.Optional[typing.List[str]],
+    mysql_conn: engine.base.Connection,
+    end_date: typing.Optional[str] = None,
+) -> int:
+    """
+    Recompute the derived rows of a dataset from its RECOMPUTE_SOURCES, from start_date on.
+
+    Parameters:
+    - dataset: The dataset to recompute.
+    - start_date: The first date to rewrite; LOOKBACK_DAYS before it are read to fill the windows.
+    - series: The StockIDs or FuturesIDs to recompute, or None for all of them.
+    - mysql_conn: A FinancialData connection.
+    - end_date: The last date to read, today by default. The stored windows
+      are only replaced when the range reaches the latest data.
+
+    Raises RecomputeError if the source is not written. Returns the number of derived rows written.
+    """
+    ensure_tables(dataset, mysql_conn)
+    read_start = datetime.date.fromisoformat(start_date) - datetime.timedelta(days=LOOKBACK_DAYS)
+    with mysql_conn.begin():
+        # Lock the windows first, so no incremental update of these series interleaves.
+        load_state(dataset, series, mysql_conn)
+        inputs = read_inputs(
+            dataset, series, read_start.isoformat(), end_date or datetime.date.today().isoformat(), mysql_conn
+        )
+        if inputs.empty:
+            return 0
+        history = compute(inputs)
+        new_rows = history[history["Date"] >= pd.Timestamp(start_date)]
+        write(dataset, new_rows, mysql_conn)
+        if end_date is None:
+            save_state(dataset, history[list(inputs.columns)], mysql_conn)
+    logger.info(f"Recomputed {len(new_rows)} {dataset} derived rows from {start_date}")
+    return len(new_rows)
+
+
+def record_pending(dataset: str, dates: typing.List[str], error: str, mysql_conn: engine.base.Connection):
+    """Remember dates whose derived metrics are missing or stale, for `recompute_pending`."""
+    ensure_tables(dataset, mysql_conn)
+    mysql_conn.execute(
+        f"""
+        INSERT INTO `{PENDING_TABLE}` (dataset_name, date, error) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE error = VALUES(error)
+        """,
+        [(dataset, date, error[:1000]) for date in dates],
+    )
+
+
+def recompute_pending(mysql_conn: engine.base.Connection) -> typing.Dict[str, int]:
+    """
+    Recompute every dataset with pending dates from its earliest one, and clear them.
+
+    A dataset that fails again keeps its pending dates. Returns the derived rows written per dataset.
+    """
+    written = {}
+    for dataset in DERIVED:
+        ensure_tables(dataset, mysql_conn)
+        dates = [
+            str(date)
+            for date, in mysql_conn.execute(
+                f"SELECT date FROM `{PENDING_TABLE}` WHERE dataset_name = %s ORDER BY date", (dataset,)
+            ).fetchall()
+        ]
+        if not dates:
+            continue
+        try:
+            written[dataset] = recompute(dataset, dates[0], None, mysql_conn)
+        except Exception as e:
+            logger.error(f"Recomputing the pending dates of {dataset} from {dates[0]} failed: {e}")
+            continue
+        mysql_conn.execute(
+            f"DELETE FROM `{PENDING_TABLE}` WHERE dataset_name = %s AND date IN ({', '.join(['%s'] * len(dates))})",
+            (dataset, *dates),
+        )
+    return written
+
+
+def get_derived(
+    dataset: str,
+    ids: typing.Optional[typing.List[str]],
+    start_date: str,
+    end_date: str,
+    mysql_conn: engine.base.Connection,
+) -> pd.DataFrame:
+    """Read the derived rows of some StockIDs or FuturesIDs (all of them if None) over a date range."""
+    spec = DERIVED[dataset]
+    dtypes = output_dtypes(dataset)
+    sql = "SELECT {} FROM `{}` WHERE `Date` BETWEEN %s AND %s".format(
+        ", ".join(f"`{col}`" for col in dtypes), spec["table"]
+    )
+    params = (start_date, end_date)
+    if ids:
+        sql += " AND `{}` IN ({})".format(spec["series"], ", ".join(["%s"] * len(ids)))
+        params += tuple(ids)
+    return read.stream_frame(sql, params, mysql_conn, dtypes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the derived metrics of a dataset from past rows.")
+    parser.add_argument("dataset", nargs="?", choices=sorted(DERIVED))
+    parser.add_argument("start_date", nargs="?")
+    parser.add_argument("--ids", nargs="*", help="StockIDs or FuturesIDs to recompute, all by default")
+    parser.add_argument("--pending", action="store_true", help="recompute the dates whose update failed")
+    args = parser.parse_args()
+    if args.pending:
+        recompute_pending(db.router.mysql_financialdata_conn)
+    elif args.dataset and args.start_date:
+        recompute(args.dataset, args.start_date, args.ids, db.router.mysql_financialdata_conn)
+    else:
+        parser.error("give a dataset and start date, or --pending")
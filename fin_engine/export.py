@@ -0,0 +1,129 @@
+import argparse
+import concurrent.futures
+import os
+import typing
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from loguru import logger
+
+from fin_engine.config import READ_CHUNK_SIZE
+from fin_engine.db import clients, partitions, read
+from fin_engine.schema import SCHEMAS
+
+FORMATS = ("csv", "parquet")
+
+
+def write_csv(chunks: typing.Iterable[pd.DataFrame], path: str) -> int:
+    """Append DataFrame chunks to a CSV file and return the number of rows."""
+    rows = 0
+    with open(path, "w", newline="") as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, header=i == 0, index=False)
+            rows += len(chunk)
+    return rows
+
+
+def write_parquet(chunks: typing.Iterable[pd.DataFrame], path: str) -> int:
+    """Write DataFrame chunks to a Parquet file, one row group per chunk, and return the number of rows."""
+    rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def export_partition(
+    table: str,
+    partition: typing.Optional[str],
+    output_dir: str,
+    file_format: str,
+    chunk_size: int = READ_CHUNK_SIZE,
+) -> typing.Optional[int]:
+    """
+    Export one partition of a table (the whole table when `partition` is None) to a file.
+
+    The file only appears under its final name once complete, so an export that
+    already has it skips the partition. Returns the rows written, or None if skipped.
+    """
+    name = partition or "all"
+    path = os.path.join(output_dir, table, f"{name}.{file_format}")
+    if os.path.exists(path):
+        logger.info(f"Skipping {table} {name}: {path} already exported")
+        return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    sql = f"SELECT * FROM `{table}`" + (f" PARTITION (`{partition}`)" if partition else "")
+    tmp_path = f"{path}.tmp"
+    mysql_conn = clients.get_mysql_financialdata_conn()
+    try:
+        chunks = read.stream_chunks(sql, (), mysql_conn, SCHEMAS.get(table, {}), chunk_size)
+        write = write_csv if file_format == "csv" else write_parquet
+        rows = write(chunks, tmp_path)
+    finally:
+        mysql_conn.close()
+    os.replace(tmp_path, path)
+    logger.info(f"Exported {rows} rows of {table} {name} to {path}")
+    return rows
+
+
+def export(
+    table: str,
+    output_dir: str,
+    file_format: str = "parquet",
+    workers: int = 2,
+    chunk_size: int = READ_CHUNK_SIZE,
+) -> typing.Dict[str, typing.Optional[int]]:
+    """
+    Export a FinancialData table to CSV or Parquet files, one file per partition.
+
+    Partitions are exported in parallel processes, each streaming its rows
+    through a server-side cursor, so memory stays around `workers * chunk_size`
+    rows regardless of the table size. Re-running resumes after the partitions
+    already exported.
+
+    Parameters:
+    - table: The table to export.
+    - output_dir: Files are written to <output_dir>/<table>/<partition>.<format>.
+    - file_format: "csv" or "parquet".
+    - workers: Number of partitions exported at the same time.
+    - chunk_size: Rows fetched and written at a time.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown export format: {file_format}")
+    mysql_conn = clients.get_mysql_financialdata_conn()
+    try:
+        partition_names = partitions.list_partitions(table, mysql_conn) or [None]
+    finally:
+        mysql_conn.close()
+
+    summary = {}
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = {
+            executor.submit(export_partition, table, partition, output_dir, file_format, chunk_size): partition or "all"
+            for partition in partition_names
+        }
+        for future in concurrent.futures.as_completed(futures):
+            summary[futures[future]] = future.result()
+            logger.info(f"{table}: {len(summary)}/{len(futures)} partitions done")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a table to CSV or Parquet, one file per partition.")
+    parser.add_argument("table")
+    parser.add_argument("output_dir")
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    parser.add_argument("--workers", type=int, default=2, help="partitions exported in parallel")
+    parser.add_argument("--chunk-size", type=int, default=READ_CHUNK_SIZE, help="rows fetched at a time")
+    args = parser.parse_args()
+    export(args.table, args.output_dir, args.format, workers=args.workers, chunk_size=args.chunk_size)
@@ -0,0 +1,107 @@
+import contextlib
+import os
+import time
+import typing
+
+import requests
+from loguru import logger
+from prometheus_client import CollectorRegistry, Counter, Histogram, multiprocess, start_http_server
+
+PHASE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# "parse" covers the whole parse stage and includes "clean".
+TASK_PHASE_SECONDS = Histogram(
+    "fin_engine_task_phase_seconds",
+    "Time spent per task phase (fetch, parse, clean, upload).",
+    ["dataset", "data_source", "phase"],
+    buckets=PHASE_BUCKETS,
+)
+TASK_ROWS = Histogram(
+    "fin_engine_task_rows",
+    "Rows produced per task.",
+    ["dataset", "data_source"],
+    buckets=(0, 10, 100, 500, 1000, 2000, 5000, 10000, 50000),
+)
+BYTES_DOWNLOADED = Counter(
+    "fin_engine_bytes_downloaded",
+    "Response bytes downloaded from the exchanges.",
+    ["dataset", "data_source"],
+)
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "fin_engine_rate_limit_wait_seconds",
+    "Time spent waiting for the shared rate limiter.",
+    ["dataset", "data_source"],
+    buckets=(0, 0.1, 0.5, 1, 2, 5, 10, 30, 60),
+)
+DB_UPSERT_SECONDS = Histogram(
+    "fin_engine_db_upsert_seconds",
+    "Latency of one batched upsert transaction.",
+    ["table"],
+    buckets=PHASE_BUCKETS,
+)
+UPLOAD_SKIPPED_ROWS = Counter(
+    "fin_engine_upload_skipped_rows",
+    "Rows not written because they were unchanged since the last upload.",
+    ["dataset", "data_source"],
+)
+DERIVED_FAILURES = Counter(
+    "fin_engine_derived_failures",
+    "Uploads whose derived metrics could not be updated.",
+    ["dataset", "data_source"],
+)
+RETRIES = Counter(
+    "fin_engine_retries",
+    "Retries, by kind (http for transport retries, task for re-sent tasks).",
+    ["dataset", "data_source", "kind"],
+)
+
+
+@contextlib.contextmanager
+def phase(dataset: str, data_source: str, name: str):
+    """Time the enclosed block as a task phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        TASK_PHASE_SECONDS.labels(dataset, data_source, name).observe(time.perf_counter() - start)
+
+
+def timed_call(dataset: str, data_source: str, name: str, func: typing.Callable, *args):
+    """Call func(*args) and time it as a task phase."""
+    with phase(dataset, data_source, name):
+        return func(*args)
+
+
+def record_response(dataset: str, data_source: str, response: requests.Response):
+    """Count downloaded bytes and transport retries of a response."""
+    BYTES_DOWNLOADED.labels(dataset, data_source).inc(len(response.content))
+    retries = getattr(response.raw, "retries", None)
+    if retries is not None and retries.history:
+        RETRIES.labels(dataset, data_source, "http").inc(len(retries.history))
+
+
+def start_server(port: int):
+    """
+    Expose the metrics over HTTP.
+
+    With PROMETHEUS_MULTIPROC_DIR set, the endpoint aggregates the metrics of
+    every process writing to that directory, e.g. all prefork children of a worker.
+    """
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        # Files left by a previous run would be aggregated with the new ones.
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(port, registry=registry)
+    else:
+        start_http_server(port)
+    logger.info(f"Metrics exposed on port {port}")
+
+
+def mark_process_dead(pid: int):
+    """Drop the live gauges of an exited child in multiprocess mode."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
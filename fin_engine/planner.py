@@ -0,0 +1,148 @@
+import datetime
+import statistics
+import typing
+
+import pandas as pd
+from loguru import logger
+from sqlalchemy import engine
+
+from fin_engine import db, registry
+from fin_engine.db import counts
+
+
+def get_date_coverage(
+    dataset: str,
+    start_date: str,
+    end_date: str,
+    mysql_conn: engine.base.Connection,
+) -> typing.Dict[str, int]:
+    """Count stored rows per `Date` of a dataset in one aggregate over the (Date-partitioned) range."""
+    sql = f"""
+        SELECT `Date`, COUNT(1)
+        FROM `{registry.get(dataset).table}`
+        WHERE `Date` BETWEEN %s AND %s
+        GROUP BY `Date`
+    """
+    rows = db.query(sql=sql, mysql_conn=mysql_conn, params=(start_date, end_date))
+    return {str(date): count for date, count in rows}
+
+
+def find_underfilled_dates(coverage: typing.Dict[str, int], fill_ratio: float) -> typing.Set[str]:
+    """Dates whose row count is below fill_ratio times the median count of the range."""
+    if not coverage:
+        return set()
+    threshold = fill_ratio * statistics.median(coverage.values())
+    return {date for date, count in coverage.items() if count < threshold}
+
+
+def task_dates(parameters: dict) -> typing.List[str]:
+    """Dates covered by a task: its `crawler_date`, or the weekdays up to `crawler_end_date` for range tasks."""
+    if "crawler_end_date" not in parameters:
+        return [parameters["crawler_date"]]
+    start_date = datetime.datetime.strptime(parameters["crawler_date"], "%Y-%m-%d").date()
+    end_date = datetime.datetime.strptime(parameters["crawler_end_date"], "%Y-%m-%d").date()
+    days = (end_date - start_date).days + 1
+    dates = [start_date + datetime.timedelta(days=day) for day in range(days)]
+    return [str(date) for date in dates if date.weekday() < 5]
+
+
+def taipei_today() -> datetime.date:
+    """Today's date in Taiwan."""
+    return (datetime.datetime.utcnow() + datetime.timedelta(hours=8)).date()
+
+
+def crawled_rows(parameters: dict, df: pd.DataFrame) -> typing.Dict[str, int]:
+    """
+    Rows a task crawled for each of its dates, 0 for a date without data.
+
+    Empty dates from today on are left out: the exchange may not have
+    published them yet, and a 0 would keep them from ever being planned again.
+    """
+    date_column = counts.find_date_column(list(df.columns))
+    found = df[date_column].astype(str).str[:10].value_counts().to_dict() if date_column and not df.empty else {}
+    today = str(taipei_today())
+    return {
+        date: int(found.get(date, 0))
+        for date in task_dates(parameters)
+        if found.get(date, 0) or date < today
+    }
+
+
+def record_crawl(dataset: str, parameters: dict, df: pd.DataFrame, mysql_conn: engine.base.Connection):
+    """Record what a task crawled per date and data source, for `plan_tasks`."""
+    counts.record_source_rows(dataset, parameters.get("data_source", ""), crawled_rows(parameters, df), mysql_conn)
+
+
+def get_source_coverage(
+    dataset: str,
+    start_date: str,
+    end_date: str,
+    mysql_conn: engine.base.Connection,
+) -> typing.Dict[typing.Tuple[str, str], int]:
+    """Rows crawled per (date, data source) of a dataset, as recorded by `record_crawl`."""
+    return counts.read_source_rows(dataset, start_date, end_date, mysql_conn)
+
+
+def missing_dates(
+    parameters: dict,
+    coverage: typing.Dict[str, int],
+    source_coverage: typing.Dict[typing.Tuple[str, str], int],
+    underfilled: typing.Set[str],
+) -> typing.List[str]:
+    """
+    The dates of a task its data source still has to crawl.
+
+    A date recorded for the task's data source is done, even with 0 rows (a
+    holiday). Dates without any record, crawled before sources were recorded,
+    fall back to the table's row count per date.
+    """
+    data_source = parameters.get("data_source", "")
+    recorded_dates = {date for date, _ in source_coverage}
+    missing = []
+    for date in task_dates(parameters):
+        if (date, data_source) in source_coverage:
+            continue
+        if date not in recorded_dates and date in coverage and date not in underfilled:
+            continue
+        missing.append(date)
+    return missing
+
+
+def plan_tasks(
+    parameter_list: typing.List[dict],
+    coverage: typing.Dict[str, int],
+    source_coverage: typing.Optional[typing.Dict[typing.Tuple[str, str], int]] = None,
+    fill_ratio: float = 0.5,
+) -> typing.List[dict]:
+    """Keep only the task parameters with a date their data source has not crawled yet."""
+    underfilled = find_underfilled_dates(coverage, fill_ratio)
+    source_coverage = source_coverage or {}
+    return [
+        parameters
+        for parameters in parameter_list
+        if missing_dates(parameters, coverage, source_coverage, underfilled)
+    ]
+
+
+def report(
+    dataset: str,
+    parameter_list: typing.List[dict],
+    planned: typing.List[dict],
+    coverage: typing.Dict[str, int],
+    source_coverage: typing.Optional[typing.Dict[typing.Tuple[str, str], int]] = None,
+    fill_ratio: float = 0.5,
+):
+    """Log a summary of what the plan skips and what it will dispatch."""
+    underfilled = find_underfilled_dates(coverage, fill_ratio)
+    source_coverage = source_coverage or {}
+    gaps = sorted(
+        (date, parameters.get("data_source", ""))
+        for parameters in planned
+        for date in missing_dates(parameters, coverage, source_coverage, underfilled)
+    )
+    logger.info(
+        f"Plan for {dataset}: {len(planned)}/{len(parameter_list)} tasks to dispatch, "
+        f"{len(gaps)} dates missing from their data source"
+    )
+    for date, data_source in gaps:
+        logger.info(f"{dataset} missing: {date} {data_source} ({coverage.get(date, 0)} rows stored for the date)")
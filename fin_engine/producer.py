@@ -1,11 +1,50 @@
-import importlib
-import sys
+import argparse
+import collections
+import time
+import typing
 
-from fin_engine.tasks import crawler
+from celery.canvas import Signature
+from fin_engine import db, planner, registry
+from fin_engine.config import QUEUE_CHECK_EVERY, QUEUE_HIGH_WATER, QUEUE_LOW_WATER, QUEUE_POLL_SECONDS
+from fin_engine.tasks import crawler, crawler_batch
+from fin_engine.worker import app
 from loguru import logger
 
 
-def update(dataset: str, start_date: str, end_date: str) -> None:
+def plan(
+    dataset: str,
+    start_date: str,
+    end_date: str,
+    force: bool = False,
+    data_sources: typing.Optional[typing.List[str]] = None,
+) -> typing.List[dict]:
+    """Generate the task parameters of a date range, leaving out dates already stored unless forced."""
+    # Generate the list of parameters for the crawling tasks
+    parameter_list = registry.get(dataset).generate_parameters(start_date=start_date, end_date=end_date)
+    if data_sources:
+        parameter_list = [parameters for parameters in parameter_list if parameters.get("data_source") in data_sources]
+
+    # Skip dates their data source already crawled unless forced
+    if not force:
+        mysql_conn = db.router.mysql_financialdata_conn
+        coverage = planner.get_date_coverage(dataset, start_date, end_date, mysql_conn)
+        source_coverage = planner.get_source_coverage(dataset, start_date, end_date, mysql_conn)
+        planned = planner.plan_tasks(parameter_list, coverage, source_coverage)
+        planner.report(dataset, parameter_list, planned, coverage, source_coverage)
+        parameter_list = planned
+    return parameter_list
+
+
+def update(
+    dataset: str,
+    start_date: str,
+    end_date: str,
+    force: bool = False,
+    dry_run: bool = False,
+    batch_size: int = 0,
+    data_sources: typing.Optional[typing.List[str]] = None,
+    high_water: int = QUEUE_HIGH_WATER,
+) -> None:
     """
     Update dataset by generating task parameters and sending tasks to the scraper.
 
@@ -13,23 +52,146 @@ def update(dataset: str, start_date: str, end_date: str) -> None:
     - dataset: Name of the dataset to update.
     - start_date: The start date for data retrieval in YYYY-MM-DD format.
     - end_date: The end date for data retrieval in YYYY-MM-DD format.
+    - force: Dispatch every date, even those already stored in the database, and write
+      their data even if it is unchanged since the last upload.
+    - dry_run: Only report the planned tasks without sending them.
+    - batch_size: If set, send `crawler_batch` tasks of up to this many parameters
+      per data source instead of one `crawler` task per parameter.
+    - data_sources: Only send the tasks of these data sources; all of them by default.
+    - high_water: Queue depth at which publishing to a queue pauses (see `publish`); 0 never pauses.
     """
-    # Import the module and get the parameter list generator function
-    module = importlib.import_module(f"fin_engine.scraper.{dataset}")
-    gen_task_parameter_list = getattr(module, "gen_task_paramter_list")
+    parameter_list = plan(dataset, start_date, end_date, force=force, data_sources=data_sources)
 
-    # Generate the list of parameters for the crawling tasks
-    parameter_list = gen_task_parameter_list(start_date=start_date, end_date=end_date)
+    if dry_run:
+        logger.info(f"Dry run: {len(parameter_list)} tasks for {dataset} not sent")
+        return
 
-    # Loop through the parameters and send the tasks
+    publish(build_signatures(dataset, parameter_list, batch_size, force), high_water=high_water)
+
+
+def build_signatures(
+    dataset: str,
+    parameter_list: typing.List[dict],
+    batch_size: int = 0,
+    force: bool = False,
+) -> typing.Dict[str, typing.List[Signature]]:
+    """
+    The tasks to send, by queue (the data source).
+
+    One `crawler` task per parameter, or with a batch_size, `crawler_batch`
+    tasks of up to that many parameters of the same data source. Forced tasks
+    write their data even if it is unchanged since the last upload.
+    """
+    by_source = collections.defaultdict(list)
     for parameters in parameter_list:
-        logger.info(f"Dataset: {dataset}, Parameters: {parameters}")
-        task = crawler.s(dataset=dataset, parameters=parameters)
+        by_source[parameters.get("data_source", "")].append(parameters)
 
-        # Send the task to the specified queue
-        task.apply_async(queue=parameters.get("data_source", ""))
+    signatures = {}
+    for data_source, source_parameters in by_source.items():
+        if batch_size > 0:
+            signatures[data_source] = [
+                crawler_batch.s(
+                    dataset=dataset,
+                    parameter_list=source_parameters[start:start + batch_size],
+                    force=force,
+                )
+                for start in range(0, len(source_parameters), batch_size)
+            ]
+        else:
+            signatures[data_source] = [
+                crawler.s(dataset=dataset, parameters=parameters, force=force) for parameters in source_parameters
+            ]
+    return signatures
+
+
+def queue_depth(connection, queue: str) -> int:
+    """Number of messages waiting in a queue, 0 if it does not exist yet."""
+    # A passive declare of a missing queue closes its channel, so each check gets its own.
+    channel = connection.channel()
+    try:
+        return channel.queue_declare(queue=queue, passive=True).message_count
+    except connection.channel_errors:
+        return 0
+    finally:
+        try:
+            channel.close()
+        except Exception:
+            pass
+
+
+def publish(
+    signatures: typing.Dict[str, typing.List[Signature]],
+    high_water: int = QUEUE_HIGH_WATER,
+    low_water: int = QUEUE_LOW_WATER,
+    check_every: int = QUEUE_CHECK_EVERY,
+    poll_seconds: float = QUEUE_POLL_SECONDS,
+) -> typing.Dict[str, int]:
+    """
+    Send tasks to their queues over one broker connection, with backpressure.
+
+    A queue holding high_water messages or more is paused until it drains to
+    low_water, so a large backfill neither floods the broker's memory nor
+    buries the daily tasks behind an unbounded backlog. Tasks of the other
+    queues keep flowing while one is paused; when all are paused the producer
+    waits poll_seconds between depth checks.
+
+    Parameters:
+    - signatures: The tasks to send, by queue, as from `build_signatures`.
+    - high_water: Queue depth at which publishing pauses; 0 sends everything at once.
+    - low_water: Queue depth at which a paused queue resumes.
+    - check_every: Tasks sent between two depth checks of a queue.
+    - poll_seconds: Wait between depth checks while every pending queue is paused.
+
+    Returns the number of tasks sent per queue.
+    """
+    pending = {queue: collections.deque(tasks) for queue, tasks in signatures.items() if tasks}
+    paused = set()
+    sent = collections.Counter()
+    with app.producer_or_acquire() as producer:
+        while pending:
+            progressed = False
+            for queue in list(pending):
+                if high_water > 0:
+                    depth = queue_depth(producer.connection, queue)
+                    if depth >= high_water or (queue in paused and depth > low_water):
+                        if queue not in paused:
+                            logger.info(f"Queue {queue} holds {depth} messages, pausing until it drains to {low_water}")
+                            paused.add(queue)
+                        continue
+                    paused.discard(queue)
+                    count = min(high_water - depth, check_every, len(pending[queue]))
+                else:
+                    count = len(pending[queue])
+                for _ in range(count):
+                    pending[queue].popleft().apply_async(queue=queue, producer=producer)
+                sent[queue] += count
+                progressed = True
+                if not pending[queue]:
+                    del pending[queue]
+                    logger.info(f"Sent {sent[queue]} tasks to queue {queue}")
+            if pending and not progressed:
+                time.sleep(poll_seconds)
+    return dict(sent)
 
 
 if __name__ == "__main__":
-    dataset, start_date, end_date = sys.argv[1:]
-    update(dataset, start_date, end_date)
+    parser = argparse.ArgumentParser(description="Send crawler tasks for a dataset and date range.")
+    parser.add_argument("dataset")
+    parser.add_argument("start_date")
+    parser.add_argument("end_date")
+    parser.add_argument("--force", action="store_true", help="re-crawl dates that are already stored")
+    parser.add_argument("--dry-run", action="store_true", help="report the plan without sending tasks")
+    parser.add_argument("--batch-size", type=int, default=0, help="send crawler_batch tasks of this many dates")
+    parser.add_argument(
+        "--high-water", type=int, default=QUEUE_HIGH_WATER, help="pause a queue at this depth, 0 to never pause"
+    )
+    args = parser.parse_args()
+    update(
+        args.dataset,
+        args.start_date,
+        args.end_date,
+        force=args.force,
+        dry_run=args.dry_run,
+        batch_size=args.batch_size,
+        high_water=args.high_water,
+    )
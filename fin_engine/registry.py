@@ -0,0 +1,100 @@
+import dataclasses
+import importlib
+import typing
+
+from fin_engine.schema import SCHEMAS
+
+# Every dataset the engine crawls: its scraper module and functions, target table and sources.
+DATASETS: typing.Dict[str, dict] = {
+    "taiwan_stock_price": dict(
+        module="fin_engine.scraper.taiwan_stock_price",
+        generate_parameters="generate_task_parameter_list",
+        crawl="crawl",
+        table="taiwan_stock_price",
+        key_columns=["StockID", "Date"],
+        data_sources=["twse", "tpex"],
+    ),
+    "taiwan_futures_daily": dict(
+        module="fin_engine.scraper.taiwan_futures_daily",
+        generate_parameters="generate_date_parameters",
+        crawl="crawler",
+        table="taiwan_futures_daily",
+        key_columns=["FuturesID", "Date"],
+        data_sources=["taifex"],
+    ),
+}
+
+# Functions every scraper module provides besides its generator and crawl function.
+SCRAPER_FUNCTIONS = ("fetch_raw", "parse_raw", "probe")
+
+
+class RegistryError(ValueError):
+    """A dataset is unknown or its declaration does not match its scraper."""
+
+
+@dataclasses.dataclass(frozen=True)
+class Dataset:
+    """A registered dataset, with its scraper functions resolved."""
+
+    name: str
+    table: str
+    key_columns: typing.List[str]
+    dtypes: typing.Dict[str, str]
+    data_sources: typing.List[str]
+    generate_parameters: typing.Callable[..., typing.List[dict]]
+    crawl: typing.Callable
+    fetch_raw: typing.Callable
+    parse_raw: typing.Callable
+    probe: typing.Callable
+
+
+_loaded: typing.Dict[str, Dataset] = {}
+
+
+def load(name: str) -> Dataset:
+    """Import a dataset's scraper and check its declaration, raising RegistryError if anything is missing."""
+    if name not in DATASETS:
+        raise RegistryError(f"Unknown dataset: {name}")
+    declaration = DATASETS[name]
+    try:
+        module = importlib.import_module(declaration["module"])
+    except ImportError as e:
+        raise RegistryError(f"Cannot import the scraper of {name}: {e}") from e
+
+    names = [declaration["generate_parameters"], declaration["crawl"], *SCRAPER_FUNCTIONS]
+    missing = [attr for attr in names if not callable(getattr(module, attr, None))]
+    if missing:
+        raise RegistryError(f"{declaration['module']} does not define {missing}")
+    dtypes = SCHEMAS.get(declaration["table"])
+    if dtypes is None:
+        raise RegistryError(f"No schema for table {declaration['table']}")
+    unknown = [col for col in declaration["key_columns"] if col not in dtypes]
+    if unknown:
+        raise RegistryError(f"Key columns {unknown} of {name} are not in its schema")
+
+    return Dataset(
+        name=name,
+        table=declaration["table"],
+        key_columns=declaration["key_columns"],
+        dtypes=dtypes,
+        data_sources=declaration["data_sources"],
+        generate_parameters=getattr(module, declaration["generate_parameters"]),
+        crawl=getattr(module, declaration["crawl"]),
+        fetch_raw=module.fetch_raw,
+        parse_raw=module.parse_raw,
+        probe=module.probe,
+    )
+
+
+def get(name: str) -> Dataset:
+    """A registered dataset, loaded on first use and then served from memory."""
+    dataset = _loaded.get(name)
+    if dataset is None:
+        dataset = _loaded[name] = load(name)
+    return dataset
+
+
+def warm_up():
+    """Load every dataset, so a broken declaration fails here instead of on each task."""
+    for name in DATASETS:
+        get(name)
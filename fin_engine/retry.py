@@ -0,0 +1,31 @@
+import json
+import random
+
+import requests
+from sqlalchemy import exc as sa_exc
+
+from fin_engine.config import TASK_RETRY_BACKOFF, TASK_RETRY_BACKOFF_MAX
+
+# Transient failures: network trouble, exchange overload or throttling, and lost DB connections.
+RETRYABLE_EXCEPTIONS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    sa_exc.OperationalError,
+    sa_exc.DisconnectionError,
+    # The exchanges answer a throttled client with an HTML page instead of JSON.
+    json.JSONDecodeError,
+)
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Whether a failure is transient and worth retrying, as opposed to permanent (e.g. a parser bug)."""
+    if isinstance(exc, requests.exceptions.HTTPError):
+        return exc.response is not None and exc.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, RETRYABLE_EXCEPTIONS)
+
+
+def backoff(retries: int) -> float:
+    """Seconds to wait before the next attempt: capped exponential backoff with full jitter."""
+    return random.uniform(0, min(TASK_RETRY_BACKOFF_MAX, TASK_RETRY_BACKOFF * 2 ** retries))
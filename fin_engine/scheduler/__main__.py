@@ -1,40 +1,86 @@
 import datetime
 import time
-from functools import partial
+import typing
+from functools import partial, wraps
 
 from apscheduler.schedulers.background import BackgroundScheduler
-from fin_engine.producer import update
+from fin_engine import db, registry
+from fin_engine.config import PUBLICATION_TIMES, SCHEDULER_MODE
+from fin_engine.scheduler.derived import recompute_pending_derived
+from fin_engine.scheduler.partitions import maintain_dataset_partitions
+from fin_engine.scheduler.publication import dispatch_when_published, update_today
 from fin_engine.scheduler.scrape_data import save_dataset_count_daily
 from loguru import logger
 
 
+def releasing_connections(func: typing.Callable) -> typing.Callable:
+    """
+    Run a job, then return the connections it checked out to the pool.
+
+    Jobs run on a thread pool and the router's connections are per thread, so
+    this closes the job's own connections only, never those of a job running
+    alongside it, and no idle one outlives MySQL's wait_timeout.
+    """
+    @wraps(func)
+    def job(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            db.router.close_connection()
+
+    return job
+
+
 def main():
-    today = (
-        datetime.datetime.utcnow() +
-        datetime.timedelta(hours=8)
-        ).strftime("%Y-%m-%d")
     scheduler = BackgroundScheduler(timezone="Asia/Taipei")
+    registry.warm_up()
+    for dataset in registry.DATASETS:
+        if SCHEDULER_MODE == "publication":
+            # One job per data source, probing from its expected release time.
+            for data_source in registry.get(dataset).data_sources:
+                hour, minute = PUBLICATION_TIMES[data_source].split(":")
+                scheduler.add_job(
+                    id=f"{dataset}_{data_source}",
+                    func=releasing_connections(partial(dispatch_when_published, dataset, data_source)),
+                    trigger="cron",
+                    hour=hour,
+                    minute=minute,
+                    day_of_week="mon-fri",
+                    second="0",
+                    max_instances=1,
+                    misfire_grace_time=3600,
+                )
+        else:
+            scheduler.add_job(
+                id=dataset,
+                func=releasing_connections(partial(update_today, dataset)),
+                trigger="cron",
+                hour="15",
+                minute="0",
+                day_of_week="mon-fri",
+                second="0",
+            )
     scheduler.add_job(
-        id="taiwan_stock_price",
-        func=partial(
-            update,
-            dataset="taiwan_stock_price",
-            start_date=today,
-            end_date=today,
-        ),
-        trigger="cron",
-        hour="15",
-        minute="0",
-        day_of_week="mon-fri",
-        second="0",
-    )
-    scheduler.add_job(
-        save_dataset_count_daily,
+        releasing_connections(save_dataset_count_daily),
         "cron",
         day_of_week="mon-sat",
         hour="*",
         minute="*/1",
     )
+    scheduler.add_job(
+        releasing_connections(maintain_dataset_partitions),
+        "cron",
+        hour="0",
+        minute="30",
+        # Also right away: a fresh deploy may lack the current year's partition until the first nightly run.
+        next_run_time=datetime.datetime.now(datetime.timezone.utc),
+    )
+    scheduler.add_job(
+        releasing_connections(recompute_pending_derived),
+        "cron",
+        hour="1",
+        minute="0",
+    )
     logger.info("add scheduler")
     scheduler.start()
 
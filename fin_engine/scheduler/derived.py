@@ -0,0 +1,18 @@
+from loguru import logger
+
+from fin_engine import derived
+from fin_engine.db import router
+
+
+def recompute_pending_derived():
+    """Catch up the derived metrics whose update failed."""
+    try:
+        written = derived.recompute_pending(router.mysql_financialdata_conn)
+        if written:
+            logger.info(f"Recomputed pending derived metrics: {written}")
+    except Exception as e:
+        logger.error(f"Recomputing pending derived metrics failed: {e}")
+
+
+if __name__ == "__main__":
+    recompute_pending_derived()
@@ -0,0 +1,19 @@
+from loguru import logger
+
+from fin_engine import registry
+from fin_engine.db import partitions, router
+from fin_engine.scheduler.scrape_data import create_crawler_dict_list
+
+
+def maintain_dataset_partitions():
+    """Create the upcoming range partitions of every dataset table."""
+    for crawler_dict in create_crawler_dict_list():
+        dataset = crawler_dict.get("dataset")
+        try:
+            partitions.maintain_partitions(registry.get(dataset).table, router.mysql_financialdata_conn)
+        except Exception as e:
+            logger.error(f"Partition maintenance failed for {dataset}: {e}")
+
+
+if __name__ == "__main__":
+    maintain_dataset_partitions()
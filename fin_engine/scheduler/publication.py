@@ -0,0 +1,56 @@
+import datetime
+import time
+
+from loguru import logger
+
+from fin_engine import registry
+from fin_engine.config import PROBE_INTERVAL, PROBE_INTERVAL_MAX, PROBE_TIMEOUT
+from fin_engine.producer import update
+
+
+def taipei_today() -> str:
+    """Today's date in Taiwan, evaluated on every call."""
+    return (datetime.datetime.utcnow() + datetime.timedelta(hours=8)).strftime("%Y-%m-%d")
+
+
+def wait_for_publication(dataset: str, parameters: dict, timeout: float = PROBE_TIMEOUT) -> bool:
+    """
+    Probe a data source until it has published the data of a task, or the timeout passes.
+
+    The wait between probes starts at PROBE_INTERVAL and doubles up to
+    PROBE_INTERVAL_MAX, so an early release is caught within a minute while a
+    late one costs only a few requests.
+    """
+    probe = registry.get(dataset).probe
+    deadline = time.monotonic() + timeout
+    interval = PROBE_INTERVAL
+    while True:
+        try:
+            if probe(parameters):
+                return True
+        except Exception as e:
+            logger.warning(f"Probe failed for {dataset} {parameters}: {e}")
+        if time.monotonic() + interval > deadline:
+            return False
+        logger.info(f"{dataset} {parameters} not published yet, probing again in {interval:.0f}s")
+        time.sleep(interval)
+        interval = min(interval * 2, PROBE_INTERVAL_MAX)
+
+
+def dispatch_when_published(dataset: str, data_source: str):
+    """Send today's task of a data source as soon as its data is published."""
+    date = taipei_today()
+    parameters = {"crawler_date": date, "data_source": data_source}
+    if not wait_for_publication(dataset, parameters):
+        logger.warning(f"{dataset} {data_source} {date} was not published in time, nothing sent")
+        return
+    logger.info(f"{dataset} {data_source} {date} published, sending tasks")
+    # Forced: a date crawled before publication is sent again.
+    # Never held back by backpressure, so a running backfill cannot delay the daily tasks.
+    update(dataset=dataset, start_date=date, end_date=date, force=True, data_sources=[data_source], high_water=0)
+
+
+def update_today(dataset: str):
+    """Send today's tasks of every data source of a dataset."""
+    date = taipei_today()
+    update(dataset=dataset, start_date=date, end_date=date, high_water=0)
@@ -4,9 +4,12 @@ import pandas as pd
 
 from loguru import logger
 
-from fin_engine.db import router, query
+from fin_engine import registry
+from fin_engine.db import router, counts
 from fin_engine.db.db import upload_data, commit
 
+_table_ready = False
+
 
 def get_now() -> datetime.datetime:
     now = datetime.datetime.utcnow()
@@ -14,21 +17,15 @@ def get_now() -> datetime.datetime:
 
 
 def create_crawler_dict_list():
-    crawler_dict_list = [
-        dict(
-            dataset="taiwan_stock_price",
-        ),
-        dict(
-            dataset="taiwan_futures_daily",
-        ),
-    ]
+    crawler_dict_list = [dict(dataset=dataset) for dataset in registry.DATASETS]
     return crawler_dict_list
 
 
-def save_dataset_count_daily(
-    monitor_date: str = datetime.datetime.today().strftime("%Y-%m-%d"),
-):
-    table = "DatasetCountDaily"
+def create_dataset_count_daily_table(table: str):
+    """Create the monitor table once per process instead of on every run."""
+    global _table_ready
+    if _table_ready:
+        return
     sql = f"""
         CREATE TABLE IF NOT EXISTS {table} (
             dataset_name VARCHAR(50) NOT NULL,
@@ -39,29 +36,33 @@ def save_dataset_count_daily(
             PRIMARY KEY (dataset_name, date, monitor_query_time)
         );
         """
-    mysql_monitor_conn = router.mysql_monitor_conn
-    commit(sql, mysql_monitor_conn)
+    commit(sql, router.mysql_monitor_conn)
+    _table_ready = True
+
+
+def save_dataset_count_daily(
+    monitor_date: typing.Optional[str] = None,
+):
+    """Snapshot the row count of every dataset for a date (today by default) into the monitor DB."""
+    monitor_date = monitor_date or datetime.datetime.today().strftime("%Y-%m-%d")
+    table = "DatasetCountDaily"
+    create_dataset_count_daily_table(table)
+
+    # One lookup in the count table maintained by upload_data, whatever the size of the data tables.
+    dataset_counts = counts.read_row_counts(monitor_date, router.mysql_financialdata_conn)
 
     ret = []
     crawler_dict_list = create_crawler_dict_list()
     for crawler_dict in crawler_dict_list:
         dataset = crawler_dict.get("dataset")
-
-        sql = f"""
-            SELECT count(1) as nbr
-            FROM `{dataset}`
-            WHERE Date='{monitor_date}'
-        """
-        mysql_financialdata_conn = router.mysql_financialdata_conn
-        count = query(sql=sql, mysql_conn=mysql_financialdata_conn)
-        count = count[0][0]
+        count = dataset_counts.get(dataset, 0)
         logger.info(f"{dataset} use mysql {monitor_date}:count {count}")
 
         monitor_query_time = get_now()
         ret.append([dataset, monitor_date, count, monitor_query_time])
     df = pd.DataFrame(ret, columns=["dataset_name", "date", "count", "monitor_query_time"])
 
-    upload_data(df=df, table=table, mysql_conn=mysql_monitor_conn)
+    upload_data(df=df, table=table, mysql_conn=router.mysql_monitor_conn)
 
 
 if __name__ == "__main__":
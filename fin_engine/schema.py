@@ -0,0 +1,75 @@
+import typing
+
+import pandas as pd
+
+# Column dtypes of each dataset, in the column order of its table (see create_partition_table.sql).
+# IDs are categorical, volumes int64/int32 like BIGINT/INT, prices float32 like FLOAT.
+SCHEMAS: typing.Dict[str, typing.Dict[str, str]] = {
+    "taiwan_stock_price": {
+        "StockID": "category",
+        "TradeVolume": "int64",
+        "Transaction": "int32",
+        "TradeValue": "int64",
+        "Open": "float32",
+        "Max": "float32",
+        "Min": "float32",
+        "Close": "float32",
+        "Change": "float32",
+        "Date": "datetime64[ns]",
+    },
+    "taiwan_futures_daily": {
+        "Date": "datetime64[ns]",
+        "FuturesID": "category",
+        "ContractDate": "category",
+        "Open": "float32",
+        "Max": "float32",
+        "Min": "float32",
+        "Close": "float32",
+        "Change": "float32",
+        "ChangePer": "float32",
+        "Volume": "float32",
+        "SettlementPrice": "float32",
+        "OpenInterest": "int32",
+        "TradingSession": "category",
+    },
+}
+
+# Drop thousands separators, "X" (not comparable) markers, "+" signs, "%" and spaces.
+# What is left unparseable, such as "-", "--" or "除權息", becomes 0.
+CLEAN_TABLE = str.maketrans("", "", ",X+% ")
+
+
+class SchemaError(ValueError):
+    """A DataFrame does not match the schema of its dataset."""
+
+
+def coerce(df: pd.DataFrame, dataset: str) -> pd.DataFrame:
+    """Convert scraped text columns to the dataset's schema, one pass per column, dropping other columns."""
+    schema = SCHEMAS[dataset]
+    missing = [col for col in schema if col not in df.columns]
+    if missing:
+        raise SchemaError(f"{dataset} data is missing columns {missing}")
+    df = df.reindex(columns=list(schema))
+    for col, dtype in schema.items():
+        values = df[col]
+        if dtype == "category":
+            df[col] = values.astype(str).str.strip().astype("category")
+        elif dtype.startswith("datetime64"):
+            df[col] = pd.to_datetime(values).astype(dtype)
+        else:
+            if not pd.api.types.is_numeric_dtype(values):
+                values = values.astype(str).str.translate(CLEAN_TABLE)
+            df[col] = pd.to_numeric(values, errors="coerce").fillna(0).astype(dtype)
+    return df
+
+
+def validate(df: pd.DataFrame, dataset: str):
+    """Raise SchemaError unless a DataFrame has exactly the dataset's columns and dtypes. A frame without columns (no data) passes."""
+    if df.empty and df.columns.empty:
+        return
+    schema = SCHEMAS[dataset]
+    if list(df.columns) != list(schema):
+        raise SchemaError(f"{dataset} columns {list(df.columns)} do not match {list(schema)}")
+    wrong = {col: str(df[col].dtype) for col, dtype in schema.items() if str(df[col].dtype) != dtype}
+    if wrong:
+        raise SchemaError(f"{dataset} columns have unexpected dtypes: {wrong}")
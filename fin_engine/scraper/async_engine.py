@@ -0,0 +1,128 @@
+import asyncio
+import collections
+import concurrent.futures
+import multiprocessing
+import time
+import typing
+
+import pandas as pd
+from loguru import logger
+
+from fin_engine import db, metrics, registry
+from fin_engine.config import ASYNC_CONCURRENCY, ASYNC_PARSE_WORKERS
+
+
+def timed_parse(parse_raw: typing.Callable, parameters: dict, body) -> typing.Tuple[pd.DataFrame, float]:
+    """
+    Parse a response and return how many seconds it took.
+
+    The caller records the time: metrics observed in a spawned parse process are lost with it.
+    """
+    start = time.perf_counter()
+    df = parse_raw(parameters, body)
+    return df, time.perf_counter() - start
+
+
+async def crawl_task(
+    dataset: str,
+    module,
+    parameters: dict,
+    semaphore: asyncio.Semaphore,
+    fetch_executor: concurrent.futures.Executor,
+    parse_executor: concurrent.futures.Executor,
+) -> pd.DataFrame:
+    """Fetch one task while holding its host slot, then parse it."""
+    loop = asyncio.get_running_loop()
+    data_source = parameters.get("data_source", "")
+    async with semaphore:
+        body = await loop.run_in_executor(
+            fetch_executor, metrics.timed_call, dataset, data_source, "fetch", module.fetch_raw, parameters
+        )
+    # The host slot is released before parsing so the next fetch overlaps with it.
+    df, seconds = await loop.run_in_executor(parse_executor, timed_parse, module.parse_raw, parameters, body)
+    metrics.TASK_PHASE_SECONDS.labels(dataset, data_source, "parse").observe(seconds)
+    return df
+
+
+async def crawl_all(
+    dataset: str,
+    parameter_list: typing.List[dict],
+    handle: typing.Callable[[dict, pd.DataFrame], None],
+    parse_processes: int = 0,
+) -> dict:
+    """
+    Crawl every task of a dataset concurrently and pass each result to `handle`.
+
+    Requests per data source are bounded by ASYNC_CONCURRENCY (on top of the
+    shared rate limiter), parsing runs on ASYNC_PARSE_WORKERS threads, or on
+    `parse_processes` processes if set, and `handle` runs on a single thread so
+    it can safely use one DB connection.
+    """
+    module = registry.get(dataset)
+    concurrency = {
+        data_source: ASYNC_CONCURRENCY.get(data_source, 1)
+        for data_source in {parameters.get("data_source", "") for parameters in parameter_list}
+    }
+    semaphores = {data_source: asyncio.Semaphore(limit) for data_source, limit in concurrency.items()}
+    loop = asyncio.get_running_loop()
+    summary = {"tasks": len(parameter_list), "rows": 0, "failed": []}
+    if parse_processes:
+        # Spawned rather than forked: forking while the fetch threads hold locks can deadlock the children.
+        parse_pool = concurrent.futures.ProcessPoolExecutor(parse_processes, multiprocessing.get_context("spawn"))
+    else:
+        parse_pool = concurrent.futures.ThreadPoolExecutor(ASYNC_PARSE_WORKERS)
+
+    with concurrent.futures.ThreadPoolExecutor(max(1, sum(concurrency.values()))) as fetch_executor, \
+            parse_pool as parse_executor, \
+            concurrent.futures.ThreadPoolExecutor(1) as handle_executor:
+
+        async def run(parameters: dict):
+            try:
+                df = await crawl_task(
+                    dataset,
+                    module,
+                    parameters,
+                    semaphores[parameters.get("data_source", "")],
+                    fetch_executor,
+                    parse_executor,
+                )
+                await loop.run_in_executor(handle_executor, handle, parameters, df)
+                summary["rows"] += len(df)
+            except Exception as e:
+                logger.error(f"Async crawl failed for {dataset} {parameters}: {e}")
+                summary["failed"].append(parameters)
+
+        await asyncio.gather(*[run(parameters) for parameters in interleave(parameter_list)])
+        # The router's connections are per thread: return those of the handle thread before it exits.
+        await loop.run_in_executor(handle_executor, db.router.close_connection)
+
+    return summary
+
+
+def interleave(parameter_list: typing.List[dict]) -> typing.List[dict]:
+    """Order tasks round-robin across data sources so every host is kept busy from the start."""
+    by_source = collections.defaultdict(collections.deque)
+    for parameters in parameter_list:
+        by_source[parameters.get("data_source", "")].append(parameters)
+    ordered = []
+    while by_source:
+        for data_source in list(by_source):
+            ordered.append(by_source[data_source].popleft())
+            if not by_source[data_source]:
+                del by_source[data_source]
+    return ordered
+
+
+def run(
+    dataset: str,
+    parameter_list: typing.List[dict],
+    handle: typing.Callable[[dict, pd.DataFrame], None],
+    parse_processes: int = 0,
+) -> dict:
+    """Run the async crawl engine to completion and return a summary of tasks, rows and failures."""
+    summary = asyncio.run(crawl_all(dataset, parameter_list, handle, parse_processes))
+    logger.info(
+        f"Async crawl of {dataset}: {summary['tasks']} tasks, {summary['rows']} rows, "
+        f"{len(summary['failed'])} failed"
+    )
+    return summary
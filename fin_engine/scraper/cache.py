@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import os
+import typing
+
+from loguru import logger
+
+from fin_engine.config import (
+    RESPONSE_CACHE_MODE,
+    RESPONSE_CACHE_DIR,
+    RESPONSE_CACHE_EVICT_EVERY,
+    RESPONSE_CACHE_MAX_BYTES,
+)
+
+# Layout under RESPONSE_CACHE_DIR:
+#   objects/<sha[:2]>/<sha>.gz   gzip-compressed raw response bodies, deduplicated by content
+#   keys/<source>/<date>         the sha of the body last fetched for that source and date
+
+# Puts since this process last scanned the cache, and the cache size it estimates since:
+# the scanned total plus the bodies it wrote (other processes' writes show up at the next scan).
+_puts_since_scan = 0
+_estimated_bytes = 0
+
+
+def object_path(sha: str) -> str:
+    return os.path.join(RESPONSE_CACHE_DIR, "objects", sha[:2], f"{sha}.gz")
+
+
+def key_path(source: str, date: str) -> str:
+    return os.path.join(RESPONSE_CACHE_DIR, "keys", source, date)
+
+
+def atomic_write(path: str, content: bytes):
+    """Write via rename so concurrent workers never read a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def put(source: str, date: str, body: bytes):
+    """
+    Store a raw response body for a source and date.
+
+    The cache is scanned for eviction every RESPONSE_CACHE_EVICT_EVERY puts,
+    or once the estimated size goes over RESPONSE_CACHE_MAX_BYTES.
+    """
+    global _puts_since_scan, _estimated_bytes
+    sha = hashlib.sha256(body).hexdigest()
+    path = object_path(sha)
+    if not os.path.exists(path):
+        content = gzip.compress(body)
+        atomic_write(path, content)
+        _estimated_bytes += len(content)
+    atomic_write(key_path(source, date), sha.encode())
+    _puts_since_scan += 1
+    if _puts_since_scan >= RESPONSE_CACHE_EVICT_EVERY or _estimated_bytes > RESPONSE_CACHE_MAX_BYTES:
+        _estimated_bytes = evict(RESPONSE_CACHE_MAX_BYTES)
+        _puts_since_scan = 0
+
+
+def get(source: str, date: str) -> typing.Optional[bytes]:
+    """Return the cached raw response body for a source and date, if any."""
+    try:
+        with open(key_path(source, date), "rb") as f:
+            path = object_path(f.read().decode())
+        with open(path, "rb") as f:
+            body = gzip.decompress(f.read())
+        # Mark as recently used for eviction.
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return body
+
+
+def evict(max_bytes: int) -> int:
+    """
+    Delete least recently used bodies until the cache fits in max_bytes, and return its size.
+
+    Other workers may write, read or evict the same files meanwhile, so files
+    that vanish during the scan are skipped.
+    """
+    objects = []
+    for root, _, files in os.walk(os.path.join(RESPONSE_CACHE_DIR, "objects")):
+        for name in files:
+            if name.endswith(".tmp"):
+                # Still being written by another worker
+                continue
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            objects.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+    total = sum(size for _, size, _ in objects)
+    if total <= max_bytes:
+        return total
+    for _, size, path in sorted(objects):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            logger.info(f"Evicted cached response {path}")
+        except FileNotFoundError:
+            pass
+        total -= size
+    # Keys that point at evicted bodies are treated as misses by `get`.
+    return total
+
+
+def fetch(source: str, date: str, fetch_func: typing.Callable[[], typing.Optional[bytes]]) -> typing.Optional[bytes]:
+    """
+    Get a raw response body according to RESPONSE_CACHE_MODE.
+
+    In "replay" mode only the cache is read and the network is never touched.
+    Otherwise `fetch_func` downloads the body, which is stored unless the mode is "off".
+    """
+    if RESPONSE_CACHE_MODE == "replay":
+        body = get(source, date)
+        if body is None:
+            logger.warning(f"No cached response for {source} {date}")
+        return body
+    body = fetch_func()
+    if body and RESPONSE_CACHE_MODE == "write":
+        put(source, date, body)
+    return body
@@ -0,0 +1,128 @@
+import fcntl
+import json
+import os
+import time
+import typing
+
+from loguru import logger
+
+from fin_engine.config import (
+    RATE_LIMITS,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_DIR,
+)
+from fin_engine.db import clients
+
+
+def take_token(
+    tokens: float,
+    updated_at: float,
+    now: float,
+    rate: float,
+    capacity: float,
+) -> typing.Tuple[float, float]:
+    """
+    Refill the bucket up to `now` and reserve one token.
+
+    The balance may go negative: the caller then owns the next token to be
+    refilled and only has to sleep until it is due, so callers queue up in
+    order without polling. Returns the new balance and the seconds to wait.
+    """
+    tokens = min(capacity, tokens + (now - updated_at) * rate) - 1
+    wait = -tokens / rate if tokens < 0 else 0.0
+    return tokens, wait
+
+
+class FileBackend:
+    """Token buckets stored in lock-protected files, shared by all workers on one host."""
+
+    def __init__(self, directory: str = RATE_LIMIT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def reserve(self, data_source: str, rate: float, capacity: float) -> float:
+        path = os.path.join(self.directory, f"{data_source}.json")
+        with open(path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                content = f.read()
+                now = time.time()
+                state = json.loads(content) if content else {"tokens": capacity, "updated_at": now}
+                tokens, wait = take_token(state["tokens"], state["updated_at"], now, rate, capacity)
+                f.seek(0)
+                f.truncate()
+                json.dump({"tokens": tokens, "updated_at": now}, f)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return wait
+
+
+class MySQLBackend:
+    """Token buckets stored in the monitor database, shared by every worker in the cluster."""
+
+    table = "rate_limit"
+
+    def __init__(self):
+        self.engine = clients.get_mysql_monitor_engine()
+        self.engine.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS `{self.table}` (
+                data_source VARCHAR(50) NOT NULL,
+                tokens DOUBLE NOT NULL,
+                updated_at DOUBLE NOT NULL,
+                PRIMARY KEY (data_source)
+            )
+            """
+        )
+
+    def reserve(self, data_source: str, rate: float, capacity: float) -> float:
+        # The database clock is used so that skew between worker hosts does not matter.
+        with self.engine.begin() as conn:
+            conn.execute(
+                f"INSERT IGNORE INTO `{self.table}` VALUES (%s, %s, UNIX_TIMESTAMP(NOW(6)))",
+                (data_source, capacity),
+            )
+            tokens, updated_at, now = conn.execute(
+                f"""
+                SELECT tokens, updated_at, UNIX_TIMESTAMP(NOW(6))
+                FROM `{self.table}` WHERE data_source = %s FOR UPDATE
+                """,
+                (data_source,),
+            ).fetchone()
+            tokens, wait = take_token(tokens, updated_at, float(now), rate, capacity)
+            conn.execute(
+                f"UPDATE `{self.table}` SET tokens = %s, updated_at = %s WHERE data_source = %s",
+                (tokens, float(now), data_source),
+            )
+        return wait
+
+
+_backend = None
+
+
+def get_backend():
+    """Create the configured backend lazily, once per process."""
+    global _backend
+    if _backend is None:
+        if RATE_LIMIT_BACKEND == "mysql":
+            _backend = MySQLBackend()
+        elif RATE_LIMIT_BACKEND == "file":
+            _backend = FileBackend()
+        else:
+            raise ValueError(f"Unknown rate limit backend: {RATE_LIMIT_BACKEND}")
+    return _backend
+
+
+def acquire(data_source: str) -> float:
+    """Block until a request to the data source is allowed and return the seconds waited."""
+    rate = RATE_LIMITS.get(data_source)
+    if not rate:
+        return 0.0
+    wait = get_backend().reserve(data_source, rate, RATE_LIMIT_BURST)
+    if wait > 0:
+        logger.info(f"Rate limit for {data_source}: waiting {wait:.2f}s")
+        time.sleep(wait)
+    return wait
@@ -0,0 +1,51 @@
+import os
+import typing
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from fin_engine.config import HTTP_MAX_RETRIES, HTTP_BACKOFF_FACTOR
+
+# Process-wide sessions keyed by host, together with the pid that created them.
+_sessions: typing.Dict[str, typing.Tuple[int, requests.Session]] = {}
+
+
+def build_retry() -> Retry:
+    """Bounded retries with exponential backoff on 5xx responses and connection resets."""
+    return Retry(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        read=HTTP_MAX_RETRIES,
+        status=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=[500, 502, 503, 504],
+        # The exchange endpoints are read-only, so POST is safe to retry too.
+        allowed_methods=frozenset(["GET", "POST"]),
+        raise_on_status=False,
+    )
+
+
+def build_session(header_func: typing.Callable[[], dict]) -> requests.Session:
+    """Build a keep-alive session with pooled connections, retries and default headers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=build_retry())
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(header_func())
+    return session
+
+
+def get_session(host: str, header_func: typing.Callable[[], dict]) -> requests.Session:
+    """
+    Get the session for a host, creating it on first use in this process.
+
+    `header_func` is only called when the session is created. Sessions are not
+    shared with forked children, which would otherwise reuse the parent's sockets.
+    """
+    pid = os.getpid()
+    cached = _sessions.get(host)
+    if cached is None or cached[0] != pid:
+        cached = (pid, build_session(header_func))
+        _sessions[host] = cached
+    return cached[1]
@@ -1,21 +1,22 @@
 import datetime
 import io
-import time
 import typing
 
 import pandas as pd
-import requests
+
+from fin_engine import metrics, schema
+from fin_engine.config import HTTP_TIMEOUT, TAIFEX_RANGE_DAYS
+from fin_engine.scraper import cache, rate_limiter, session
 
 
 def futures_header() -> dict:
     """Request header parameters to mimic a browser when browsing the website."""
     return {
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9",
-        "Accept-Encoding": "gzip, deflate, br",
+        "Accept-Encoding": "gzip, deflate",
         "Accept-Language": "zh-TW,zh;q=0.9,en-US;q=0.8,en;q=0.7",
         "Cache-Control": "no-cache",
         "Connection": "keep-alive",
-        "Content-Length": "101",
         "Content-Type": "application/x-www-form-urlencoded",
         "Host": "www.taifex.com.tw",
         "Origin": "https://www.taifex.com.tw",
@@ -33,15 +34,15 @@ def futures_header() -> dict:
 def colname_zh2en(df: pd.DataFrame) -> pd.DataFrame:
     """Convert column names from Chinese to English for easier database storage."""
     colname_dict = {
-        "交易日期": "date",
+        "交易日期": "Date",
         "契約": "FuturesID",
         "到期月份(週別)": "ContractDate",
         "開盤價": "Open",
-        "最高價": "High",
-        "最低價": "Low",
+        "最高價": "Max",
+        "最低價": "Min",
         "收盤價": "Close",
         "漲跌價": "Change",
-        "漲跌%": "ChangePercent",
+        "漲跌%": "ChangePer",
         "成交量": "Volume",
         "結算價": "SettlementPrice",
         "未沖銷契約數": "OpenInterest",
@@ -56,56 +57,112 @@ def colname_zh2en(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def clean_data(df: pd.DataFrame) -> pd.DataFrame:
-    """Clean data."""
-    df["date"] = df["date"].str.replace("/", "-")
-    df["ChangePercent"] = df["ChangePercent"].str.replace("%", "")
+    """Clean data by converting it to the table's schema, one pass per column."""
     df["ContractDate"] = df["ContractDate"].astype(str).str.replace(" ", "")
     if "TradingSession" in df.columns:
         df["TradingSession"] = df["TradingSession"].map({"一般": "Regular", "盤後": "AfterMarket"})
     else:
         df["TradingSession"] = "Regular"
-
-    numeric_columns = [
-        "Open", "High", "Low", "Close", "Change", "ChangePercent",
-        "Volume", "SettlementPrice", "OpenInterest"
-    ]
-    df[numeric_columns] = df[numeric_columns].replace("-", "0").astype(float)
-    df = df.fillna(0)
-    return df
+    return schema.coerce(df, "taiwan_futures_daily")
 
 
-def fetch_futures_data(date: str) -> pd.DataFrame:
-    """Fetch futures data from the exchange website."""
+def download_futures_data(start_date: str, end_date: str) -> bytes:
+    """Download the raw Big5 CSV body for a date range from the exchange website."""
     url = "https://www.taifex.com.tw/cht/3/futDataDown"
     form_data = {
         "down_type": "1",
         "commodity_id": "all",
-        "queryStartDate": date.replace("-", "/"),
-        "queryEndDate": date.replace("-", "/"),
+        "queryStartDate": start_date.replace("-", "/"),
+        "queryEndDate": end_date.replace("-", "/"),
+    }
+    wait = rate_limiter.acquire("taifex")  # Avoid IP ban
+    metrics.RATE_LIMIT_WAIT_SECONDS.labels("taiwan_futures_daily", "taifex").observe(wait)
+    response = session.get_session("www.taifex.com.tw", futures_header).post(url, data=form_data, timeout=HTTP_TIMEOUT)
+    metrics.record_response("taiwan_futures_daily", "taifex", response)
+    response.raise_for_status()
+    return response.content
+
+
+def probe(parameters: dict) -> bool:
+    """Check whether the exchange has published the data of a task, by downloading a single product (TX)."""
+    date = parameters.get("crawler_date", "").replace("-", "/")
+    form_data = {
+        "down_type": "1",
+        "commodity_id": "TX",
+        "queryStartDate": date,
+        "queryEndDate": date,
     }
-    time.sleep(5)  # Sleep to avoid IP ban
-    response = requests.post(url, headers=futures_header(), data=form_data)
-    if response.ok and response.content:
-        df = pd.read_csv(io.StringIO(response.content.decode("big5")), index_col=False)
+    rate_limiter.acquire("taifex")
+    url = "https://www.taifex.com.tw/cht/3/futDataDown"
+    response = session.get_session("www.taifex.com.tw", futures_header).post(url, data=form_data, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    # Without data the exchange answers with an HTML page or a header-only CSV.
+    lines = response.content.decode("big5", errors="ignore").strip().splitlines()
+    return len(lines) > 1 and lines[0].startswith("交易日期")
+
+
+def fetch_futures_data(date: str, end_date: str = "") -> pd.DataFrame:
+    """Fetch futures data from the exchange website, or from the response cache when replaying."""
+    return read_futures_csv(fetch_raw({"crawler_date": date, "crawler_end_date": end_date or date}))
+
+
+def read_futures_csv(body: typing.Optional[bytes]) -> pd.DataFrame:
+    """Read a raw Big5 CSV body."""
+    if body:
+        df = pd.read_csv(io.StringIO(body.decode("big5")), index_col=False)
         return df
     return pd.DataFrame()
 
 
+def fetch_raw(parameters: dict) -> typing.Optional[bytes]:
+    """Get the raw response body for a task, through the response cache."""
+    date = parameters.get("crawler_date", "")
+    end_date = parameters.get("crawler_end_date", date)
+    key = date if end_date == date else f"{date}_{end_date}"
+    return cache.fetch("taifex", key, lambda: download_futures_data(date, end_date))
+
+
+def parse_raw(parameters: dict, body: typing.Optional[bytes]) -> pd.DataFrame:
+    """Parse the raw response body of a task."""
+    df = read_futures_csv(body)
+    if df.empty:
+        return df
+    df = colname_zh2en(df)
+    with metrics.phase("taiwan_futures_daily", "taifex", "clean"):
+        df = clean_data(df)
+    return df
+
+
 def generate_date_parameters(start_date: str, end_date: str) -> typing.List[dict]:
-    """Generate a list of date parameters."""
+    """
+    Generate a list of date parameters.
+
+    With TAIFEX_RANGE_DAYS > 1 each task covers a range of up to that many days,
+    never crossing a month boundary, given by `crawler_date` and `crawler_end_date`.
+    """
     start_date = datetime.datetime.strptime(start_date, "%Y-%m-%d").date()
     end_date = datetime.datetime.strptime(end_date, "%Y-%m-%d").date()
     days = (end_date - start_date).days + 1
-    return [{"crawler_date": str(start_date + datetime.timedelta(days=day)), "data_source": "taifex"} for day in
-            range(days)]
+    if TAIFEX_RANGE_DAYS <= 1:
+        return [{"crawler_date": str(start_date + datetime.timedelta(days=day)), "data_source": "taifex"} for day in
+                range(days)]
+
+    parameters = []
+    range_start = start_date
+    while range_start <= end_date:
+        next_month = (range_start.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+        range_end = min(
+            end_date,
+            next_month - datetime.timedelta(days=1),
+            range_start + datetime.timedelta(days=TAIFEX_RANGE_DAYS - 1),
+        )
+        parameters.append(
+            {"crawler_date": str(range_start), "crawler_end_date": str(range_end), "data_source": "taifex"}
+        )
+        range_start = range_end + datetime.timedelta(days=1)
+    return parameters
 
 
 def crawler(parameters: dict) -> pd.DataFrame:
-    """Main scraper function."""
-    date = parameters.get("crawler_date", "")
-    df = fetch_futures_data(date)
-    if df.empty:
-        return df
-    df = colname_zh2en(df)
-    df = clean_data(df)
-    return df
+    """Main scraper function. A range task returns the rows of every day in the range."""
+    return parse_raw(parameters, fetch_raw(parameters))
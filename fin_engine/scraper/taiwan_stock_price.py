@@ -1,11 +1,14 @@
 import datetime
-import time
+import json
 import typing
 
 import pandas as pd
-import requests
 from loguru import logger
 
+from fin_engine import metrics, schema
+from fin_engine.config import HTTP_TIMEOUT
+from fin_engine.scraper import cache, rate_limiter, session
+
 
 def is_weekend(date: datetime.date) -> bool:
     """Check if the given date is a weekend (Sunday)."""
@@ -30,23 +33,8 @@ def generate_task_parameter_list(start_date: str, end_date: str) -> typing.List[
 
 
 def clean_data(df: pd.DataFrame) -> pd.DataFrame:
-    """Clean data by converting text to numbers."""
-    cols_to_clean = ["TradeVolume", "Transaction", "TradeValue", "Open", "Max", "Min", "Close", "Change"]
-    for col in cols_to_clean:
-        df[col] = (
-            df[col].astype(str)
-            .str.replace(",", "")
-            .str.replace("X", "")
-            .str.replace("+", "")
-            .str.replace("----", "0")
-            .str.replace("---", "0")
-            .str.replace("--", "0")
-            .str.replace(" ", "")
-            .str.replace("除權息", "0")
-            .str.replace("除息", "0")
-            .str.replace("除權", "0")
-        )
-    return df
+    """Clean data by converting it to the table's schema, one pass per column."""
+    return schema.coerce(df, "taiwan_stock_price")
 
 
 def convert_column_names(df: pd.DataFrame, col_names: typing.List[str]) -> pd.DataFrame:
@@ -111,38 +99,54 @@ def set_column_names(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def fetch_tpex(date: str) -> bytes:
+    """Download the raw TPEX response body."""
+    url = f"https://www.tpex.org.tw/web/stock/aftertrading/otc_quotes_no1430/stk_wn1430_result.php?l=zh-tw&d={convert_date(date)}&se=AL"
+    wait = rate_limiter.acquire("tpex")  # Avoid IP ban
+    metrics.RATE_LIMIT_WAIT_SECONDS.labels("taiwan_stock_price", "tpex").observe(wait)
+    response = session.get_session("www.tpex.org.tw", tpex_header).get(url, timeout=HTTP_TIMEOUT)
+    metrics.record_response("taiwan_stock_price", "tpex", response)
+    response.raise_for_status()
+    return response.content
+
+
 def crawl_tpex(date: str) -> pd.DataFrame:
     """Crawl TPEX data."""
     logger.info("Crawling TPEX data for date: {}", date)
-    url = f"https://www.tpex.org.tw/web/stock/aftertrading/otc_quotes_no1430/stk_wn1430_result.php?l=zh-tw&d={convert_date(date)}&se=AL"
-    time.sleep(5)  # Avoid IP ban
-    response = requests.get(url, headers=tpex_header())
-    data = response.json().get("aaData", [])
+    return parse_tpex(cache.fetch("tpex", date, lambda: fetch_tpex(date)), date)
+
+
+def parse_tpex(body: typing.Optional[bytes], date: str) -> pd.DataFrame:
+    """Parse a raw TPEX response body."""
+    if not body:
+        return pd.DataFrame()
+    data = json.loads(body).get("aaData", [])
 
     if not data:
         return pd.DataFrame()
 
     df = pd.DataFrame(data)
     df = df.iloc[:, [0, 2, 3, 4, 5, 6, 7, 8, 9]]
-    df = set_column_names(df.copy())
+    df = set_column_names(df)
     df["Date"] = date
-    df = clean_data(df.copy())
+    with metrics.phase("taiwan_stock_price", "tpex", "clean"):
+        df = clean_data(df)
     return df
 
 
-def convert_twse_response_to_dataframe(response) -> typing.Tuple[pd.DataFrame, typing.List[str]]:
-    """Convert TWSE response to DataFrame."""
+def convert_twse_response_to_dataframe(data: dict) -> typing.Tuple[pd.DataFrame, typing.List[str]]:
+    """Convert the decoded TWSE JSON response to DataFrame."""
     df = pd.DataFrame()
     col_names = []
 
     try:
-        if "data9" in response.json():
-            df = pd.DataFrame(response.json()["data9"])
-            col_names = response.json()["fields9"]
-        elif "data8" in response.json():
-            df = pd.DataFrame(response.json()["data8"])
-            col_names = response.json()["fields8"]
-        elif response.json()["stat"] in ["查詢日期小於93年2月11日，請重新查詢!", "很抱歉，沒有符合條件的資料!"]:
+        if "data9" in data:
+            df = pd.DataFrame(data["data9"])
+            col_names = data["fields9"]
+        elif "data8" in data:
+            df = pd.DataFrame(data["data8"])
+            col_names = data["fields8"]
+        elif data["stat"] in ["查詢日期小於93年2月11日，請重新查詢!", "很抱歉，沒有符合條件的資料!"]:
             pass
     except Exception as e:
         logger.error(e)
@@ -150,31 +154,45 @@ def convert_twse_response_to_dataframe(response) -> typing.Tuple[pd.DataFrame, t
     return df, col_names
 
 
+def fetch_twse(date: str) -> bytes:
+    """Download the raw TWSE response body."""
+    url = f"https://www.twse.com.tw/exchangeReport/MI_INDEX?response=json&date={date.replace('-', '')}&type=ALL"
+    wait = rate_limiter.acquire("twse")  # Avoid IP ban
+    metrics.RATE_LIMIT_WAIT_SECONDS.labels("taiwan_stock_price", "twse").observe(wait)
+    response = session.get_session("www.twse.com.tw", twse_header).get(url, timeout=HTTP_TIMEOUT)
+    metrics.record_response("taiwan_stock_price", "twse", response)
+    response.raise_for_status()
+    return response.content
+
+
 def crawl_twse(date: str) -> pd.DataFrame:
     """Crawl TWSE data."""
     logger.info("Crawling TWSE data for date: {}", date)
-    url = f"https://www.twse.com.tw/exchangeReport/MI_INDEX?response=json&date={date.replace('-', '')}&type=ALL"
-    time.sleep(5)  # Avoid IP ban
-    response = requests.get(url, headers=twse_header())
-    df, col_names = convert_twse_response_to_dataframe(response)
+    return parse_twse(cache.fetch("twse", date, lambda: fetch_twse(date)), date)
+
+
+def parse_twse(body: typing.Optional[bytes], date: str) -> pd.DataFrame:
+    """Parse a raw TWSE response body."""
+    if not body:
+        return pd.DataFrame()
+    df, col_names = convert_twse_response_to_dataframe(json.loads(body))
 
     if df.empty:
         return pd.DataFrame()
 
-    df = convert_column_names(df.copy(), col_names)
+    df = convert_column_names(df, col_names)
     df["Date"] = date
-    df = convert_change(df.copy())
-    df = clean_data(df.copy())
+    with metrics.phase("taiwan_stock_price", "twse", "clean"):
+        df = convert_change(df)
+        df = clean_data(df)
     return df
 
 
 def convert_change(df: pd.DataFrame) -> pd.DataFrame:
-    """Convert change column values."""
+    """Prefix the change with its sign, taken from the HTML of the direction column."""
     logger.info("Converting change column values")
-    df["Dir"] = df["Dir"].str.split(">").str[1].str.split("<").str[0]
-    df["Change"] = df["Dir"] + df["Change"]
-    df["Change"] = df["Change"].str.replace(" ", "").str.replace("X", "").astype(float)
-    df = df.fillna("")
+    sign = df["Dir"].str.split(">").str[1].str.split("<").str[0]
+    df["Change"] = sign.fillna("") + df["Change"]
     df = df.drop(columns=["Dir"])
     return df
 
@@ -187,14 +205,56 @@ def convert_date(date: str) -> str:
     return f"{year}/{month}/{day}"
 
 
-def crawl(parameters: dict) -> pd.DataFrame:
-    """Main crawling function."""
-    logger.info("Crawling with parameters: {}", parameters)
+def probe(parameters: dict) -> bool:
+    """
+    Check whether the exchange has published the data of a task.
+
+    Asks for a small report of the same date (the TWSE market summary, one TPEX
+    industry) instead of the full market.
+    """
     date = parameters.get("crawler_date", "")
     data_source = parameters.get("data_source", "")
 
     if data_source == "twse":
-        return crawl_twse(date)
+        url = f"https://www.twse.com.tw/exchangeReport/MI_INDEX?response=json&date={date.replace('-', '')}&type=MS"
+        rate_limiter.acquire("twse")
+        response = session.get_session("www.twse.com.tw", twse_header).get(url, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        return response.json().get("stat") == "OK"
     elif data_source == "tpex":
-        return crawl_tpex(date)
+        url = f"https://www.tpex.org.tw/web/stock/aftertrading/otc_quotes_no1430/stk_wn1430_result.php?l=zh-tw&d={convert_date(date)}&se=02"
+        rate_limiter.acquire("tpex")
+        response = session.get_session("www.tpex.org.tw", tpex_header).get(url, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        return bool(response.json().get("aaData"))
+    return False
+
+
+def fetch_raw(parameters: dict) -> typing.Optional[bytes]:
+    """Get the raw response body for a task, through the response cache."""
+    date = parameters.get("crawler_date", "")
+    data_source = parameters.get("data_source", "")
+
+    if data_source == "twse":
+        return cache.fetch("twse", date, lambda: fetch_twse(date))
+    elif data_source == "tpex":
+        return cache.fetch("tpex", date, lambda: fetch_tpex(date))
+    return None
+
+
+def parse_raw(parameters: dict, body: typing.Optional[bytes]) -> pd.DataFrame:
+    """Parse the raw response body of a task."""
+    date = parameters.get("crawler_date", "")
+    data_source = parameters.get("data_source", "")
+
+    if data_source == "twse":
+        return parse_twse(body, date)
+    elif data_source == "tpex":
+        return parse_tpex(body, date)
     return pd.DataFrame()
+
+
+def crawl(parameters: dict) -> pd.DataFrame:
+    """Main crawling function."""
+    logger.info("Crawling with parameters: {}", parameters)
+    return parse_raw(parameters, fetch_raw(parameters))
@@ -0,0 +1,104 @@
+import datetime
+import os
+import typing
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from fin_engine.config import PARQUET_DIR
+from fin_engine.db import counts
+
+# Hive-style layout: <PARQUET_DIR>/<dataset>/year=<YYYY>/Date=<YYYY-MM-DD>/<data_source>.parquet
+# The date lives in the path only, so readers get it back as the `Date` partition column.
+PARTITIONING = ds.partitioning(pa.schema([("year", pa.int16()), ("Date", pa.date32())]), flavor="hive")
+
+
+def partition_dir(dataset: str, date: str, root: str = PARQUET_DIR) -> str:
+    """Directory of one dataset's date partition."""
+    return os.path.join(root, dataset, f"year={date[:4]}", f"Date={date}")
+
+
+def write_partition(df: pd.DataFrame, dataset: str, data_source: str, root: str = PARQUET_DIR) -> typing.List[str]:
+    """
+    Write a DataFrame to the Parquet store, one file per date and data source.
+
+    Each file is replaced atomically, so re-running a task overwrites its own
+    partitions without touching what other data sources wrote for the same date.
+
+    Parameters:
+    - df: The scraped data, with a `Date` column. An empty frame (no trading that day) writes nothing.
+    - dataset: The dataset name, the top-level directory of the store.
+    - data_source: The source of the rows, used as the file name within a date.
+    - root: The root of the store.
+
+    Returns the paths of the written files.
+    """
+    if df.empty:
+        return []
+    date_column = counts.find_date_column(list(df.columns))
+    if date_column is None:
+        raise ValueError(f"{dataset} has no Date column to partition by")
+    paths = []
+    for date, chunk in df.groupby(df[date_column].astype(str).str[:10]):
+        directory = partition_dir(dataset, date, root)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{data_source or 'data'}.parquet")
+        chunk = chunk.drop(columns=date_column)
+        # Plain strings: the dictionary index width of a categorical depends on its size
+        # and would differ between files.
+        chunk = chunk.astype({col: str for col in chunk.columns if isinstance(chunk[col].dtype, pd.CategoricalDtype)})
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        # A dot prefix hides an unfinished file from readers
+        tmp_path = os.path.join(directory, f".{uuid.uuid4().hex}.tmp")
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+
+def open_dataset(dataset: str, root: str = PARQUET_DIR) -> ds.Dataset:
+    """Open a dataset of the store with memory-mapped file access."""
+    return ds.dataset(
+        os.path.join(root, dataset),
+        format="parquet",
+        partitioning=PARTITIONING,
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+        ignore_prefixes=[".", "_"],
+    )
+
+
+def read(
+    dataset: str,
+    columns: typing.Optional[typing.List[str]] = None,
+    start_date: typing.Optional[str] = None,
+    end_date: typing.Optional[str] = None,
+    filter: typing.Optional[ds.Expression] = None,
+    root: str = PARQUET_DIR,
+) -> pd.DataFrame:
+    """
+    Read a dataset from the Parquet store.
+
+    Only the requested columns are decoded, and date bounds prune whole
+    year and date partitions before any file is opened.
+
+    Parameters:
+    - dataset: The dataset name.
+    - columns: The columns to read; all columns when omitted. `Date` is a column too.
+    - start_date: The first date to read, inclusive.
+    - end_date: The last date to read, inclusive.
+    - filter: An extra row filter, e.g. `ds.field("StockID") == "2330"`.
+    - root: The root of the store.
+    """
+    expression = filter
+    for bound, op in ((start_date, "__ge__"), (end_date, "__le__")):
+        if bound is None:
+            continue
+        date = datetime.date.fromisoformat(bound)
+        condition = getattr(ds.field("year"), op)(date.year) & getattr(ds.field("Date"), op)(date)
+        expression = condition if expression is None else expression & condition
+    table = open_dataset(dataset, root).to_table(columns=columns, filter=expression)
+    return table.to_pandas()
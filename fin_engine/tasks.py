@@ -1,26 +1,186 @@
-import importlib
+import collections
+import functools
 import typing
 
-from fin_engine import db
+import pandas as pd
+from loguru import logger
+
+from fin_engine import db, derived, metrics, planner, registry, retry, schema, storage
+from fin_engine.config import DERIVED_DATASETS, STORAGE_SINKS, UPLOAD_DEDUP
+from fin_engine.db import hashes
+from fin_engine.scraper import async_engine
 from fin_engine.worker import app, CallbackTask
 
 
+def upload(dataset: str, parameters: typing.Dict[str, str], df: pd.DataFrame, force: bool = False):
+    """
+    Upload a task's data to each storage sink, one transaction per day for range tasks, and record its metrics.
+
+    With force, the data is written even if it is unchanged since the last upload.
+    """
+    upload_many(dataset, [(parameters, df)], force)
+
+
+def upload_many(
+    dataset: str,
+    results: typing.List[typing.Tuple[typing.Dict[str, str], pd.DataFrame]],
+    force: bool = False,
+):
+    """
+    Upload the data of several tasks of a dataset to each storage sink, and record their metrics.
+
+    Each day goes to MySQL in its own transaction, unless the days of a data
+    source add up to BULK_LOAD_THRESHOLD rows: those are bulk-loaded together
+    (see `upload_mysql_bulk`), e.g. a multi-year range task or a backfill batch.
+
+    Parameters:
+    - dataset: The name of the dataset.
+    - results: The parameters and data of each task.
+    - force: Write the data even if it is unchanged since the last upload.
+    """
+    by_source = collections.defaultdict(list)
+    for parameters, df in results:
+        schema.validate(df, dataset)
+        data_source = parameters.get("data_source", "")
+        metrics.TASK_ROWS.labels(dataset, data_source).observe(len(df))
+        by_source[data_source].append((parameters, df))
+
+    for data_source, source_results in by_source.items():
+        with metrics.phase(dataset, data_source, "upload"):
+            # Weekends and holidays come back empty: nothing to store
+            chunks = [chunk for _, df in source_results for chunk in db.split_by_date(df) if not chunk.empty]
+            if "mysql" in STORAGE_SINKS:
+                if db.choose_upload_method(sum(len(chunk) for chunk in chunks)) == "load":
+                    upload_mysql_bulk(dataset, data_source, chunks, force)
+                else:
+                    for chunk in chunks:
+                        upload_mysql(dataset, data_source, chunk, force)
+            if "parquet" in STORAGE_SINKS:
+                for chunk in chunks:
+                    storage.write_partition(chunk, dataset, data_source)
+            if "mysql" in STORAGE_SINKS:
+                # Recorded once everything is stored, with 0 for dates without data, for the planner
+                for parameters, df in source_results:
+                    planner.record_crawl(dataset, parameters, df, db.router.mysql_financialdata_conn)
+
+
+def upload_mysql(dataset: str, data_source: str, df: pd.DataFrame, force: bool = False):
+    """Upload one date of data to MySQL, leaving out what is unchanged since the last upload unless forced."""
+    declaration = registry.get(dataset)
+    changed, save_hash = hashes.changed_rows(
+        df,
+        dataset,
+        data_source,
+        UPLOAD_DEDUP,
+        declaration.key_columns,
+        db.router.mysql_monitor_conn,
+        force=force,
+    )
+    metrics.UPLOAD_SKIPPED_ROWS.labels(dataset, data_source).inc(len(df) - len(changed))
+    db.upload_data(
+        changed,
+        declaration.table,
+        db.router.mysql_financialdata_conn,
+        track_counts=True,
+        key_columns=declaration.key_columns,
+    )
+    if dataset in DERIVED_DATASETS and not changed.empty:
+        # The whole date is passed: futures metrics need every contract of a day, not just the changed rows.
+        update_derived(dataset, data_source, df)
+    # Saved last, so a retried task uploads again instead of skipping the unchanged data
+    save_hash()
+
+
+def upload_mysql_bulk(dataset: str, data_source: str, chunks: typing.List[pd.DataFrame], force: bool = False):
+    """Upload many dates of data to MySQL in one LOAD DATA transaction, leaving out what is unchanged unless forced."""
+    declaration = registry.get(dataset)
+    changed_chunks, save_hashes = [], []
+    for chunk in chunks:
+        changed, save_hash = hashes.changed_rows(
+            chunk,
+            dataset,
+            data_source,
+            UPLOAD_DEDUP,
+            declaration.key_columns,
+            db.router.mysql_monitor_conn,
+            force=force,
+        )
+        metrics.UPLOAD_SKIPPED_ROWS.labels(dataset, data_source).inc(len(chunk) - len(changed))
+        changed_chunks.append(changed)
+        save_hashes.append(save_hash)
+    db.upload_data(
+        pd.concat(changed_chunks, ignore_index=True),
+        declaration.table,
+        db.router.mysql_financialdata_conn,
+        method="load",
+        track_counts=True,
+        key_columns=declaration.key_columns,
+    )
+    if dataset in DERIVED_DATASETS:
+        # In date order, so that the state of each series only moves forward
+        for chunk, changed in sorted(zip(chunks, changed_chunks), key=lambda pair: str(pair[0]["Date"].iloc[0])):
+            if not changed.empty:
+                update_derived(dataset, data_source, chunk)
+    for save_hash in save_hashes:
+        save_hash()
+
+
+def update_derived(dataset: str, data_source: str, df: pd.DataFrame):
+    """
+    Update the derived metrics of uploaded rows.
+
+    Retryable (database) errors are raised, so the task runs again. Other
+    failures are counted and their dates recorded for `derived.recompute_pending`,
+    as the upload itself succeeded.
+    """
+    try:
+        with metrics.phase(dataset, data_source, "derived"):
+            derived.update(dataset, df, db.router.mysql_financialdata_conn)
+    except Exception as e:
+        metrics.DERIVED_FAILURES.labels(dataset, data_source).inc()
+        if retry.is_retryable(e):
+            raise
+        logger.error(f"Failed to update the derived metrics of {dataset}, recording them as pending: {e}")
+        dates = sorted(set(df["Date"].astype(str).str[:10]))
+        derived.record_pending(dataset, dates, str(e), db.router.mysql_financialdata_conn)
+
+
 # Register the task. Only registered tasks can be sent to RabbitMQ.
 @app.task(base=CallbackTask)
-def crawler(dataset: str, parameters: typing.Dict[str, str]):
+def crawler(dataset: str, parameters: typing.Dict[str, str], force: bool = False):
     """
     Crawler task to scrape data based on the given dataset and parameters.
 
     Parameters:
     - dataset: The name of the dataset to scrape.
     - parameters: A dictionary of parameters to pass to the scraper.
+    - force: Write the data even if it is unchanged since the last upload.
     """
-    # Use getattr and importlib to dynamically import the scraper module
-    scraper_module = importlib.import_module(f"financialdata.scraper.{dataset}")
-    scraper = getattr(scraper_module, "scraper")
+    # Look up the scraper functions, imported when the worker process started
+    scraper = registry.get(dataset)
+    data_source = parameters.get("data_source", "")
 
-    # Perform the web scraping
-    df = scraper(parameters=parameters)
+    # Perform the web scraping, timing the fetch and parse phases separately
+    body = metrics.timed_call(dataset, data_source, "fetch", scraper.fetch_raw, parameters)
+    df = metrics.timed_call(dataset, data_source, "parse", scraper.parse_raw, parameters, body)
 
     # Upload the scraped data to the database
-    db.upload_data(df, dataset, db.router.mysql_financialdata_conn)
+    upload(dataset, parameters, df, force)
+
+
+@app.task(base=CallbackTask)
+def crawler_batch(dataset: str, parameter_list: typing.List[typing.Dict[str, str]], force: bool = False):
+    """
+    Crawler task that runs many parameters of a dataset concurrently in this worker.
+
+    Parameters:
+    - dataset: The name of the dataset to scrape.
+    - parameter_list: The parameters of each crawl, as passed to `crawler`.
+    - force: Write the data even if it is unchanged since the last upload.
+    """
+    summary = async_engine.run(dataset, parameter_list, functools.partial(upload, dataset, force=force))
+
+    # Hand failures over to single-date tasks so they follow the retry policy on their own
+    for parameters in summary["failed"]:
+        task = crawler.s(dataset=dataset, parameters=parameters, force=force)
+        task.apply_async(queue=parameters.get("data_source", ""))
@@ -1,45 +1,71 @@
-import importlib
+import os
 import socket
-import time
 
 import pymysql
 from loguru import logger
 
 from celery import Celery, Task
-from fin_engine import db
+from celery.signals import task_postrun, worker_init, worker_process_init, worker_process_shutdown
+from fin_engine import db, metrics, registry, retry
 from fin_engine.config import (
+    DEAD_LETTER_QUEUE,
     MESSAGE_QUEUE_HOST,
     MESSAGE_QUEUE_PORT,
+    METRICS_PORT,
+    TASK_MAX_RETRIES,
     WORKER_ACCOUNT,
     WORKER_PASSWORD,
 )
 
 
 class CallbackTask(Task):
-    def retry_task(self, **kwargs):
-        """Retry the task if it fails."""
-        logger.info(f"Retrying task with kwargs: {kwargs}")
-        scraper = getattr(importlib.import_module("fin_engine.tasks"), "scraper")
-        dataset = kwargs.get("dataset")
-        parameters = kwargs.get("parameters")
-        task = scraper.s(dataset=dataset, parameters=parameters)
-        task.apply_async(queue=parameters.get("data_source", ""))
+    """
+    Task base class with a retry policy.
+
+    Retryable failures (see `retry.is_retryable`) are re-sent with a countdown
+    of exponential backoff plus jitter, so no worker slot sleeps in the meantime.
+    Permanent failures, and tasks that run out of TASK_MAX_RETRIES, are logged to
+    `celery_log` and parked on the DEAD_LETTER_QUEUE.
+    """
+
+    max_retries = TASK_MAX_RETRIES
+
+    def __call__(self, *args, **kwargs):
+        try:
+            return super().__call__(*args, **kwargs)
+        except Exception as exc:
+            if retry.is_retryable(exc) and self.request.retries < self.max_retries:
+                countdown = retry.backoff(self.request.retries)
+                logger.warning(f"Retrying task {self.request.id} in {countdown:.0f}s: {exc}")
+                raise self.retry(exc=exc, countdown=countdown)
+            raise
 
     def on_success(self, retval, task_id, args, kwargs):
         logger.info(f"Task succeeded: {task_id}")
         return super().on_success(retval, task_id, args, kwargs)
 
+    def on_retry(self, exc, task_id, args, kwargs, einfo):
+        parameters = kwargs.get("parameters") or {}
+        metrics.RETRIES.labels(kwargs.get("dataset", ""), parameters.get("data_source", ""), "task").inc()
+        return super().on_retry(exc, task_id, args, kwargs, einfo)
+
     def on_failure(self, exc, task_id, args, kwargs, einfo):
-        """Log the failure and retry the task."""
+        """Log the failure and move the task to the dead-letter queue."""
         logger.error(f"Task failed: {task_id}, Exception: {exc}")
+        logger.info(f"Task arguments: {args}")
+        logger.info(f"Task keyword arguments: {kwargs}")
+
+        # Park the task first so it is kept even if the database is the failing part.
+        self.apply_async(args=args, kwargs=kwargs, queue=DEAD_LETTER_QUEUE)
 
         sql = """
             INSERT INTO `celery_log` (
                 `retry`, `status`, `worker`, `task_id`, `msg`, `info`, `args`, `kwargs`
             ) VALUES (
-                '0', '-1', '{}', '{}', '{}', '{}', '{}', '{}'
+                '{}', '-1', '{}', '{}', '{}', '{}', '{}', '{}'
             )
         """.format(
+            min(self.request.retries, 9),
             socket.gethostname(),
             task_id,
             pymysql.converters.escape_string(str(exc)),
@@ -47,14 +73,10 @@ class CallbackTask(Task):
             pymysql.converters.escape_string(str(args)),
             pymysql.converters.escape_string(str(kwargs)),
         )
-
-        db.commit(sql=sql, mysql_conn=db.router.mysql_financialdata_conn)
-
-        logger.info(f"Task arguments: {args}")
-        logger.info(f"Task keyword arguments: {kwargs}")
-
-        self.retry_task(kwargs)
-        time.sleep(3)
+        try:
+            db.commit(sql=sql, mysql_conn=db.router.mysql_financialdata_conn)
+        except Exception as e:
+            logger.error(f"Failed to write celery_log for task {task_id}: {e}")
 
         return super().on_failure(exc, task_id, args, kwargs, einfo)
 
@@ -65,3 +87,34 @@ app = Celery(
     include=["fin_engine.tasks"],
     broker=broker_url,
 )
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    """Expose the worker's Prometheus metrics from the main worker process."""
+    if METRICS_PORT:
+        metrics.start_server(METRICS_PORT)
+
+
+@worker_process_init.connect
+def warm_up_registry(**kwargs):
+    """Import and check every dataset's scraper once per worker process, before any task arrives."""
+    registry.warm_up()
+
+
+@task_postrun.connect
+def release_db_connections(**kwargs):
+    """
+    Return the task's database connections to the pool once it finishes.
+
+    The next task checks out a connection again, which `pool_pre_ping` and
+    `pool_recycle` validate, instead of holding one that MySQL drops after
+    `wait_timeout` while the worker is idle.
+    """
+    db.router.close_connection()
+
+
+@worker_process_shutdown.connect
+def clean_up_metrics(pid=None, **kwargs):
+    """Let the multiprocess collector forget an exiting pool child."""
+    metrics.mark_process_dead(pid or os.getpid())
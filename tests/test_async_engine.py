@@ -0,0 +1,35 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+import types
+
+import pandas as pd
+from prometheus_client import REGISTRY
+
+from fin_engine.scraper import async_engine
+
+
+def parse_raw(parameters: dict, body: bytes) -> pd.DataFrame:
+    return pd.DataFrame({"Date": [parameters["crawler_date"]], "Body": [body.decode()]})
+
+
+def parse_count(dataset: str) -> float:
+    labels = {"dataset": dataset, "data_source": "twse", "phase": "parse"}
+    return REGISTRY.get_sample_value("fin_engine_task_phase_seconds_count", labels) or 0.0
+
+
+def test_parse_time_in_a_spawned_process_is_recorded_by_the_parent():
+    module = types.SimpleNamespace(fetch_raw=lambda parameters: b"payload", parse_raw=parse_raw)
+    parameters = {"crawler_date": "2024-01-02", "data_source": "twse"}
+    before = parse_count("backfill_test")
+
+    async def crawl():
+        with concurrent.futures.ThreadPoolExecutor(1) as fetch_executor, \
+                concurrent.futures.ProcessPoolExecutor(1, multiprocessing.get_context("spawn")) as parse_executor:
+            return await async_engine.crawl_task(
+                "backfill_test", module, parameters, asyncio.Semaphore(1), fetch_executor, parse_executor
+            )
+
+    df = asyncio.run(crawl())
+    assert df["Body"].tolist() == ["payload"]
+    assert parse_count("backfill_test") == before + 1
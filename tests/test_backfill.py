@@ -0,0 +1,33 @@
+from unittest import mock
+
+import pandas as pd
+
+from fin_engine import backfill
+
+
+def test_results_are_uploaded_in_batches_of_the_bulk_load_threshold(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    progress = backfill.Progress("taiwan_stock_price", 3, path)
+    frames = [pd.DataFrame({"Close": [1.0] * 600}) for _ in range(3)]
+    parameters = [{"crawler_date": f"2024-01-0{day}", "data_source": "twse"} for day in (2, 3, 4)]
+    with mock.patch.object(backfill, "BULK_LOAD_THRESHOLD", 1000), \
+            mock.patch.object(backfill, "upload_many") as upload_many:
+        for task_parameters, df in zip(parameters, frames):
+            progress(task_parameters, df)
+        # The first two reach the threshold together; the last one waits for the final flush
+        assert [len(call[0][1]) for call in upload_many.call_args_list] == [2]
+        progress.flush()
+    assert [len(call[0][1]) for call in upload_many.call_args_list] == [2, 1]
+    assert backfill.load_checkpoint(path) == {backfill.task_key(task_parameters) for task_parameters in parameters}
+    assert progress.rows == 1800
+
+
+def test_failed_batch_is_reported_and_not_checkpointed(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    progress = backfill.Progress("taiwan_stock_price", 1, path)
+    parameters = {"crawler_date": "2024-01-02", "data_source": "twse"}
+    with mock.patch.object(backfill, "upload_many", side_effect=RuntimeError("load failed")):
+        progress(parameters, pd.DataFrame({"Close": [1.0]}))
+        progress.flush()
+    assert progress.failed == [parameters]
+    assert backfill.load_checkpoint(path) == set()
@@ -0,0 +1,45 @@
+import os
+from unittest import mock
+
+import pytest
+
+from fin_engine.scraper import cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    with mock.patch.object(cache, "RESPONSE_CACHE_DIR", str(tmp_path)), \
+            mock.patch.object(cache, "_puts_since_scan", 0), \
+            mock.patch.object(cache, "_estimated_bytes", 0):
+        yield tmp_path
+
+
+def test_cache_is_scanned_every_n_puts_not_on_every_put():
+    with mock.patch.object(cache, "RESPONSE_CACHE_EVICT_EVERY", 3), \
+            mock.patch.object(cache, "evict", return_value=0) as evict:
+        for day in range(1, 7):
+            cache.put("twse", f"2024-01-0{day}", f"body {day}".encode())
+    assert evict.call_count == 2
+
+
+def test_cache_is_scanned_once_over_its_size():
+    with mock.patch.object(cache, "RESPONSE_CACHE_EVICT_EVERY", 100), \
+            mock.patch.object(cache, "RESPONSE_CACHE_MAX_BYTES", 10), \
+            mock.patch.object(cache, "evict", return_value=0) as evict:
+        cache.put("twse", "2024-01-02", os.urandom(100))
+    evict.assert_called_once_with(10)
+
+
+def test_evict_skips_files_removed_meanwhile():
+    cache.put("twse", "2024-01-02", b"first body")
+    cache.put("twse", "2024-01-03", b"second body")
+    real_stat = os.stat
+
+    def stat(path, *args, **kwargs):
+        # Another worker evicts the file between the directory walk and the stat
+        os.remove(path)
+        return real_stat(path, *args, **kwargs)
+
+    with mock.patch.object(cache.os, "stat", side_effect=stat):
+        assert cache.evict(0) == 0
+    assert cache.get("twse", "2024-01-02") is None
@@ -0,0 +1,74 @@
+import datetime
+from unittest import mock
+
+import pandas as pd
+import pytest
+from sqlalchemy import exc as sa_exc
+
+from fin_engine import db, retry
+
+
+def test_failed_upsert_is_rolled_back_and_raised():
+    df = pd.DataFrame({"StockID": ["2330"], "Close": [580.0], "Date": ["2024-01-02"]})
+    mysql_conn = mock.MagicMock()
+    mysql_conn.execution_options.return_value.execute.side_effect = sa_exc.OperationalError(
+        "INSERT", {}, Exception("Lost connection to MySQL server during query")
+    )
+    with pytest.raises(sa_exc.OperationalError) as error:
+        db.upload_data(df, "taiwan_stock_price", mysql_conn, method="upsert")
+    mysql_conn.begin.return_value.rollback.assert_called_once()
+    assert retry.is_retryable(error.value)
+
+
+def test_new_rows_count_repeated_keys_once_and_lock_stored_keys():
+    mysql_conn = mock.MagicMock()
+    colnames = ["StockID", "Date", "Close"]
+    records = [
+        ("2330", "2024-01-02", 580.0),
+        ("2330", "2024-01-02", 581.0),
+        ("2317", "2024-01-02", 104.0),
+        ("2330", "2024-01-03", 590.0),
+    ]
+    mysql_conn.execute.return_value.fetchall.return_value = [("2024-01-02", 1)]
+    with mock.patch.object(db.counts, "get_primary_key", return_value=["StockID", "Date"]):
+        deltas = db.counts.count_new_rows("taiwan_stock_price", colnames, records, mysql_conn)
+    assert deltas == {"2024-01-02": 1, "2024-01-03": 1}
+    sql, params = mysql_conn.execute.call_args[0]
+    assert "FOR UPDATE" in sql
+    assert params == ("2330", "2024-01-02", "2317", "2024-01-02", "2330", "2024-01-03")
+
+
+def test_upsert_keeps_the_time_of_datetime_key_columns():
+    query_time = pd.Timestamp("2024-01-02 15:07:00")
+    df = pd.DataFrame({
+        "dataset_name": ["taiwan_stock_price"],
+        "date": pd.to_datetime(["2024-01-02"]),
+        "count": [1000],
+        "monitor_query_time": [query_time],
+    })
+    mysql_conn = mock.MagicMock()
+    db.upload_data(df, "DatasetCountDaily", mysql_conn, method="upsert")
+    sql, params = mysql_conn.execution_options.return_value.execute.call_args[0]
+    assert params == ("taiwan_stock_price", datetime.date(2024, 1, 2), 1000, datetime.datetime(2024, 1, 2, 15, 7))
+    assert type(params[1]) is datetime.date
+    assert type(params[3]) is datetime.datetime
+
+
+def test_upload_method_switches_to_load_at_the_threshold():
+    with mock.patch.object(db.db, "BULK_LOAD_THRESHOLD", 20000):
+        assert db.choose_upload_method(19999) == "upsert"
+        assert db.choose_upload_method(20000) == "load"
+    with mock.patch.object(db.db, "BULK_LOAD_THRESHOLD", 0):
+        assert db.choose_upload_method(1000000) == "upsert"
+
+
+def test_versions_are_bumped_after_the_commit_for_dataset_tables_only():
+    df = pd.DataFrame({"StockID": ["2330"], "Close": [580.0], "Date": ["2024-01-02"]})
+    mysql_conn = mock.MagicMock()
+    calls = mock.Mock()
+    mysql_conn.begin.return_value.commit.side_effect = lambda: calls.commit()
+    with mock.patch.object(db.read, "bump_versions", side_effect=lambda *args: calls.bump(args[0])):
+        db.upload_data(df, "taiwan_stock_price", mysql_conn, method="upsert")
+        db.upload_data(df.rename(columns={"Date": "date"}), "DatasetCountDaily", mysql_conn, method="upsert")
+    assert [call[0] for call in calls.mock_calls] == ["commit", "bump", "commit"]
+    assert calls.bump.call_args[0] == ("taiwan_stock_price",)
@@ -0,0 +1,115 @@
+import functools
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fin_engine import derived, schema, storage
+
+DATES = pd.bdate_range("2024-01-01", periods=30)
+
+
+def stock_frame() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    rows = [
+        dict(
+            StockID=stock_id, TradeVolume=int(rng.integers(1000, 9000)), Transaction=1, TradeValue=1,
+            Open=1, Max=1, Min=1, Close=float(rng.uniform(10, 20)), Change=0, Date=date,
+        )
+        for date in DATES
+        for stock_id in ("1101", "2330")
+    ]
+    return schema.coerce(pd.DataFrame(rows).astype(str), "taiwan_stock_price")
+
+
+def futures_frame() -> pd.DataFrame:
+    rows = [
+        dict(
+            Date=date, FuturesID="TX", ContractDate=contract, Open=0, Max=0, Min=0, Close=0, Change=0,
+            ChangePer=0, Volume=100, SettlementPrice=price + day, OpenInterest=1, TradingSession=session,
+        )
+        for day, date in enumerate(DATES[:3])
+        for contract, price in (("202402", 101), ("202401", 100), ("202401/202402", 1))
+        for session in ("Regular", "AfterMarket")
+    ]
+    return schema.coerce(pd.DataFrame(rows).astype(str), "taiwan_futures_daily")
+
+
+def test_compute_matches_per_series_rolling():
+    inputs = derived.stock_inputs(stock_frame())
+    result = derived.compute(inputs).set_index(["series", "Date"])
+    grouped = inputs.sort_values(["series", "Date"]).groupby("series")
+    expected = inputs.sort_values(["series", "Date"]).assign(
+        MA20=grouped["Close"].transform(lambda s: s.rolling(20).mean()),
+        Return=grouped["Close"].pct_change(),
+    ).set_index(["series", "Date"])
+    assert np.allclose(result["MA20"], expected["MA20"].reindex(result.index), equal_nan=True)
+    assert np.allclose(result["Return"], expected["Return"].reindex(result.index), equal_nan=True)
+
+
+def test_futures_inputs_front_month_and_basis():
+    inputs = derived.futures_inputs(futures_frame())
+    assert inputs["Close"].tolist() == [100.0, 101.0, 102.0]
+    assert inputs["Basis"].tolist() == [1.0, 1.0, 1.0]
+
+
+def test_futures_recompute_reads_every_contract_from_parquet(tmp_path):
+    df = futures_frame()
+    for _, chunk in df.groupby("Date"):
+        storage.write_partition(chunk, "taiwan_futures_daily", "taifex", root=str(tmp_path))
+    with mock.patch.object(derived, "STORAGE_SINKS", ["mysql", "parquet"]), \
+            mock.patch.object(derived.storage, "read", functools.partial(storage.read, root=str(tmp_path))):
+        inputs = derived.read_inputs("taiwan_futures_daily", ["TX"], "2024-01-01", "2024-01-31", None)
+    assert inputs["Basis"].tolist() == [1.0, 1.0, 1.0]
+
+
+def test_futures_recompute_needs_parquet_sink():
+    with mock.patch.object(derived, "STORAGE_SINKS", ["mysql"]):
+        with pytest.raises(derived.RecomputeError):
+            derived.read_inputs("taiwan_futures_daily", None, "2024-01-01", "2024-01-31", None)
+
+
+class FakeStore:
+    """Derived state kept in memory, recording the order of the calls made under the transaction."""
+
+    def __init__(self):
+        self.windows = {}
+        self.written = []
+        self.calls = []
+
+    def load_state(self, dataset, series, mysql_conn):
+        self.calls.append("load_state")
+        frames = [self.windows[name] for name in series or self.windows if name in self.windows]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def save_state(self, dataset, history, mysql_conn):
+        self.calls.append("save_state")
+        for name, window in history.groupby("series"):
+            self.windows[name] = window.tail(derived.LONG_WINDOW)
+
+    def write(self, dataset, rows, mysql_conn):
+        self.calls.append("write")
+        self.written.append(rows)
+
+
+def test_incremental_update_matches_full_compute():
+    raw = stock_frame()
+    store = FakeStore()
+    conn = mock.MagicMock()
+    conn.begin.return_value.__enter__.side_effect = lambda: store.calls.append("begin")
+    conn.begin.return_value.__exit__.side_effect = lambda *args: store.calls.append("commit")
+    with mock.patch.multiple(
+        derived,
+        load_state=store.load_state,
+        save_state=store.save_state,
+        write=store.write,
+        ensure_tables=lambda *args: None,
+    ):
+        for date in DATES:
+            derived.update("taiwan_stock_price", raw[raw["Date"] == date], conn)
+
+    assert store.calls[:5] == ["begin", "load_state", "write", "save_state", "commit"]
+    incremental = pd.concat(store.written).sort_values(["series", "Date"]).reset_index(drop=True)
+    full = derived.compute(derived.stock_inputs(raw))
+    pd.testing.assert_frame_equal(incremental[full.columns], full)
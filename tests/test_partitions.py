@@ -0,0 +1,53 @@
+import datetime
+
+from fin_engine.db import partitions
+
+
+def yearly(*years) -> list:
+    return [dict(name=f"p{year}", description=str(year + 1)) for year in years]
+
+
+def test_parse_bound():
+    assert partitions.parse_bound("2024", "year") == datetime.date(2024, 1, 1)
+    assert partitions.parse_bound("'2024-02-01'", "month") == datetime.date(2024, 2, 1)
+    assert partitions.parse_bound("MAXVALUE", "year") is None
+
+
+def test_next_bound_rolls_over_the_year():
+    assert partitions.next_bound(datetime.date(2024, 1, 1), "year") == datetime.date(2025, 1, 1)
+    assert partitions.next_bound(datetime.date(2024, 11, 1), "month") == datetime.date(2024, 12, 1)
+    assert partitions.next_bound(datetime.date(2024, 12, 1), "month") == datetime.date(2025, 1, 1)
+
+
+def test_yearly_plan_fills_the_gap_up_to_the_years_ahead():
+    definitions = partitions.plan_partitions(yearly(2022, 2023), "year", datetime.date(2026, 10, 18), ahead=1)
+    assert definitions == [
+        "PARTITION p2024 VALUES LESS THAN (2025)",
+        "PARTITION p2025 VALUES LESS THAN (2026)",
+        "PARTITION p2026 VALUES LESS THAN (2027)",
+        "PARTITION p2027 VALUES LESS THAN (2028)",
+    ]
+    assert partitions.plan_partitions(yearly(2026, 2027), "year", datetime.date(2026, 10, 18), ahead=1) == []
+
+
+def test_monthly_plan_crosses_the_year():
+    existing = [dict(name="p202410", description="'2024-11-01'"), dict(name="p202411", description="'2024-12-01'")]
+    definitions = partitions.plan_partitions(existing, "month", datetime.date(2024, 12, 5), ahead=1)
+    assert definitions == [
+        "PARTITION p202412 VALUES LESS THAN ('2025-01-01')",
+        "PARTITION p202501 VALUES LESS THAN ('2025-02-01')",
+    ]
+
+
+def test_new_partitions_are_split_out_of_maxvalue():
+    existing = yearly(2023) + [dict(name="pmax", description="MAXVALUE")]
+    definitions = partitions.plan_partitions(existing, "year", datetime.date(2024, 3, 1), ahead=1)
+    assert definitions == ["PARTITION p2024 VALUES LESS THAN (2025)", "PARTITION p2025 VALUES LESS THAN (2026)"]
+    assert partitions.build_add_partitions_sql("taiwan_stock_price", definitions, "pmax") == (
+        "ALTER TABLE `taiwan_stock_price` REORGANIZE PARTITION `pmax` INTO ("
+        "PARTITION p2024 VALUES LESS THAN (2025), PARTITION p2025 VALUES LESS THAN (2026), "
+        "PARTITION `pmax` VALUES LESS THAN MAXVALUE)"
+    )
+    assert partitions.build_add_partitions_sql("taiwan_stock_price", definitions[:1], None) == (
+        "ALTER TABLE `taiwan_stock_price` ADD PARTITION (PARTITION p2024 VALUES LESS THAN (2025))"
+    )
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from fin_engine import planner
+
+
+def test_missing_data_source_is_planned():
+    parameter_list = [
+        {"crawler_date": "2024-01-02", "data_source": "twse"},
+        {"crawler_date": "2024-01-02", "data_source": "tpex"},
+    ]
+    coverage = {"2024-01-02": 1000}
+    source_coverage = {("2024-01-02", "twse"): 1000}
+    assert planner.plan_tasks(parameter_list, coverage, source_coverage) == [parameter_list[1]]
+
+
+def test_crawled_holiday_is_not_planned_again():
+    parameters = {"crawler_date": "2024-02-01", "crawler_end_date": "2024-02-29", "data_source": "taifex"}
+    df = pd.DataFrame({"Date": pd.to_datetime(["2024-02-01", "2024-02-02"])})
+    rows = planner.crawled_rows(parameters, df)
+    assert rows["2024-02-01"] == 1
+    # Lunar New Year: a weekday without data is recorded as crawled with 0 rows
+    assert rows["2024-02-08"] == 0
+    source_coverage = {(date, "taifex"): count for date, count in rows.items()}
+    assert planner.plan_tasks([parameters], {"2024-02-01": 1, "2024-02-02": 1}, source_coverage) == []
+
+
+def test_dates_before_source_records_fall_back_to_row_counts():
+    parameter_list = [{"crawler_date": "2024-01-02", "data_source": "twse"}]
+    assert planner.plan_tasks(parameter_list, {"2024-01-02": 1000}, {}) == []
+    assert planner.plan_tasks(parameter_list, {}, {}) == parameter_list
@@ -0,0 +1,24 @@
+from unittest import mock
+
+import pandas as pd
+
+from fin_engine.db import read
+
+
+def test_cached_frame_expires_when_the_data_version_changes():
+    cache = read.FrameCache(max_bytes=1024 ** 2)
+    key = ("taiwan_stock_price", (), "2024-01-01", "2024-01-31", ("Close",))
+    cache.put(key, pd.DataFrame({"Close": [1.0]}), version=3)
+    assert cache.get(key, 3) is not None
+    assert cache.get(key, 4) is None
+    assert cache.nbytes == 0
+
+
+def test_read_table_reads_again_after_a_write_elsewhere():
+    df = pd.DataFrame({"StockID": ["2330"], "Close": [580.0]})
+    with mock.patch.object(read, "cache", read.FrameCache(1024 ** 2)), \
+            mock.patch.object(read, "data_version", side_effect=[1, 1, 2]), \
+            mock.patch.object(read, "stream_frame", return_value=df) as stream_frame:
+        for _ in range(3):
+            read.read_table("taiwan_stock_price", "StockID", ["2330"], "2024-01-01", "2024-01-31", None, None)
+    assert stream_frame.call_count == 2
@@ -0,0 +1,84 @@
+import threading
+from unittest import mock
+
+import pytest
+
+from fin_engine.db import clients
+from fin_engine.db.router import Router
+from fin_engine.scheduler.__main__ import releasing_connections
+from fin_engine.worker import release_db_connections
+
+
+def fake_connections():
+    connections = []
+
+    def get_mysql_financialdata_conn():
+        connection = mock.MagicMock(closed=False, invalidated=False)
+        connections.append(connection)
+        return connection
+
+    return connections, get_mysql_financialdata_conn
+
+
+def test_connection_is_checked_out_again_after_each_task():
+    connections, connect = fake_connections()
+    router = Router()
+    with mock.patch.object(clients, "get_mysql_financialdata_conn", connect), \
+            mock.patch("fin_engine.db.router", router):
+        first = router.mysql_financialdata_conn
+        assert router.mysql_financialdata_conn is first
+        release_db_connections()
+        first.close.assert_called_once()
+        second = router.mysql_financialdata_conn
+    assert second is not first
+    assert connections == [first, second]
+
+
+def test_invalidated_connection_is_replaced():
+    connections, connect = fake_connections()
+    router = Router()
+    with mock.patch.object(clients, "get_mysql_financialdata_conn", connect):
+        first = router.mysql_financialdata_conn
+        first.invalidated = True
+        assert router.mysql_financialdata_conn is not first
+    assert len(connections) == 2
+
+
+def test_threads_use_and_close_their_own_connections():
+    connections, connect = fake_connections()
+    router = Router()
+    checked_out = threading.Event()
+    closed = threading.Event()
+    seen = {}
+
+    def job():
+        seen["job"] = router.mysql_financialdata_conn
+        checked_out.set()
+        closed.wait(5)
+        # Still this job's connection after the other thread closed its own
+        seen["job_after"] = router.mysql_financialdata_conn
+
+    with mock.patch.object(clients, "get_mysql_financialdata_conn", connect):
+        thread = threading.Thread(target=job)
+        thread.start()
+        checked_out.wait(5)
+        main_conn = router.mysql_financialdata_conn
+        router.close_connection()
+        closed.set()
+        thread.join(5)
+
+    assert seen["job"] is not main_conn
+    assert seen["job_after"] is seen["job"]
+    main_conn.close.assert_called_once()
+    seen["job"].close.assert_not_called()
+    assert len(connections) == 2
+
+
+def test_scheduler_job_closes_its_connections_even_when_it_fails():
+    def failing_job():
+        raise ValueError("job failed")
+
+    with mock.patch("fin_engine.db.router") as router:
+        with pytest.raises(ValueError):
+            releasing_connections(failing_job)()
+    router.close_connection.assert_called_once()
@@ -0,0 +1,33 @@
+from unittest import mock
+
+import pytest
+
+from fin_engine.scraper import session
+
+
+@pytest.fixture(autouse=True)
+def no_sessions():
+    with mock.patch.dict(session._sessions, clear=True):
+        yield
+
+
+def headers() -> dict:
+    return {"User-Agent": "test"}
+
+
+def test_one_session_is_reused_per_host():
+    header_func = mock.Mock(side_effect=headers)
+    first = session.get_session("www.twse.com.tw", header_func)
+    assert session.get_session("www.twse.com.tw", header_func) is first
+    assert session.get_session("www.tpex.org.tw", header_func) is not first
+    # Headers are built once per session, not per request
+    assert header_func.call_count == 2
+    assert first.headers["User-Agent"] == "test"
+
+
+def test_new_session_is_built_after_a_fork():
+    parent = session.get_session("www.twse.com.tw", headers)
+    with mock.patch.object(session.os, "getpid", return_value=session.os.getpid() + 1):
+        child = session.get_session("www.twse.com.tw", headers)
+        assert session.get_session("www.twse.com.tw", headers) is child
+    assert child is not parent
@@ -0,0 +1,16 @@
+import pandas as pd
+
+from fin_engine import storage
+
+
+def test_write_partition_empty_frame(tmp_path):
+    assert storage.write_partition(pd.DataFrame(), "taiwan_stock_price", "twse", root=str(tmp_path)) == []
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_write_partition_round_trip(tmp_path):
+    df = pd.DataFrame({"StockID": ["1101", "2330"], "Close": [40.5, 580.0], "Date": ["2024-01-02", "2024-01-02"]})
+    paths = storage.write_partition(df, "taiwan_stock_price", "twse", root=str(tmp_path))
+    assert len(paths) == 1
+    result = storage.read("taiwan_stock_price", root=str(tmp_path))
+    assert sorted(result["StockID"]) == ["1101", "2330"]
@@ -0,0 +1,98 @@
+from unittest import mock
+
+import pandas as pd
+import pytest
+from sqlalchemy import exc as sa_exc
+
+from fin_engine import producer, tasks
+
+KEY = ["StockID", "Date"]
+
+
+def test_upload_skips_empty_frame():
+    with mock.patch.object(tasks, "STORAGE_SINKS", ["mysql", "parquet"]), \
+            mock.patch.object(tasks, "upload_mysql") as upload_mysql, \
+            mock.patch.object(tasks.storage, "write_partition") as write_partition, \
+            mock.patch.object(tasks.planner, "record_crawl") as record_crawl, \
+            mock.patch.object(tasks.db, "router"):
+        tasks.upload("taiwan_stock_price", {"crawler_date": "2024-01-06", "data_source": "twse"}, pd.DataFrame())
+    upload_mysql.assert_not_called()
+    write_partition.assert_not_called()
+    # The empty date is still recorded as crawled, so it is not planned again
+    record_crawl.assert_called_once()
+
+
+def upload_one_date(derived_error):
+    df = pd.DataFrame({"StockID": ["2330"], "Close": [580.0], "Date": ["2024-01-02"]})
+    save_hash = mock.Mock()
+    with mock.patch.object(tasks.hashes, "changed_rows", return_value=(df, save_hash)) as changed_rows, \
+            mock.patch.object(tasks.db, "upload_data") as upload_data, \
+            mock.patch.object(tasks.db, "router"), \
+            mock.patch.object(tasks.derived, "update", side_effect=derived_error), \
+            mock.patch.object(tasks.derived, "record_pending") as record_pending:
+        tasks.upload_mysql("taiwan_stock_price", "twse", df)
+    # The table and its key come from the registry
+    assert changed_rows.call_args[0][4] == KEY
+    assert upload_data.call_args[0][1] == "taiwan_stock_price"
+    assert upload_data.call_args[1]["key_columns"] == KEY
+    return save_hash, record_pending
+
+
+def test_derived_failure_is_recorded_as_pending():
+    save_hash, record_pending = upload_one_date(ValueError("bad window"))
+    assert record_pending.call_args[0][:2] == ("taiwan_stock_price", ["2024-01-02"])
+    save_hash.assert_called_once()
+
+
+def test_retryable_derived_failure_retries_the_upload():
+    with pytest.raises(sa_exc.OperationalError):
+        upload_one_date(sa_exc.OperationalError("UPDATE", {}, Exception("Lock wait timeout")))
+
+
+def test_forced_upload_writes_unchanged_rows():
+    df = pd.DataFrame({"StockID": ["2330"], "Close": [580.0], "Date": ["2024-01-02"]})
+    stored_hash = tasks.hashes.frame_hash(df, tasks.hashes.row_hashes(df))
+    with mock.patch.object(tasks.hashes, "get_hash", return_value=(stored_hash, None)), \
+            mock.patch.object(tasks.hashes, "save_hash") as save_hash:
+        skipped, _ = tasks.hashes.changed_rows(df, "taiwan_stock_price", "twse", "frame", KEY, None)
+        changed, save = tasks.hashes.changed_rows(df, "taiwan_stock_price", "twse", "frame", KEY, None, force=True)
+        save()
+    assert skipped.empty
+    assert changed.equals(df)
+    save_hash.assert_called_once()
+
+
+def test_forced_crawl_is_forced_in_its_tasks():
+    parameters = {"crawler_date": "2024-01-02", "data_source": "twse"}
+    single = producer.build_signatures("taiwan_stock_price", [parameters], force=True)
+    batched = producer.build_signatures("taiwan_stock_price", [parameters], batch_size=10, force=True)
+    assert single["twse"][0].kwargs["force"] is True
+    assert batched["twse"][0].kwargs["force"] is True
+
+
+def stock_days(days: int, rows_per_day: int) -> pd.DataFrame:
+    dates = pd.bdate_range("2024-01-01", periods=days).repeat(rows_per_day)
+    return pd.DataFrame({"StockID": [str(i) for i in range(len(dates))], "Close": 1.0, "Date": dates.astype(str)})
+
+
+def keep_every_row(chunk: pd.DataFrame, *args, **kwargs):
+    return chunk, mock.Mock()
+
+
+def upload_many_methods(df: pd.DataFrame):
+    with mock.patch.object(tasks, "STORAGE_SINKS", ["mysql"]), \
+            mock.patch.object(tasks.db.db, "BULK_LOAD_THRESHOLD", 1000), \
+            mock.patch.object(tasks.schema, "validate"), \
+            mock.patch.object(tasks.hashes, "changed_rows", side_effect=keep_every_row), \
+            mock.patch.object(tasks.db, "upload_data") as upload_data, \
+            mock.patch.object(tasks.planner, "record_crawl"), \
+            mock.patch.object(tasks.db, "router"), \
+            mock.patch.object(tasks, "DERIVED_DATASETS", []):
+        tasks.upload("taiwan_stock_price", {"crawler_date": "2024-01-01", "data_source": "twse"}, df)
+    return [(len(call[0][0]), call[1].get("method", "auto")) for call in upload_data.call_args_list]
+
+
+def test_days_of_a_task_are_bulk_loaded_together_from_the_threshold():
+    # One upsert per day below the threshold, one load of every day from it
+    assert upload_many_methods(stock_days(2, 499)) == [(499, "auto"), (499, "auto")]
+    assert upload_many_methods(stock_days(4, 250)) == [(1000, "load")]